@@ -0,0 +1,234 @@
+"""
+Act-name pre-filter for targeted questions.
+
+Queries often name the statute ("under the RTI Act", "Advocates Act, 1961 section 24").
+`data-ingestion.py` builds `data-ingestion-local/act-index.json` from the `data/`
+filenames: every act's title with and without its year, the title without the
+trailing "Act", its initials, and a few well-known abbreviations, each mapped to the
+`source` values of the matching files. At query time one word-level Aho-Corasick pass
+finds every mention, and `BatchRetriever` restricts the vector search to those sources.
+
+Boilerplate that ingestion collapsed into another act's chunk is stored only under that
+other act's `source`, so the index also keeps, per source, the IDs of the stored chunks
+whose `duplicate_sources` list it; the filter lets those chunks through as well.
+
+Section numbers are not used to narrow the search, since chunks carry no section
+metadata; the BM25 hits already match them exactly.
+"""
+
+import json
+import os
+import re
+import threading
+from collections import deque
+
+from bm25_index import token_re, words
+
+_year_re = re.compile(r"^(1[89]|20)\d\d$")
+_copy_marker_re = re.compile(r"\s*\(\d+\)$")
+
+## words left out of initials, so "Narcotic Drugs and Psychotropic Substances" is also NDPS
+INITIALS_SKIP = frozenset(["and", "of", "the", "for", "in", "on", "from", "to"])
+
+## abbreviations that are not the initials of the title, resolved against the titles at build time
+ALIASES = {
+    "ipc": "indian penal code",
+    "crpc": "code of criminal procedure",
+    "cr pc": "code of criminal procedure",
+    "cpc": "code of civil procedure",
+    "pocso": "protection of children from sexual offences",
+    "ndps": "narcotic drugs and psychotropic substances",
+    "fema": "foreign exchange management",
+    "pmla": "prevention of money laundering",
+    "uapa": "unlawful activities",
+    "it act": "information technology act",
+    "mv act": "motor vehicles act",
+}
+
+## initials that are ordinary words; they still match when followed by "Act"
+COMMON_WORDS = frozenset(["and", "are", "but", "can", "for", "the", "act", "all", "any", "was", "who", "why", "how",
+                          "may", "not", "our", "you", "its", "has", "had", "her", "his", "one", "new", "use", "see"])
+
+def title_from_filename(pdf):
+    """Act title of a `data/` file, without copy markers like " (2)" and with underscores as spaces"""
+    title = os.path.splitext(os.path.basename(pdf))[0].replace("_", " ")
+    return _copy_marker_re.sub("", title)
+
+def title_tokens(title):
+    """Tokens of `title` without a leading "the" or trailing numbers other than the year"""
+    tokens = words(title)
+    if tokens and tokens[0] == "the":
+        tokens = tokens[1:]
+    while tokens and tokens[-1].isdigit() and not _year_re.match(tokens[-1]):
+        tokens.pop()
+    return tokens
+
+def title_patterns(title):
+    """`(pattern, bare_abbreviation)` pairs under which `title` can be mentioned"""
+    tokens = title_tokens(title)
+    year = tokens[-1] if tokens and _year_re.match(tokens[-1]) else None
+    name = tokens[:-1] if year else tokens
+    if not name:
+        return []
+
+    ## a one-word name such as "environment" is too common to be read as a mention on its own
+    patterns = set()
+    if len(name) >= 2:
+        patterns.add((" ".join(name), False))
+    if year:
+        patterns.add((" ".join(name + [year]), False))
+    core = name[:-1] if name[-1] == "act" else name
+    if len(core) >= 2:
+        patterns.add((" ".join(core), False))
+        for initials in {"".join(word[0] for word in core),
+                         "".join(word[0] for word in core if word not in INITIALS_SKIP)}:
+            if len(initials) < 2:
+                continue
+            patterns.add((f"{initials} act", False))
+            if year:
+                patterns.add((f"{initials} act {year}", False))
+            ## two capitals like "SC" or "HC" usually mean something else
+            if len(initials) >= 3 and initials not in COMMON_WORDS:
+                patterns.add((initials, True))
+    return sorted(patterns)
+
+def build_index(index_path, sources, shared_chunks=None):
+    """
+    Write the pattern -> sources map for every `source` in `sources`, returning the
+    pattern count. `shared_chunks` maps a source to the IDs of chunks stored under other
+    sources that stand for it (see `shared_chunks_from_store`).
+    """
+    patterns = {}
+    names = {}
+    for source in sources:
+        title = title_from_filename(source)
+        names[source] = " ".join(title_tokens(title))
+        for pattern, bare in title_patterns(title):
+            entry = patterns.setdefault(pattern, {"sources": [], "bare": bare})
+            entry["sources"].append(source)
+            entry["bare"] = entry["bare"] and bare
+
+    ## an alias names one act, so it replaces whatever acts happen to share those initials
+    for alias, phrase in ALIASES.items():
+        matching = [source for source, name in names.items() if f"{name} ".startswith(f"{phrase} ")]
+        if matching:
+            patterns[alias] = {"sources": sorted(matching), "bare": False}
+
+    shared_chunks = {source: sorted(ids) for source, ids in (shared_chunks or {}).items() if source in names and ids}
+    tmp_path = f"{index_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"patterns": patterns, "shared_chunks": shared_chunks}, f, ensure_ascii=False)
+    os.replace(tmp_path, index_path)
+    return len(patterns)
+
+def shared_chunks_from_store(vectorDB):
+    """`{source: [chunk IDs]}` of the stored chunks whose `duplicate_sources` list another source"""
+    stored = vectorDB._collection.get(where={"duplicate_count": {"$gt": 0}}, include=["metadatas"])
+    shared = {}
+    for chunk_id, metadata in zip(stored["ids"], stored["metadatas"]):
+        metadata = metadata or {}
+        for source in metadata.get("duplicate_sources", "").split("; "):
+            if source and source != metadata.get("source"):
+                shared.setdefault(source, []).append(chunk_id)
+    return shared
+
+class _Automaton:
+    """Aho-Corasick automaton of one version of `act-index.json`; a reload builds a new one"""
+
+    def __init__(self, index_path=None):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]] ## node -> ids of the patterns ending there
+        self.patterns = []
+        self.shared_chunks = {}
+        if index_path is None:
+            return
+        with open(index_path, encoding="utf-8") as f:
+            index = json.load(f)
+        self.shared_chunks = index.get("shared_chunks", {})
+
+        for pattern, entry in index["patterns"].items():
+            node = 0
+            for token in pattern.split():
+                if token not in self.goto[node]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                    self.goto[node][token] = len(self.goto) - 1
+                node = self.goto[node][token]
+            self.output[node].append(len(self.patterns))
+            self.patterns.append((len(pattern.split()), entry["sources"], entry["bare"]))
+
+        ## breadth-first failure links
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for token, child in self.goto[node].items():
+                queue.append(child)
+                state = self.fail[node]
+                while state and token not in self.goto[state]:
+                    state = self.fail[state]
+                self.fail[child] = self.goto[state].get(token, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def find(self, text):
+        original = token_re.findall(text)
+        tokens = [token.casefold() for token in original]
+        matches = []
+        node = 0
+        for end, token in enumerate(tokens, start=1):
+            while node and token not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(token, 0)
+            for pattern_id in self.output[node]:
+                length, _, bare = self.patterns[pattern_id]
+                start = end - length
+                ## a bare abbreviation only counts when written in capitals, e.g. "RTI"
+                if bare and not original[start].isupper():
+                    continue
+                matches.append((start, end, pattern_id))
+
+        ## keep the longest of overlapping mentions, so "Advocates Act 1961" wins over "Advocates Act"
+        selected = []
+        for start, end, pattern_id in sorted(matches, key=lambda m: (m[0], m[0] - m[1])):
+            if selected and start < selected[-1][1]:
+                continue
+            selected.append((start, end, pattern_id))
+        return selected
+
+class ActIndex:
+    """
+    Word-level Aho-Corasick automaton over the patterns in `act-index.json`. `load`
+    swaps in a whole new `_Automaton`, so a lookup on another thread never mixes versions.
+    """
+
+    def __init__(self, index_path):
+        self.index_path = index_path
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """(Re)build the automaton, e.g. after ingestion rewrote the index"""
+        with self._lock:
+            self._automaton = _Automaton(self.index_path if os.path.exists(self.index_path) else None)
+
+    def __len__(self):
+        return len(self._automaton.patterns)
+
+    def find(self, text):
+        """`(start, end, pattern_id)` of every act mention in `text`, longest first among overlaps"""
+        return self._automaton.find(text)
+
+    def match_sources(self, queries):
+        """Sources of every act mentioned in any of `queries`, or an empty set"""
+        automaton = self._automaton
+        sources = set()
+        for query in queries:
+            for _, _, pattern_id in automaton.find(query):
+                sources.update(automaton.patterns[pattern_id][1])
+        return sources
+
+    def shared_chunk_ids(self, sources):
+        """IDs of chunks stored under other sources that also stand for `sources`"""
+        shared_chunks = self._automaton.shared_chunks
+        return {chunk_id for source in sources for chunk_id in shared_chunks.get(source, ())}
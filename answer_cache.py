@@ -0,0 +1,192 @@
+"""
+Semantic answer cache for `/api/chat`.
+
+Answers are partitioned by language, a hash of the last few chat-history messages, and
+the numbers and act names in the question, and within a partition a question matches
+a cached one when their query embeddings have cosine similarity of at least
+`threshold`. The embeddings of "punishment under section 302" and "... section 304"
+are nearly identical, so the exact tokens that change the answer keep them apart.
+Entries are kept in SQLite so they survive restarts, expire after `ttl` seconds, and
+the least recently used are evicted beyond `max_entries`. The cache is cleared
+whenever the index version changes, since the answers were grounded in the old chunks.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+## section numbers like "302" or "498A", and years; `\d` also matches Devanagari digits
+_number_re = re.compile(r"(\d+)([a-z]*)", re.IGNORECASE)
+
+def _role_and_content(msg):
+    """`(role, content)` of a `{"role", "content"}` dict or a langchain message"""
+    if isinstance(msg, dict):
+        return msg.get("role"), str(msg.get("content", ""))
+    return {"human": "user", "ai": "assistant"}.get(msg.type, msg.type), str(msg.content)
+
+def history_key(history, turns):
+    """Hash of the last `turns` messages, the part of the history that shapes the answer"""
+    recent = [(role, " ".join(content.split())) for role, content in map(_role_and_content, history[-turns:])] if turns else []
+    return hashlib.blake2b(json.dumps(recent, ensure_ascii=False).encode("utf-8"), digest_size=16).hexdigest()
+
+def query_anchors(query, act_index=None):
+    """Numbers (as written in any script) and sources of the acts named in `query`, which must match exactly"""
+    numbers = sorted({f"{int(digits)}{suffix.casefold()}" for digits, suffix in _number_re.findall(query)})
+    acts = sorted(act_index.match_sources([query])) if act_index is not None else []
+    return numbers, acts
+
+@dataclass
+class AnswerKey:
+    partition: str
+    query: str
+    embedding: np.ndarray
+
+class SemanticAnswerCache:
+    def __init__(self, db_path, embed, threshold=0.95, max_entries=5000, ttl=24 * 3600, history_turns=5,
+                 index_version=None, act_index=None):
+        """
+        `history_turns` should match the history the answer prompt includes; `act_index`
+        (`act_index.ActIndex`) adds the acts a question names to its partition.
+        """
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.embed = embed
+        self.act_index = act_index
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.history_turns = history_turns
+        self.index_version = index_version
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS answers (
+                id         INTEGER PRIMARY KEY AUTOINCREMENT,
+                partition  TEXT NOT NULL,
+                query      TEXT NOT NULL,
+                embedding  BLOB NOT NULL,
+                response   TEXT NOT NULL,
+                sources    TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used  REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS answers_last_used ON answers (last_used);
+            CREATE TABLE IF NOT EXISTS settings (
+                key   TEXT PRIMARY KEY,
+                value TEXT
+            );
+            """
+        )
+        self.conn.commit()
+        self._cached_version = self.index_version() if self.index_version else None
+        row = self.conn.execute("SELECT value FROM settings WHERE key = 'index_version'").fetchone()
+        if self.index_version and (row[0] if row else None) != self._cached_version:
+            self._clear()
+        self._load()
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    def _load(self):
+        """Rebuild the in-memory partitions (entry ids and stacked unit embeddings) from SQLite"""
+        self.conn.execute("DELETE FROM answers WHERE created_at < ?", (time.time() - self.ttl,))
+        self.conn.commit()
+        rows = {}
+        for entry_id, partition, blob in self.conn.execute("SELECT id, partition, embedding FROM answers ORDER BY id"):
+            ids, vectors = rows.setdefault(partition, ([], []))
+            ids.append(entry_id)
+            vectors.append(np.frombuffer(blob, dtype=np.float32))
+        self._partitions = {partition: (ids, np.vstack(vectors)) for partition, (ids, vectors) in rows.items()}
+
+    def _clear(self):
+        self.conn.execute("DELETE FROM answers")
+        self.conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('index_version', ?)", (self._cached_version,))
+        self.conn.commit()
+        self._partitions = {}
+
+    def _check_index_version(self):
+        if self.index_version is None:
+            return
+        version = self.index_version()
+        if version != self._cached_version:
+            self._cached_version = version
+            self._clear()
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(ids) for ids, _ in self._partitions.values())
+
+    def make_key(self, query, history, language):
+        embedding = np.asarray(self.embed(query), dtype=np.float32)
+        embedding = embedding / max(float(np.linalg.norm(embedding)), 1e-12)
+        anchors = json.dumps(query_anchors(query, self.act_index), ensure_ascii=False).encode("utf-8")
+        anchors = hashlib.blake2b(anchors, digest_size=8).hexdigest()
+        return AnswerKey(f"{language.lower()}:{history_key(history, self.history_turns)}:{anchors}", query, embedding)
+
+    def get(self, key):
+        """`(response, sources)` of the closest cached question above the threshold, or None"""
+        with self._lock:
+            self._check_index_version()
+            ids, vectors = self._partitions.get(key.partition, ([], None))
+            if ids:
+                similarities = vectors @ key.embedding
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    row = self.conn.execute("SELECT response, sources, created_at FROM answers WHERE id = ?",
+                                            (ids[best],)).fetchone()
+                    if row and row[2] >= time.time() - self.ttl:
+                        self.conn.execute("UPDATE answers SET last_used = ? WHERE id = ?", (time.time(), ids[best]))
+                        self.conn.commit()
+                        self.hits += 1
+                        return row[0], json.loads(row[1])
+            self.misses += 1
+            return None
+
+    def put(self, key, response, sources):
+        with self._lock:
+            self._check_index_version()
+            now = time.time()
+            cursor = self.conn.execute(
+                "INSERT INTO answers (partition, query, embedding, response, sources, created_at, last_used) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key.partition, key.query, key.embedding.tobytes(), response, json.dumps(sources or [], ensure_ascii=False), now, now),
+            )
+            ids, vectors = self._partitions.get(key.partition, ([], None))
+            self._partitions[key.partition] = (ids + [cursor.lastrowid], key.embedding[None, :] if vectors is None
+                                               else np.vstack([vectors, key.embedding]))
+
+            ## expired and least recently used entries beyond `max_entries`
+            evicted = self.conn.execute("DELETE FROM answers WHERE created_at < ?", (now - self.ttl,)).rowcount
+            excess = self.conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0] - self.max_entries
+            if excess > 0:
+                evicted += self.conn.execute(
+                    "DELETE FROM answers WHERE id IN (SELECT id FROM answers ORDER BY last_used LIMIT ?)", (excess,)
+                ).rowcount
+            self.conn.commit()
+            if evicted:
+                self._load()
+
+    def hit_ratio(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        return {
+            "size": sum(len(ids) for ids, _ in self._partitions.values()),
+            "maxsize": self.max_entries,
+            "ttl": self.ttl,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hit_ratio(), 4),
+        }
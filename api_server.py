@@ -1,8 +1,10 @@
 from fastapi import FastAPI, HTTPException, UploadFile, File, Form
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import traceback
+import asyncio
 import sys
 import os
 import base64
@@ -15,10 +17,26 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(current_dir)
 
 # Import RAG functions from app.py
-from app import createMultiQueryChain, kb_retriever, generateRRF, generateResponse, MultiQuery, llm
+from app import kb_batch_retriever, persistent_directory, query_router, expansion_cache, act_name_index
+from app import extractSources, errorResponse, runBlocking, aplanRetrieval, agenerateResponse, astreamChat, speculative_stats
+from app import prompt_registry
+from answer_cache import SemanticAnswerCache
+from vector_store import read_index_version
 
 app = FastAPI(title="Nyantar AI API", version="1.0.0")
 
+# Answers to semantically identical questions (same language and recent history) skip both LLM calls
+answer_cache = SemanticAnswerCache(
+    os.getenv("ANSWER_CACHE_PATH", os.path.join(current_dir, "serving-cache", "answers.sqlite3")),
+    embed=lambda text: kb_batch_retriever.embed_queries([text])[0],
+    threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", 0.95)),
+    max_entries=int(os.getenv("ANSWER_CACHE_SIZE", 5000)),
+    ttl=float(os.getenv("ANSWER_CACHE_TTL", 24 * 3600)),
+    history_turns=int(os.getenv("ANSWER_CACHE_HISTORY_TURNS", 5)), # the answer prompt includes the last 5 messages
+    index_version=lambda: read_index_version(persistent_directory),
+    act_index=act_name_index,
+)
+
 # Enable CORS
 app.add_middleware(
     CORSMiddleware,
@@ -49,6 +67,9 @@ class ChatResponse(BaseModel):
     response: str
     sources: Optional[List[str]] = None
     error: Optional[str] = None
+    cached: bool = False
+    context_tokens: Optional[int] = None
+    replaced: bool = False  # streaming only: `response` replaces the streamed text
 
 class DraftingResponse(BaseModel):
     document: str
@@ -119,6 +140,18 @@ async def startup_event():
 async def health_check():
     return {"status": "healthy", "message": "Nyantar AI API is running"}
 
+@app.get("/api/cache-stats")
+async def cache_stats():
+    """Hit ratios of the caches and the share of requests the local router kept away from the LLM"""
+    return {
+        "retrieval": kb_batch_retriever.cache_stats(),
+        "answers": answer_cache.stats(),
+        "query_router": query_router.stats() if query_router is not None else None,
+        "query_expansions": expansion_cache.stats(),
+        "speculative_retrieval": dict(speculative_stats),
+        "prompts": prompt_registry.stats(),
+    }
+
 async def process_image_with_gpt4_vision(image_data: str, question: str, language: str):
     """Process image using GPT-4 Vision API"""
     try:
@@ -138,8 +171,9 @@ async def process_image_with_gpt4_vision(image_data: str, question: str, languag
         Structure your response with clear headings and bullet points.
         """
         
-        # Call OpenAI Vision API
-        response = openai.ChatCompletion.create(
+        # Call OpenAI Vision API in a worker thread, it is a blocking HTTP request
+        response = await asyncio.to_thread(
+            openai.ChatCompletion.create,
             model="gpt-4-vision-preview",
             messages=[
                 {"role": "system", "content": "You are a legal expert specializing in Indian law. Provide accurate, helpful legal analysis."},
@@ -183,6 +217,31 @@ def build_drafting_prompt(request: DraftingRequest, template: dict) -> str:
     
     return prompt
 
+def process_chat_history(chat_history: List[dict]) -> List[dict]:
+    """Keep the `{"role", "content"}` messages of the request history"""
+    processed_history = []
+    for msg in chat_history:
+        role = msg.get("role")
+        content = msg.get("content")
+        if role and content:
+            processed_history.append({"role": role, "content": content})
+        else:
+            print(f"Warning: Invalid message format: {msg}")
+    
+    print(f"Chat history: {processed_history}")
+    return processed_history
+
+async def lookup_answer(message: str, history: List[dict], language: str):
+    """`(cache_key, cached_answer)`; the query is encoded off the event loop"""
+    def lookup():
+        cache_key = answer_cache.make_key(message, history, language)
+        return cache_key, answer_cache.get(cache_key)
+    return await runBlocking(lookup)
+
+def sse_event(event: str, data) -> str:
+    """One server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
 @app.post("/api/chat", response_model=ChatResponse)
 async def chat_endpoint(request: ChatRequest):
     try:
@@ -214,41 +273,23 @@ async def chat_endpoint(request: ChatRequest):
             return ChatResponse(response=document_response)
         
         # Process chat history
-        processed_history = []
-        for msg in request.chatHistory:
-            role = msg.get("role")
-            content = msg.get("content")
-            if role and content:
-                processed_history.append({"role": role, "content": content})
-            else:
-                print(f"Warning: Invalid message format: {msg}")
-        
-        print(f"Chat history: {processed_history}")
+        processed_history = process_chat_history(request.chatHistory)
         
-        # Create multi-query chain
-        multi_query_chain = createMultiQueryChain(MultiQuery, llm)
+        # Serve semantically identical questions from the answer cache
+        cache_key, cached_answer = await lookup_answer(request.message, processed_history, request.language)
+        if cached_answer is not None:
+            print("Answer cache hit")
+            resp, sources = cached_answer
+            return ChatResponse(response=resp, sources=sources, cached=True)
         
-        # Generate multiple queries
-        multi_query_resp = multi_query_chain.invoke({"user_query": request.message, "chat_history": processed_history})
-        print(f"Multi-query response: {multi_query_resp}")
+        # Generate multiple queries (locally when the router can decide) while the raw message is
+        # already being retrieved, then retrieve the expanded queries and rank everything with RRF
+        multi_query_resp, ranked_documents = await aplanRetrieval(request.message, processed_history)
         
         # Check if document retrieval is required
         if multi_query_resp.get('documentRetrievalRequired', False):
             print("Document retrieval required - using vector database")
-            
-            # Get the queries from the response
-            queries = multi_query_resp.get('generatedQueries', [])
-            print(f"Generated queries: {queries}")
-            
-            # Retrieve documents for each query
-            all_retrieved_docs = []
-            for query in queries:
-                docs = kb_retriever.invoke(query)
-                print(f"Retrieved {len(docs)} documents for query: {query}")
-                all_retrieved_docs.append(docs)
-            
-            # Rank documents using RRF
-            ranked_documents = generateRRF(all_retrieved_docs)
+            print(f"Generated queries: {multi_query_resp.get('generatedQueries', [])}")
             print(f"Ranked {len(ranked_documents)} documents after RRF")
             
             # Log document details for debugging
@@ -258,48 +299,43 @@ async def chat_endpoint(request: ChatRequest):
             
             # Generate response with context
             print("Generating response with context...")
-            resp = generateResponse(
+            context_stats = {}
+            resp = await agenerateResponse(
                 request.message, 
                 ranked_documents, 
                 processed_history,
-                request.language  # Pass language to generateResponse
+                request.language,  # Pass language to generateResponse
+                stats=context_stats
             )
             print(f"Generated response: {resp[:200]}...")
             
             # Extract sources with deduplication
-            sources = []
-            seen_sources = set()
-            if ranked_documents:
-                for doc in ranked_documents[:3]:  # Top 3 sources
-                    source_name = None
-                    if hasattr(doc, 'metadata'):
-                        source_name = doc.metadata.get('source') or doc.metadata.get('file_path') or doc.metadata.get('filename')
-                    if source_name:
-                        # Clean the source name
-                        source_name = source_name.replace('data/', '').replace('.pdf', '').replace('_', ' ')
-                        if source_name not in seen_sources:
-                            sources.append(source_name)
-                            seen_sources.add(source_name)
-                            print(f"Added source: {source_name}")
-            
+            sources = extractSources(ranked_documents)
             print(f"Final sources being returned: {sources}")
+            if not context_stats.get("failed"):
+                await runBlocking(answer_cache.put, cache_key, resp, sources)
             
             return ChatResponse(
                 response=resp,
-                sources=sources
+                sources=sources,
+                context_tokens=context_stats.get("context_tokens")
             )
         else:
             print("No document retrieval required - but this appears to be a legal question")
             print("Generating response without context but providing general legal information")
             
             # Generate response without document retrieval but still provide legal guidance
-            resp = generateResponse(
+            context_stats = {}
+            resp = await agenerateResponse(
                 request.message, 
                 [], 
                 processed_history,
-                request.language  # Pass language to generateResponse
+                request.language,  # Pass language to generateResponse
+                stats=context_stats
             )
             print(f"Generated response without context: {resp[:200]}...")
+            if not context_stats.get("failed"):
+                await runBlocking(answer_cache.put, cache_key, resp, [])
             
             return ChatResponse(
                 response=resp,
@@ -311,6 +347,63 @@ async def chat_endpoint(request: ChatRequest):
         print(f"Traceback: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
 
+@app.post("/api/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    """
+    Streaming variant of `/api/chat` over server-sent events: a `sources` event once the
+    documents are ranked, a `token` event for every piece of the answer as the LLM
+    produces it (already post-processed), and a `done` event with the final `ChatResponse`
+    fields; when `replaced` is set, clients show its `response` instead of the streamed text.
+    Failures after the stream has started are sent as an `error` event.
+    """
+    print(f"Received streaming chat request: {request.message}")
+    print(f"Language: {request.language}")
+    
+    # Image and document analysis are not streamed, their answer is sent as one token
+    attachment = request.image_url or request.document_url
+    attachment_response = None
+    if attachment:
+        print("Processing attachment with GPT-4 Vision...")
+        attachment_response = await process_image_with_gpt4_vision(attachment, request.message, request.language)
+    
+    processed_history = process_chat_history(request.chatHistory)
+    
+    async def events():
+        try:
+            if attachment_response is not None:
+                yield sse_event("sources", {"sources": []})
+                yield sse_event("token", {"text": attachment_response})
+                yield sse_event("done", ChatResponse(response=attachment_response).model_dump())
+                return
+            
+            cache_key, cached_answer = await lookup_answer(request.message, processed_history, request.language)
+            if cached_answer is not None:
+                print("Answer cache hit")
+                resp, sources = cached_answer
+                yield sse_event("sources", {"sources": sources})
+                yield sse_event("token", {"text": resp})
+                yield sse_event("done", ChatResponse(response=resp, sources=sources, cached=True).model_dump())
+                return
+            
+            async for event, data in astreamChat(request.message, processed_history, request.language):
+                if event == "sources":
+                    print(f"Streaming sources: {data}")
+                    yield sse_event("sources", {"sources": data})
+                elif event == "token":
+                    yield sse_event("token", {"text": data})
+                elif event == "done":
+                    # A failed stream raises before `done`, so only complete answers are cached
+                    await runBlocking(answer_cache.put, cache_key, data["response"], data["sources"])
+                    yield sse_event("done", ChatResponse(**data).model_dump())
+        except Exception as e:
+            print(f"Error processing streaming chat request: {str(e)}")
+            print(f"Traceback: {traceback.format_exc()}")
+            yield sse_event("error", {"detail": f"Error processing request: {str(e)}",
+                                      "response": errorResponse(request.language)})
+    
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.post("/api/draft", response_model=DraftingResponse)
 async def draft_document(request: DraftingRequest):
     try:
@@ -16,14 +16,27 @@ from langchain_openai import ChatOpenAI
 from langchain_huggingface.embeddings import HuggingFaceEmbeddings
 from langchain_chroma import Chroma
 from langchain_core.messages import HumanMessage, AIMessage
-from langchain_core.documents import Document
-from langchain.load import loads, dumps
 
 ## other dependencies
 from typing import List
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import functools
 import time
 import traceback
 
+from retrieval import BatchRetriever, normalize_query, reciprocal_rank_fusion as generateRRF
+from bm25_index import BM25Index
+from matrix_store import MatrixStore, MatrixRetriever, store_exists
+from act_index import ActIndex
+from query_router import QueryRouter
+from expansion_cache import ExpansionCache
+from context_packer import pack_context
+from prompt_registry import PromptRegistry, Template
+from response_postprocessor import ResponsePostProcessor, post_process
+from ttl_cache import TTLCache
+from vector_store import read_index_version
+
 
 ## supress langchain warning
 import warnings
@@ -42,15 +55,64 @@ embedF = HuggingFaceEmbeddings(model_name = "all-MiniLM-L6-v2")
 ## load local vector DB
 vectorDB = Chroma(embedding_function=embedF, persist_directory=persistent_directory)
 
+## `numpy` searches the memory-mapped matrix exported by data-ingestion.py instead of querying Chroma
+retriever_backend = os.getenv("RETRIEVER_BACKEND", "chroma").lower()
+matrix_store_directory = os.path.join(persistent_directory, "vector-matrix")
+if retriever_backend == "numpy" and not store_exists(matrix_store_directory):
+    ## an empty matrix would answer every query with no documents at all
+    print(f"⚠️ RETRIEVER_BACKEND=numpy but no vector matrix was exported to {matrix_store_directory}; "
+          "falling back to ChromaDB (run data-ingestion.py without --no-matrix to export it)")
+    retriever_backend = "chroma"
+matrix_store = MatrixStore(matrix_store_directory) if retriever_backend == "numpy" else None
+
 ## set up retriever
-kb_retriever = vectorDB.as_retriever(search_type="similarity",search_kwargs={"k": 5})
+if matrix_store is not None:
+    kb_retriever = MatrixRetriever(store=matrix_store, embeddings=embedF, k=5)
+else:
+    kb_retriever = vectorDB.as_retriever(search_type="similarity",search_kwargs={"k": 5})
+
+## repeated queries skip the encoder and the vector search; both caches are cleared when ingestion publishes a new index version
+query_embedding_cache = TTLCache(maxsize=int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", 4096)),
+                                 ttl=float(os.getenv("QUERY_EMBEDDING_CACHE_TTL", 24 * 3600)))
+query_result_cache = TTLCache(maxsize=int(os.getenv("QUERY_RESULT_CACHE_SIZE", 2048)),
+                              ttl=float(os.getenv("QUERY_RESULT_CACHE_TTL", 3600)))
+
+## memory-mapped BM25 index built by data-ingestion.py, its hits are fused with the vector hits in generateRRF
+lexical_index = BM25Index(os.path.join(persistent_directory, "bm25-index"))
+
+## act titles and abbreviations found in a question restrict the vector search to those acts
+act_name_index = ActIndex(os.path.join(persistent_directory, "act-index.json"))
+
+## batch retriever for the generated queries: one encode + one vector search for all of them
+kb_batch_retriever = BatchRetriever(vectorDB, embedF, k=5,
+                                    embedding_cache=query_embedding_cache, result_cache=query_result_cache,
+                                    index_version=lambda: read_index_version(persistent_directory),
+                                    lexical_index=lexical_index, vector_store=matrix_store,
+                                    act_index=act_name_index)
+
+## greetings and plain statute questions are decided locally instead of by the MultiQuery LLM call
+query_router = QueryRouter(embed=lambda text: kb_batch_retriever.embed_queries([text])[0],
+                           embed_many=embedF.embed_documents, act_index=act_name_index) \
+    if os.getenv("QUERY_ROUTER", "on").lower() != "off" else None
+
+## parsed MultiQuery results of the LLM expander, keyed by normalized query, recent history and prompt
+expansion_cache = ExpansionCache(os.getenv("EXPANSION_CACHE_PATH", os.path.join(current_dir, "serving-cache", "expansions.sqlite3")),
+                                 max_entries=int(os.getenv("EXPANSION_CACHE_SIZE", 20000)),
+                                 ttl=float(os.getenv("EXPANSION_CACHE_TTL", 7 * 24 * 3600)))
+
+## the async request path runs query encoding, vector search and cache lookups here, off the event loop
+encode_executor = ThreadPoolExecutor(max_workers=int(os.getenv("ENCODE_WORKERS", 4)), thread_name_prefix="encode")
+
+## retrieval with the raw message runs while the MultiQuery LLM call is in flight
+speculative_retrieval = os.getenv("SPECULATIVE_RETRIEVAL", "on").lower() != "off"
+speculative_stats = {"started": 0, "used": 0, "discarded": 0}
 
 ## initialize LLM
 llm = ChatOpenAI(model="gpt-3.5-turbo", temperature=0.15)
 
-## main RAG prompt template
-with open("prompts/mainRAG-prompt.md", "r", encoding="utf-8") as f:
-    mainRAGPrompt = f.read()
+## tokens allowed into {context}, labels included; the default is about what the three
+## top-ranked ~1000-character chunks took before packing (~250 tokens each plus labels)
+context_token_budget = int(os.getenv("CONTEXT_TOKEN_BUDGET", 800))
 
 ## multiquery schema
 class MultiQuery(BaseModel):
@@ -63,10 +125,11 @@ class MultiQuery(BaseModel):
         description="List of semantically equivalent query variations for improved retrieval coverage. Empty list if documentRetrievalRequired is False. Contains only the original query if it's straightforward, or 5 alternative phrasings if the query is complex/ambiguous."
     )
 
-def createMultiQueryChain(output_pydantic_object, llm):
+def createMultiQueryChain(output_pydantic_object, llm, template=None):
     # llm = ChatOpenAI(model="gpt-4.1-mini", temperature=0.15)
-    with open("prompts/multiQuery-prompt.md", "r", encoding="utf-8") as f:
-        template = f.read()
+    if template is None:
+        with open("prompts/multiQuery-prompt.md", "r", encoding="utf-8") as f:
+            template = f.read()
     parser = JsonOutputParser(pydantic_object=output_pydantic_object)
     prompt = PromptTemplate(
         template=template,
@@ -76,41 +139,9 @@ def createMultiQueryChain(output_pydantic_object, llm):
     chain = prompt | llm | parser
     return chain
 
-def generateRRF(all_docs: List[List[Document]], k: int = 60) -> List[Document]:
-    rrf_scores = dict()
-    for docs in all_docs:
-        for rank, doc in enumerate(docs, start=1):
-            rrf_rank = 1/(k+rank)
-            rrf_scores[dumps(doc)] = rrf_scores.get(dumps(doc), 0) + rrf_rank
-    sorted_rrf_score = sorted(rrf_scores.items(), key=(lambda x: x[1]), reverse=True)
-    best_docs = [loads(doc) for doc, _ in sorted_rrf_score][:3] ## only top 3 documents
-    return best_docs
-
-def generateResponse(user_query, documents, chat_history, language="english"):
-    """
-    Generate a response based on user query, retrieved documents, and chat history.
-    
-    Args:
-        user_query (str): The user's question
-        documents (list): Retrieved documents from vector database
-        chat_history (list): Previous conversation history
-        language (str): Language preference ("hindi" or "english")
-    
-    Returns:
-        str: Generated response
-    """
-    try:
-        print(f"generateResponse called with language: {language}")
-        print(f"Number of documents: {len(documents)}")
-        
-        # Load the main RAG prompt
-        with open("prompts/mainRAG-prompt.md", "r", encoding="utf-8") as f:
-            main_prompt = f.read()
-        
-        # Add language instruction to the prompt
-        language_instruction = ""
-        if language == "hindi":
-            language_instruction = """
+## language instruction appended to the main RAG prompt
+LANGUAGE_INSTRUCTIONS = {
+    "hindi": """
 
 CRITICAL: You MUST respond ENTIRELY in Hindi (हिंदी) language. This is MANDATORY.
 - All headers must be in Hindi
@@ -121,9 +152,8 @@ CRITICAL: You MUST respond ENTIRELY in Hindi (हिंदी) language. This is
 - NO English text allowed in the response
 - The response must be 100% in Hindi
 
-यह एक अनिवार्य आवश्यकता है - आपको पूरी तरह से हिंदी में जवाब देना होगा।"""
-        else:
-            language_instruction = """
+यह एक अनिवार्य आवश्यकता है - आपको पूरी तरह से हिंदी में जवाब देना होगा।""",
+    "english": """
 
 CRITICAL: You MUST respond ENTIRELY in English language. This is MANDATORY.
 - All headers must be in English
@@ -134,111 +164,275 @@ CRITICAL: You MUST respond ENTIRELY in English language. This is MANDATORY.
 - NO Hindi text allowed in the response
 - The response must be 100% in English
 
-This is a mandatory requirement - you must respond completely in English."""
-        
-        main_prompt += language_instruction
-        
-        # Prepare context from documents
-        context = ""
-        if documents:
-            context = "\n\n".join([f"Document {i+1}:\n{doc.page_content}" for i, doc in enumerate(documents)])
-            print(f"Context length: {len(context)} characters")
-        else:
-            # Even without specific documents, provide general legal guidance
-            context = "No specific legal documents are available for this query, but I can provide general legal information based on legal principles and knowledge."
-        
-        # Prepare chat history context
-        history_context = ""
-        if chat_history:
-            history_context = "\n\nPrevious conversation:\n"
-            for msg in chat_history[-5:]:  # Last 5 messages
+This is a mandatory requirement - you must respond completely in English.""",
+}
+
+def compileMainPrompt(text):
+    """One template per language, with its instruction already appended"""
+    return {language: Template(text + instruction, ["user_query", "context", "chat_history", "language"])
+            for language, instruction in LANGUAGE_INSTRUCTIONS.items()}
+
+## prompts and the MultiQuery chain are compiled once and rebuilt only when their file changes
+prompt_registry = PromptRegistry()
+prompt_registry.register("mainRAG", os.path.join(current_dir, "prompts", "mainRAG-prompt.md"), compileMainPrompt)
+prompt_registry.register("multiQuery", os.path.join(current_dir, "prompts", "multiQuery-prompt.md"),
+                         lambda text: createMultiQueryChain(output_pydantic_object=MultiQuery, llm=llm, template=text))
+
+def multiQueryPromptVersion():
+    ## a prompt edit changes the expansions, so its digest is part of the cache key
+    return prompt_registry.version("multiQuery")
+
+def localMultiQuery(user_query, chat_history, prompt_version):
+    """The MultiQuery result from `query_router` or `expansion_cache`, or None if the LLM is needed"""
+    if query_router is not None:
+        resp = query_router.route(user_query, chat_history)
+        if resp is not None:
+            return resp
+    return expansion_cache.get(user_query, chat_history, prompt_version)
+
+def remainingQueries(user_query, queries):
+    """The expanded queries not already covered by the speculative retrieval of `user_query`"""
+    raw = normalize_query(user_query)
+    return [query for query in queries if normalize_query(query) != raw]
+
+def packContext(documents):
+    """
+    Build the {context} text from the ranked documents within `context_token_budget`,
+    merging adjacent chunks and adding their page neighbours while budget remains.
+    Returns `(context, stats)`.
+    """
+    return pack_context(documents, count_tokens=llm.get_num_tokens, budget=context_token_budget,
+                        fetch_by_ids=kb_batch_retriever.get_by_ids)
+
+def buildResponsePrompt(user_query, documents, chat_history, language="english", stats=None):
+    """
+    Fill the main RAG prompt with the language instruction, the packed context of
+    `documents` and the recent chat history. `stats` receives the context token counts.
+    """
+    print(f"Number of documents: {len(documents)}")
+    
+    # Main RAG prompt with the language instruction, compiled ahead of time
+    template = prompt_registry.get("mainRAG")["hindi" if language == "hindi" else "english"]
+    
+    # Prepare context from documents
+    context = ""
+    if documents:
+        context, context_stats = packContext(documents)
+        if stats is not None:
+            stats.update(context_stats)
+        print(f"Context: {context_stats['context_tokens']}/{context_stats['token_budget']} tokens, "
+              f"{context_stats['retrieved_chunks']} chunks packed into {context_stats['merged_passages']} passages "
+              f"with {context_stats['neighbor_chunks']} neighbouring chunks")
+    else:
+        # Even without specific documents, provide general legal guidance
+        context = "No specific legal documents are available for this query, but I can provide general legal information based on legal principles and knowledge."
+    
+    # Prepare chat history context
+    history_context = ""
+    if chat_history:
+        history_context = "\n\nPrevious conversation:\n"
+        for msg in chat_history[-5:]:  # Last 5 messages
+            if isinstance(msg, dict):
                 role = "User" if msg.get("role") == "user" else "Assistant"
                 content = msg.get("content", "")
-                history_context += f"{role}: {content}\n"
-            print(f"History context length: {len(history_context)} characters")
-        else:
-            history_context = "No previous conversation history."
-        
-        # Create the full prompt with proper variable substitution
-        full_prompt = main_prompt.replace("{user_query}", user_query)
-        full_prompt = full_prompt.replace("{context}", context)
-        full_prompt = full_prompt.replace("{chat_history}", history_context)
-        full_prompt = full_prompt.replace("{language}", language)
-        
-        print(f"Full prompt length: {len(full_prompt)} characters")
+            else:  # langchain messages of the REPL
+                role = "User" if msg.type == "human" else "Assistant"
+                content = msg.content
+            history_context += f"{role}: {content}\n"
+        print(f"History context length: {len(history_context)} characters")
+    else:
+        history_context = "No previous conversation history."
+    
+    # Create the full prompt with proper variable substitution
+    full_prompt = template.format(user_query=user_query, context=context, chat_history=history_context, language=language)
+    
+    print(f"Full prompt length: {len(full_prompt)} characters")
+    
+    return full_prompt
+
+def errorResponse(language="english"):
+    if language == "hindi":
+        return "क्षमा करें, आपके प्रश्न का उत्तर देने में एक त्रुटि आई। कृपया पुनः प्रयास करें।\n\n**कानूनी अस्वीकरण:**\n*यह जानकारी केवल शैक्षिक उद्देश्यों के लिए प्रदान की गई है और इसे कानूनी सलाह नहीं माना जाना चाहिए।*"
+    else:
+        return "Sorry, I encountered an error while generating a response. Please try again.\n\n**Legal Disclaimer:**\n*This information is provided for educational purposes only and should not be construed as legal advice.*"
+
+def extractSources(documents, top_n=3):
+    """Deduplicated, cleaned source names of the `top_n` best documents"""
+    sources = []
+    seen_sources = set()
+    for doc in documents[:top_n]:
+        source_name = None
+        if hasattr(doc, 'metadata'):
+            source_name = doc.metadata.get('source') or doc.metadata.get('file_path') or doc.metadata.get('filename')
+        if source_name:
+            # Clean the source name
+            source_name = source_name.replace('data/', '').replace('.pdf', '').replace('_', ' ')
+            if source_name not in seen_sources:
+                sources.append(source_name)
+                seen_sources.add(source_name)
+    return sources
+
+### ----------------------------------------------------------------------------------------------------
+## the pipeline is async for the API server: LLM calls are awaited, blocking local work runs in `encode_executor`
+
+async def runBlocking(fn, *args, **kwargs):
+    """Run a CPU-bound or blocking call in `encode_executor` without stalling the event loop"""
+    return await asyncio.get_running_loop().run_in_executor(encode_executor, functools.partial(fn, *args, **kwargs))
+
+async def allmMultiQuery(user_query, chat_history, prompt_version):
+    """Ask the MultiQuery LLM chain and cache a well-formed answer"""
+    chain = prompt_registry.get("multiQuery")
+    resp = await chain.ainvoke({"chat_history": chat_history, "user_query": user_query})
+    if isinstance(resp, dict) and "documentRetrievalRequired" in resp:
+        await runBlocking(expansion_cache.put, user_query, chat_history, resp, prompt_version)
+    return resp
+
+async def aplanRetrieval(user_query, chat_history):
+    """
+    `(multi_query_resp, ranked_documents)` for one message. While the MultiQuery LLM call
+    runs, the raw message is already being retrieved in `encode_executor`; its hit lists
+    are fused by `generateRRF` with those of the expanded queries, or the task is cancelled
+    when the LLM decides that no retrieval is required.
+    """
+    prompt_version = multiQueryPromptVersion()
+    resp = await runBlocking(localMultiQuery, user_query, chat_history, prompt_version)
+    speculative = None
+    if resp is None:
+        if speculative_retrieval:
+            speculative = asyncio.ensure_future(runBlocking(kb_batch_retriever.retrieve, [user_query]))
+            speculative_stats["started"] += 1
+        try:
+            resp = await allmMultiQuery(user_query, chat_history, prompt_version)
+        except BaseException:
+            if speculative is not None:
+                speculative.cancel()
+                speculative_stats["discarded"] += 1
+            raise
+    print(f"Multi-query response: {resp}")
+
+    if not resp.get('documentRetrievalRequired', False):
+        if speculative is not None:
+            speculative.cancel()
+            speculative_stats["discarded"] += 1
+        return resp, []
+    queries = resp.get('generatedQueries', [])
+    retrieved_docs = []
+    if speculative is not None:
+        retrieved_docs = await speculative
+        speculative_stats["used"] += 1
+        queries = remainingQueries(user_query, queries)
+    if queries:
+        retrieved_docs = retrieved_docs + await runBlocking(kb_batch_retriever.retrieve, queries)
+    print(f"Retrieved {sum(len(docs) for docs in retrieved_docs)} documents for {len(retrieved_docs)} distinct queries")
+    return resp, generateRRF(retrieved_docs)
+
+async def agenerateResponse(user_query, documents, chat_history, language="english", stats=None):
+    """
+    Generate a response based on user query, retrieved documents, and chat history.
+    
+    Args:
+        user_query (str): The user's question
+        documents (list): Retrieved documents from vector database
+        chat_history (list): Previous conversation history
+        language (str): Language preference ("hindi" or "english")
+        stats (dict): Optional dict that receives the context token counts of this request,
+            and `failed` when the LLM call failed and the error response was returned
+    
+    Returns:
+        str: Generated response
+    """
+    try:
+        print(f"agenerateResponse called with language: {language}")
+        full_prompt = await runBlocking(buildResponsePrompt, user_query, documents, chat_history, language, stats)
         
-        # Generate response using OpenAI
         print("Calling OpenAI API...")
-        response = llm.invoke(full_prompt)
+        response = await llm.ainvoke(full_prompt)
         print(f"OpenAI response received, length: {len(response.content)} characters")
         
-        # Post-process the response to ensure proper formatting
-        formatted_response = response.content.strip()
-        
-        # Language verification and enforcement
-        if language == "hindi":
-            # Check if response contains English text and replace with Hindi equivalents
-            if "Introduction:" in formatted_response:
-                formatted_response = formatted_response.replace("Introduction:", "**परिचय:**")
-            if "Key Provisions:" in formatted_response:
-                formatted_response = formatted_response.replace("Key Provisions:", "**मुख्य प्रावधान:**")
-            if "Scope and Application:" in formatted_response:
-                formatted_response = formatted_response.replace("Scope and Application:", "**कार्यक्षेत्र और अनुप्रयोग:**")
-            if "Procedures and Requirements:" in formatted_response:
-                formatted_response = formatted_response.replace("Procedures and Requirements:", "**प्रक्रियाएं और आवश्यकताएं:**")
-            if "Important Considerations:" in formatted_response:
-                formatted_response = formatted_response.replace("Important Considerations:", "**महत्वपूर्ण विचार:**")
-            if "Conclusion:" in formatted_response:
-                formatted_response = formatted_response.replace("Conclusion:", "**निष्कर्ष:**")
-            if "Legal Disclaimer:" in formatted_response:
-                formatted_response = formatted_response.replace("Legal Disclaimer:", "**कानूनी अस्वीकरण:**")
-            
-            # Replace common English legal terms with Hindi equivalents
-            english_to_hindi_replacements = {
-                "This information is provided for educational purposes only": "यह जानकारी केवल शैक्षिक उद्देश्यों के लिए प्रदान की गई है",
-                "should not be construed as legal advice": "और इसे कानूनी सलाह नहीं माना जाना चाहिए",
-                "For specific legal matters": "विशिष्ट कानूनी मामलों के लिए",
-                "please consult with a qualified legal professional": "कृपया एक योग्य कानूनी पेशेवर से परामर्श करें",
-                "Sources:": "स्रोत:",
-                "Follow-up questions:": "अगले प्रश्न:"
-            }
-            
-            for english, hindi in english_to_hindi_replacements.items():
-                formatted_response = formatted_response.replace(english, hindi)
-        
-        # Ensure the response has proper structure
-        if not formatted_response.startswith("**") and not formatted_response.startswith("#"):
-            # Add basic structure if missing
-            if language == "hindi":
-                formatted_response = f"**परिचय:**\n{formatted_response}\n\n**कानूनी अस्वीकरण:**\n*यह जानकारी केवल शैक्षिक उद्देश्यों के लिए प्रदान की गई है और इसे कानूनी सलाह नहीं माना जाना चाहिए। विशिष्ट कानूनी मामलों के लिए, कृपया एक योग्य कानूनी पेशेवर से परामर्श करें।*"
-            else:
-                formatted_response = f"**Introduction:**\n{formatted_response}\n\n**Legal Disclaimer:**\n*This information is provided for educational purposes only and should not be construed as legal advice. For specific legal matters, please consult with a qualified legal professional.*"
-        
-        # Final check: Ensure the response doesn't refuse to answer legal questions
-        refusal_phrases = [
-            "i can only help with legal research questions",
-            "i can only help with legal research",
-            "please ask me about legal topics",
-            "i cannot help with this",
-            "i don't have information about this"
-        ]
-        
-        if any(phrase in formatted_response.lower() for phrase in refusal_phrases):
-            # If response refuses to answer, provide a helpful response instead
-            if language == "hindi":
-                formatted_response = f"**परिचय:**\nमैं आपके कानूनी प्रश्न का उत्तर देने में आपकी सहायता कर सकता हूं। यह एक सामान्य कानूनी विषय है जिसके बारे में मैं आपको जानकारी प्रदान कर सकता हूं।\n\n**मुख्य जानकारी:**\n{user_query} के बारे में सामान्य कानूनी जानकारी यहां उपलब्ध है। कृपया ध्यान दें कि यह सामान्य जानकारी है और विशिष्ट विवरण भिन्न हो सकते हैं।\n\n**कानूनी अस्वीकरण:**\n*यह जानकारी केवल शैक्षिक उद्देश्यों के लिए प्रदान की गई है और इसे कानूनी सलाह नहीं माना जाना चाहिए। विशिष्ट कानूनी मामलों के लिए, कृपया एक योग्य कानूनी पेशेवर से परामर्श करें।*"
-            else:
-                formatted_response = f"**Introduction:**\nI can help you with your legal question. This is a general legal topic about which I can provide you with information.\n\n**Key Information:**\nGeneral legal information about {user_query} is available here. Please note that this is general information and specific details may vary.\n\n**Legal Disclaimer:**\n*This information is provided for educational purposes only and should not be construed as legal advice. For specific legal matters, please consult with a qualified legal professional.*"
-        
-        return formatted_response
+        return post_process(response.content, user_query, language)
         
     except Exception as e:
         print(f"Error generating response: {e}")
         print(f"Error traceback: {traceback.format_exc()}")
-        if language == "hindi":
-            return "क्षमा करें, आपके प्रश्न का उत्तर देने में एक त्रुटि आई। कृपया पुनः प्रयास करें।\n\n**कानूनी अस्वीकरण:**\n*यह जानकारी केवल शैक्षिक उद्देश्यों के लिए प्रदान की गई है और इसे कानूनी सलाह नहीं माना जाना चाहिए।*"
-        else:
-            return "Sorry, I encountered an error while generating a response. Please try again.\n\n**Legal Disclaimer:**\n*This information is provided for educational purposes only and should not be construed as legal advice.*"
+        if stats is not None:
+            stats["failed"] = True
+        return errorResponse(language)
+
+async def astreamResponse(user_query, documents, chat_history, language="english", stats=None):
+    """
+    Like `agenerateResponse`, but yields the raw answer text piece by piece as the LLM
+    produces it; the caller post-processes it with a `ResponsePostProcessor`.
+    """
+    full_prompt = await runBlocking(buildResponsePrompt, user_query, documents, chat_history, language, stats)
+    print("Streaming from OpenAI API...")
+    async for chunk in llm.astream(full_prompt):
+        if chunk.content:
+            yield chunk.content
+
+async def astreamChat(user_query, chat_history, language="english"):
+    """
+    Run the RAG pipeline for one message as a stream of `(event, data)` pairs:
+    `("sources", [...])` as soon as ranking is done, `("token", text)` for every piece of
+    the post-processed answer as it arrives, and finally `("done", {"response", "sources",
+    "context_tokens", "replaced"})`. `replaced` is set when a refusal was detected and
+    `response` is a generic answer instead of the streamed text.
+    """
+    _, ranked_documents = await aplanRetrieval(user_query, chat_history)
+    sources = extractSources(ranked_documents)
+    yield "sources", sources
+
+    context_stats = {}
+    processor = ResponsePostProcessor(user_query, language)
+    async for piece in astreamResponse(user_query, ranked_documents, chat_history, language, stats=context_stats):
+        text = processor.feed(piece)
+        if text:
+            yield "token", text
+    text = processor.finish()
+    if text:
+        yield "token", text
+    yield "done", {
+        "response": processor.response,
+        "sources": sources,
+        "context_tokens": context_stats.get("context_tokens"),
+        "replaced": processor.refused,
+    }
+
+### ----------------------------------------------------------------------------------------------------
+## sync entry points for the CLI and the test scripts
+
+_sync_loop = None
+
+def runSync(coro):
+    """
+    Run `coro` to completion from synchronous code. Every call shares one event loop, since
+    the OpenAI client keeps its connections on the loop that opened them.
+    """
+    global _sync_loop
+    if _sync_loop is None:
+        _sync_loop = asyncio.new_event_loop()
+    return _sync_loop.run_until_complete(coro)
+
+def generateResponse(user_query, documents, chat_history, language="english", stats=None):
+    """Sync `agenerateResponse`"""
+    return runSync(agenerateResponse(user_query, documents, chat_history, language, stats))
+
+async def printChat(user_query, chat_history):
+    """Print the answer of `astreamChat` as it streams, returning the final response"""
+    ai_resp = ""
+    started = False
+    async for event, data in astreamChat(user_query, chat_history):
+        if event == "token":
+            if not started:
+                print("\033[1m> AI:\033[0m ", end="")
+                started = True
+            print(data, flush=True, end="")
+        elif event == "done":
+            ai_resp = data["response"]
+            if data["replaced"]:
+                print(f"\n\n{ai_resp}", end="")
+            if data["sources"]:
+                print(f"\n\n📚 Sources: {', '.join(data['sources'])}", end="")
+    return ai_resp
 
 if __name__=="__main__":
     ## initial chat state
@@ -259,8 +453,6 @@ if __name__=="__main__":
     
     while True:
         try:
-            retrieved_docs = []
-
             ## user input
             print("\n\033[1m> Human:\033[0m ", end="")
             user_query = input().strip()
@@ -274,27 +466,14 @@ if __name__=="__main__":
                     time.sleep(0.03)
                 break
 
-            ## multiquery
-            chain = createMultiQueryChain(output_pydantic_object=MultiQuery, llm=llm)
-            resp = chain.invoke({"chat_history": chat_history, "user_query": user_query})
+            ## stream the answer as the LLM produces it
+            try:
+                ai_resp = runSync(printChat(user_query, chat_history))
+            except Exception as e:
+                print(f"Error generating response: {e}")
+                ai_resp = errorResponse()
+                print(f"\033[1m> AI:\033[0m {ai_resp}", end="")
             chat_history.append(HumanMessage(content=user_query))
-
-            if resp['documentRetrievalRequired']:
-                ## retrieve documents for each query
-                multiQueries = resp['generatedQueries']
-                for query in multiQueries:
-                    retrieved_docs.append(kb_retriever.invoke(query))
-                
-                ranked_documents = generateRRF(retrieved_docs)
-                ai_resp = generateResponse(user_query=user_query, documents=ranked_documents, chat_history=chat_history)
-            else:
-                ai_resp = generateResponse(user_query=user_query, documents=[], chat_history=chat_history)
-            
-            ## print AI response
-            print("\033[1m> AI:\033[0m ", end="")
-            for letter in ai_resp:
-                print(letter, flush=True, end="")
-                time.sleep(0.03)
             
             ## append AI response to chat history
             chat_history.append(AIMessage(content=ai_resp))
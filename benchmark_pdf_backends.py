@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Benchmark the PDF text-extraction backends on a sample of `data/`.
+
+Each backend runs in a fresh process so its peak RSS is measured in isolation.
+Reports pages/sec, MB/sec, peak RSS and characters extracted per page, which is a
+rough check that a fast backend is not silently dropping text.
+
+    python benchmark_pdf_backends.py --sample 25 --backends pypdf pymupdf
+"""
+
+import argparse
+import multiprocessing
+import os
+import queue
+import random
+import sys
+import time
+
+from pdf_backends import BACKENDS, get_backend
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+data_path = os.path.join(current_dir, "data")
+
+def get_peak_rss_mb():
+    """Peak resident set size of this process in MB, or None where `resource` is unavailable"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    ## ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def run_backend(backend, paths, results):
+    load = get_backend(backend)
+    pages = chars = failures = 0
+    start = time.perf_counter()
+    for path in paths:
+        try:
+            docs = load(path)
+        except ImportError as e:
+            results.put({"backend": backend, "error": str(e)})
+            return
+        except Exception:
+            failures += 1
+            continue
+        pages += len(docs)
+        chars += sum(len(doc.page_content) for doc in docs)
+    elapsed = time.perf_counter() - start
+    results.put({
+        "backend": backend,
+        "pages": pages,
+        "chars": chars,
+        "failures": failures,
+        "elapsed": elapsed,
+        "peak_rss_mb": get_peak_rss_mb(),
+    })
+
+def wait_for_result(backend, process, results, timeout):
+    """The worker's result, or a failed row if it crashes or runs longer than `timeout` seconds"""
+    deadline = time.monotonic() + timeout if timeout else None
+    while True:
+        try:
+            return results.get(timeout=1)
+        except queue.Empty:
+            pass
+        if not process.is_alive():
+            ## the worker may have put its result just before exiting
+            try:
+                return results.get(timeout=1)
+            except queue.Empty:
+                return {"backend": backend, "failed": f"worker exited with code {process.exitcode}"}
+        if deadline is not None and time.monotonic() > deadline:
+            process.terminate()
+            return {"backend": backend, "failed": f"timed out after {timeout}s"}
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare PDF text-extraction backends on a sample of data/")
+    parser.add_argument("--backends", nargs="+", choices=list(BACKENDS), default=list(BACKENDS))
+    parser.add_argument("--sample", type=int, default=20, help="number of PDFs to sample from data/ (default: 20)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for the sample (default: 0)")
+    parser.add_argument("--timeout", type=float, default=1800, help="seconds before a backend is given up on, 0 for none (default: 1800)")
+    args = parser.parse_args()
+
+    pdfs = sorted(pdf for pdf in os.listdir(data_path) if pdf.endswith(".pdf"))
+    random.Random(args.seed).shuffle(pdfs)
+    paths = [os.path.join(data_path, pdf) for pdf in pdfs[:args.sample]]
+    total_mb = sum(os.path.getsize(path) for path in paths) / (1024 * 1024)
+
+    print("🧪 PDF Extraction Backend Benchmark")
+    print("=" * 50)
+    print(f"📚 Sample: {len(paths)} PDFs, {total_mb:.1f} MB (seed {args.seed})\n")
+
+    ## spawn so every backend starts from a clean interpreter and its RSS is its own
+    ctx = multiprocessing.get_context("spawn")
+    rows = []
+    for backend in args.backends:
+        print(f"⏳ Running {backend}...")
+        results = ctx.Queue()
+        process = ctx.Process(target=run_backend, args=(backend, paths, results))
+        process.start()
+        result = wait_for_result(backend, process, results, args.timeout)
+        process.join()
+        rows.append(result)
+
+    print()
+    print(f"{'backend':<12}{'pages/sec':>12}{'MB/sec':>10}{'peak RSS MB':>14}{'chars/page':>12}{'failed':>8}")
+    print("-" * 68)
+    for row in rows:
+        if "error" in row:
+            print(f"{row['backend']:<12}  skipped: {row['error']}")
+            continue
+        if "failed" in row:
+            print(f"{row['backend']:<12}  failed: {row['failed']}")
+            continue
+        elapsed = max(row["elapsed"], 1e-9)
+        rss = f"{row['peak_rss_mb']:.0f}" if row["peak_rss_mb"] is not None else "n/a"
+        print(f"{row['backend']:<12}{row['pages'] / elapsed:>12.1f}{total_mb / elapsed:>10.2f}{rss:>14}"
+              f"{row['chars'] / max(row['pages'], 1):>12.0f}{row['failures']:>8}")
+
+if __name__ == "__main__":
+    main()
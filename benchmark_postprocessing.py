@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Compare the single-pass response post-processor with the previous chain of `in`
+checks and `str.replace` calls.
+
+Synthetic English and Hindi answers (with and without headers, disclaimers and
+refusals) are post-processed whole by both implementations and streamed in small
+chunks through `ResponsePostProcessor`. Streaming with the previous implementation
+means re-running it on the accumulated text after every chunk, which is reported as
+well. Every output is checked against the previous implementation first.
+
+    python benchmark_postprocessing.py --responses 2000 --chunk 4
+"""
+
+import argparse
+import random
+import time
+
+from response_postprocessor import (HINDI_REPLACEMENTS, REFUSAL_PHRASES, REFUSAL_RESPONSES, STRUCTURE,
+                                    ResponsePostProcessor, post_process)
+
+def legacy_post_process(response_text, user_query, language="english"):
+    """The post-processing `generateResponse` applied before the single-pass matcher"""
+    formatted_response = response_text.strip()
+    if language == "hindi":
+        for header in ["Introduction:", "Key Provisions:", "Scope and Application:", "Procedures and Requirements:",
+                       "Important Considerations:", "Conclusion:", "Legal Disclaimer:"]:
+            if header in formatted_response:
+                formatted_response = formatted_response.replace(header, HINDI_REPLACEMENTS[header])
+        for english in ["This information is provided for educational purposes only", "should not be construed as legal advice",
+                        "For specific legal matters", "please consult with a qualified legal professional",
+                        "Sources:", "Follow-up questions:"]:
+            formatted_response = formatted_response.replace(english, HINDI_REPLACEMENTS[english])
+    if not formatted_response.startswith("**") and not formatted_response.startswith("#"):
+        prefix, suffix = STRUCTURE["hindi" if language == "hindi" else "english"]
+        formatted_response = f"{prefix}{formatted_response}{suffix}"
+    if any(phrase in formatted_response.lower() for phrase in REFUSAL_PHRASES):
+        formatted_response = REFUSAL_RESPONSES["hindi" if language == "hindi" else "english"].format(user_query=user_query)
+    return formatted_response
+
+ENGLISH_LINES = [
+    "The Act applies to every person who ordinarily resides in India.",
+    "Section 438 allows a person to seek anticipatory bail from the Sessions Court or the High Court.",
+    "A tenant may not be evicted without notice under the applicable rent control law.",
+    "The court may impose a fine or imprisonment, or both, depending on the offence.",
+    "Any agreement in restraint of marriage is void under the Indian Contract Act.",
+]
+HINDI_LINES = [
+    "यह अधिनियम भारत में सामान्य रूप से निवास करने वाले प्रत्येक व्यक्ति पर लागू होता है।",
+    "धारा 438 के अंतर्गत व्यक्ति सत्र न्यायालय या उच्च न्यायालय से अग्रिम जमानत मांग सकता है।",
+    "किरायेदार को बिना सूचना के बेदखल नहीं किया जा सकता है।",
+    "न्यायालय अपराध के आधार पर जुर्माना या कारावास, या दोनों लगा सकता है।",
+]
+
+def make_response(rng, language):
+    """A synthetic answer of about 2-4 KB, like the ones the main RAG prompt produces"""
+    lines = HINDI_LINES if language == "hindi" else ENGLISH_LINES
+    parts = []
+    if rng.random() < 0.7:
+        parts.append(rng.choice(["**Introduction:**", "# Introduction", "Introduction:"]))
+    for header in ["Key Provisions:", "Scope and Application:", "Important Considerations:", "Conclusion:"]:
+        parts.append(f"**{header}**" if rng.random() < 0.5 else header)
+        parts.extend(rng.choice(lines) for _ in range(rng.randint(3, 8)))
+    if rng.random() < 0.05:
+        parts.append(rng.choice(REFUSAL_PHRASES).capitalize() + ".")
+    parts.append("Sources: " + ", ".join(rng.sample(["IPC", "CrPC", "Advocates Act, 1961", "RTI Act"], 2)))
+    parts.append("Follow-up questions:\n- What is the procedure?\n- Who can apply?")
+    parts.append("**Legal Disclaimer:**\n*This information is provided for educational purposes only and should not be "
+                 "construed as legal advice. For specific legal matters, please consult with a qualified legal professional.*")
+    return "  \n" + "\n\n".join(parts) + "\n "
+
+def chunks_of(text, size, rng):
+    """Token-sized pieces of `text`, varying around `size` characters"""
+    pos = 0
+    while pos < len(text):
+        step = rng.randint(1, 2 * size - 1)
+        yield text[pos:pos + step]
+        pos += step
+
+def stream(text, user_query, language, pieces):
+    processor = ResponsePostProcessor(user_query, language)
+    shown = [processor.feed(piece) for piece in pieces]
+    shown.append(processor.finish())
+    return processor.response, "".join(shown)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the single-pass response post-processor with the previous one")
+    parser.add_argument("--responses", type=int, default=2000, help="number of synthetic answers (default: 2000)")
+    parser.add_argument("--chunk", type=int, default=4, help="average streamed chunk size in characters (default: 4)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed (default: 0)")
+    args = parser.parse_args()
+
+    print("🧪 Response Post-Processing Benchmark")
+    print("=" * 50)
+    rng = random.Random(args.seed)
+    cases = []
+    for i in range(args.responses):
+        language = "hindi" if i % 2 else "english"
+        text = make_response(rng, language)
+        cases.append((text, f"question {i}", language, list(chunks_of(text, args.chunk, rng))))
+    total_chars = sum(len(text) for text, _, _, _ in cases)
+    print(f"📚 {len(cases)} answers, {total_chars / len(cases):.0f} characters and "
+          f"{sum(len(pieces) for *_, pieces in cases) / len(cases):.0f} chunks on average\n")
+
+    ## the streamed text matches the final answer unless a refusal replaced it
+    mismatches = 0
+    for text, user_query, language, pieces in cases:
+        expected = legacy_post_process(text, user_query, language)
+        response, shown = stream(text, user_query, language, pieces)
+        processor = ResponsePostProcessor(user_query, language)
+        processor.feed(text)
+        processor.finish()
+        if post_process(text, user_query, language) != expected or response != expected \
+                or (not processor.refused and shown != expected):
+            mismatches += 1
+    print(f"✅ Outputs identical to the previous implementation" if not mismatches
+          else f"❌ {mismatches} answers differ from the previous implementation")
+
+    timings = {}
+    start = time.perf_counter()
+    for text, user_query, language, _ in cases:
+        legacy_post_process(text, user_query, language)
+    timings["previous, whole answer"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for text, user_query, language, pieces in cases:
+        accumulated = ""
+        for piece in pieces:
+            accumulated += piece
+            legacy_post_process(accumulated, user_query, language)
+    timings["previous, per chunk"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for text, user_query, language, _ in cases:
+        post_process(text, user_query, language)
+    timings["single pass, whole answer"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for text, user_query, language, pieces in cases:
+        stream(text, user_query, language, pieces)
+    timings["single pass, streamed"] = time.perf_counter() - start
+
+    print()
+    print(f"{'implementation':<28}{'µs/answer':>12}{'MB/s':>10}")
+    print("-" * 50)
+    for name, seconds in timings.items():
+        print(f"{name:<28}{seconds / len(cases) * 1e6:>12.1f}{total_chars / seconds / 1e6:>10.1f}")
+
+if __name__ == "__main__":
+    main()
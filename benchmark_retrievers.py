@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Compare the Chroma and memory-mapped NumPy retriever backends on the local index.
+
+Reports open time, single-query and batched latency, and recall@k of each backend
+against an exact float32 search over the exported vectors. Queries are stored chunk
+vectors with a little noise added, or the lines of `--query-file` encoded with
+all-MiniLM-L6-v2.
+
+    python benchmark_retrievers.py --queries 200 --k 5
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+load_dotenv()
+
+from langchain_chroma import Chroma
+
+from matrix_store import MatrixStore, store_exists
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+persistent_directory = os.path.join(current_dir, "data-ingestion-local")
+matrix_store_directory = os.path.join(persistent_directory, "vector-matrix")
+
+def percentile_ms(seconds, q):
+    return float(np.percentile(seconds, q)) * 1000
+
+def recall_at_k(results, truth):
+    hits = sum(len(set(found) & set(expected)) for found, expected in zip(results, truth))
+    return hits / max(sum(len(expected) for expected in truth), 1)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the Chroma and NumPy retriever backends")
+    parser.add_argument("--queries", type=int, default=200, help="number of sampled query vectors (default: 200)")
+    parser.add_argument("--query-file", help="text file with one query per line, encoded with all-MiniLM-L6-v2")
+    parser.add_argument("--k", type=int, default=5, help="results per query (default: 5)")
+    parser.add_argument("--batch", type=int, default=5, help="queries per batched search, like the generated MultiQuery set (default: 5)")
+    parser.add_argument("--noise", type=float, default=0.05, help="std of the noise added to sampled chunk vectors (default: 0.05)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed (default: 0)")
+    args = parser.parse_args()
+
+    if not store_exists(matrix_store_directory):
+        raise FileNotFoundError(f"[ALERT] {matrix_store_directory} doesn't exist, run data-ingestion.py first. ⚠️⚠️")
+
+    print("🧪 Retriever Backend Benchmark")
+    print("=" * 50)
+
+    ## open time includes the first search, which is when Chroma loads its HNSW index
+    start = time.perf_counter()
+    store = MatrixStore(matrix_store_directory)
+    dim = store.vectors.shape[1]
+    store.search_by_vectors([[1.0] * dim], k=1)
+    matrix_open = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vectorDB = Chroma(persist_directory=persistent_directory)
+    vectorDB._collection.query(query_embeddings=[[1.0] * dim], n_results=1)
+    chroma_open = time.perf_counter() - start
+
+    rng = np.random.default_rng(args.seed)
+    if args.query_file:
+        from langchain_huggingface.embeddings import HuggingFaceEmbeddings
+        with open(args.query_file, encoding="utf-8") as f:
+            texts = [line.strip() for line in f if line.strip()]
+        queries = np.array(HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2").embed_documents(texts), dtype=np.float32)
+    else:
+        rows = rng.choice(len(store), size=min(args.queries, len(store)), replace=False)
+        queries = np.asarray(store.vectors[np.sort(rows)], dtype=np.float32)
+        queries += rng.normal(0, args.noise, queries.shape).astype(np.float32)
+    queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+    k = min(args.k, len(store))
+    print(f"📚 {len(store)} chunks ({store.vectors.dtype}), {len(queries)} queries, k={k}\n")
+
+    ## ground truth: exact float32 search over the exported vectors
+    exact = np.asarray(store.vectors, dtype=np.float32) @ queries.T
+    truth = [[store.chunk_ids[row].decode("ascii") for row in np.argsort(-column)[:k]] for column in exact.T]
+
+    def run_chroma(batch):
+        results = vectorDB._collection.query(query_embeddings=batch.tolist(), n_results=k, include=["documents", "metadatas"])
+        return results["ids"]
+
+    def run_matrix(batch):
+        return [[doc.id for doc in docs] for docs in store.search_by_vectors(batch, k=k)]
+
+    rows = []
+    for name, run, opened in (("chroma", run_chroma, chroma_open), ("numpy", run_matrix, matrix_open)):
+        print(f"⏳ Running {name}...")
+        single, found = [], []
+        for query in queries:
+            start = time.perf_counter()
+            found.extend(run(query[None, :]))
+            single.append(time.perf_counter() - start)
+        batched = []
+        for i in range(0, len(queries), args.batch):
+            start = time.perf_counter()
+            run(queries[i:i + args.batch])
+            batched.append(time.perf_counter() - start)
+        rows.append((name, opened, single, batched, recall_at_k(found, truth)))
+
+    print()
+    print(f"{'backend':<10}{'open ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'batch p50 ms':>14}{'recall@k':>10}")
+    print("-" * 64)
+    for name, opened, single, batched, recall in rows:
+        print(f"{name:<10}{opened * 1000:>10.1f}{percentile_ms(single, 50):>10.2f}{percentile_ms(single, 95):>10.2f}"
+              f"{percentile_ms(batched, 50):>14.2f}{recall:>10.3f}")
+
+if __name__ == "__main__":
+    main()
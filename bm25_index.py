@@ -0,0 +1,196 @@
+"""
+Persisted BM25 inverted index over the chunks in the vector store.
+
+Dense MiniLM search is weak on exact tokens such as "Section 438", "Order XXXIX" or an
+act's short title. `data-ingestion.py` rebuilds this index from the stored chunks after
+every run that changes them, and `BatchRetriever` adds its hits as extra ranked lists
+for `generateRRF` to fuse with the vector hits.
+
+Each posting stores its precomputed BM25 term weight, so a query only gathers the
+postings of its terms and sums them. The posting arrays are `.npy` files opened with
+`mmap_mode="r"`:
+
+    meta.json       chunk count, average length, k1, b
+    vocab.json      term -> term id
+    offsets.npy     int64, postings of term t are [offsets[t], offsets[t + 1])
+    docs.npy        int32 chunk row of each posting
+    weights.npy     float32 BM25 weight of each posting
+    chunk_ids.npy   chunk ID of each row
+    source_rows.npy int32 index into sources.json of each row, for the act filter
+    sources.json    distinct `source` values
+"""
+
+import json
+import os
+import re
+import shutil
+import threading
+from array import array
+
+import numpy as np
+
+## `\w` does not match Devanagari vowel signs and viramas, which would split "नमस्ते" into "नमस" and "त";
+## the class adds the Devanagari block except the danda punctuation "।" and "॥"
+token_re = re.compile(r"[\w\u0900-\u0963\u0966-\u097F]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or shall that the this "
+    "to was were what when which who with".split()
+)
+
+def words(text):
+    """Case-folded words of `text`, shared by the act index and the query router"""
+    return token_re.findall(text.casefold())
+
+def tokenize(text):
+    return [token for token in words(text) if token not in STOPWORDS]
+
+def index_exists(index_dir):
+    ## indexes written before the act filter have no per-row sources and are rebuilt by the next ingestion
+    return all(os.path.exists(os.path.join(index_dir, name)) for name in ("meta.json", "source_rows.npy"))
+
+def build_index(index_dir, chunks, k1=1.5, b=0.75):
+    """
+    Build the index from `(chunk_id, text, source)` triples and swap it into `index_dir`.
+    Returns the number of chunks indexed.
+    """
+    vocab = {}
+    chunk_ids = []
+    sources = {}
+    source_rows = array("i")
+    doc_lengths = array("i")
+    term_ids, doc_ids, tfs = array("i"), array("i"), array("i")
+    for row, (chunk_id, text, source) in enumerate(chunks):
+        counts = {}
+        tokens = tokenize(text or "")
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        chunk_ids.append(chunk_id)
+        source_rows.append(sources.setdefault(source or "", len(sources)))
+        doc_lengths.append(len(tokens))
+        for term, tf in counts.items():
+            term_ids.append(vocab.setdefault(term, len(vocab)))
+            doc_ids.append(row)
+            tfs.append(tf)
+
+    num_chunks = len(chunk_ids)
+    term_ids = np.frombuffer(term_ids, dtype=np.int32)
+    doc_ids = np.frombuffer(doc_ids, dtype=np.int32)
+    tfs = np.frombuffer(tfs, dtype=np.int32).astype(np.float32)
+    doc_lengths = np.frombuffer(doc_lengths, dtype=np.int32).astype(np.float32)
+    avg_length = float(doc_lengths.mean()) if num_chunks else 0.0
+
+    ## group the postings by term, keeping chunk order within each term
+    order = np.argsort(term_ids, kind="stable")
+    df = np.bincount(term_ids, minlength=len(vocab))
+    offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+    np.cumsum(df, out=offsets[1:])
+
+    idf = np.log1p((num_chunks - df + 0.5) / (df + 0.5)).astype(np.float32)
+    norm = k1 * (1 - b + b * doc_lengths[doc_ids] / max(avg_length, 1e-9))
+    weights = idf[term_ids] * tfs * (k1 + 1) / (tfs + norm)
+
+    ## write next to the live index and swap directories, open memory maps keep reading the old files
+    tmp_dir = f"{index_dir}.tmp"
+    old_dir = f"{index_dir}.old"
+    for path in (tmp_dir, old_dir):
+        shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    np.save(os.path.join(tmp_dir, "offsets.npy"), offsets)
+    np.save(os.path.join(tmp_dir, "docs.npy"), doc_ids[order])
+    np.save(os.path.join(tmp_dir, "weights.npy"), weights[order].astype(np.float32))
+    np.save(os.path.join(tmp_dir, "chunk_ids.npy"), np.array(chunk_ids, dtype="S") if chunk_ids else np.zeros(0, dtype="S32"))
+    np.save(os.path.join(tmp_dir, "source_rows.npy"), np.frombuffer(source_rows, dtype=np.int32))
+    with open(os.path.join(tmp_dir, "vocab.json"), "w", encoding="utf-8") as f:
+        json.dump(vocab, f, ensure_ascii=False)
+    with open(os.path.join(tmp_dir, "sources.json"), "w", encoding="utf-8") as f:
+        json.dump(list(sources), f, ensure_ascii=False)
+    with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+        json.dump({"num_chunks": num_chunks, "avg_length": avg_length, "k1": k1, "b": b}, f)
+    if os.path.exists(index_dir):
+        os.replace(index_dir, old_dir)
+    os.replace(tmp_dir, index_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return num_chunks
+
+class _IndexFiles:
+    """One opened version of the index; a reload builds a new one instead of changing this one"""
+
+    def __init__(self, index_dir=None):
+        self.num_chunks = 0
+        self.vocab = {}
+        if index_dir is None:
+            return
+        with open(os.path.join(index_dir, "meta.json")) as f:
+            meta = json.load(f)
+        with open(os.path.join(index_dir, "vocab.json"), encoding="utf-8") as f:
+            self.vocab = json.load(f)
+        with open(os.path.join(index_dir, "sources.json"), encoding="utf-8") as f:
+            self.source_index = {source: i for i, source in enumerate(json.load(f))}
+        self.offsets = np.load(os.path.join(index_dir, "offsets.npy"), mmap_mode="r")
+        self.docs = np.load(os.path.join(index_dir, "docs.npy"), mmap_mode="r")
+        self.weights = np.load(os.path.join(index_dir, "weights.npy"), mmap_mode="r")
+        self.chunk_ids = np.load(os.path.join(index_dir, "chunk_ids.npy"), mmap_mode="r")
+        self.source_rows = np.load(os.path.join(index_dir, "source_rows.npy"), mmap_mode="r")
+        self.row_of = {chunk_id.decode("ascii"): row for row, chunk_id in enumerate(self.chunk_ids)}
+        self.num_chunks = meta["num_chunks"]
+
+class BM25Index:
+    """
+    Read side of the index; an index that has not been built yet simply returns no hits.
+    `load` swaps in a whole new `_IndexFiles`, so a search running on another thread
+    keeps reading the version it started with.
+    """
+
+    def __init__(self, index_dir):
+        self.index_dir = index_dir
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """(Re)open the index files, e.g. after ingestion rebuilt them"""
+        with self._lock:
+            self._files = _IndexFiles(self.index_dir if index_exists(self.index_dir) else None)
+
+    def __len__(self):
+        return self._files.num_chunks
+
+    def search(self, query, k=5, sources=None, chunk_ids=()):
+        """
+        Top `k` `(chunk_id, score)` pairs for `query`, best first. With `sources`, only
+        chunks of those sources and the chunks in `chunk_ids` are ranked.
+        """
+        files = self._files
+        term_ids = {files.vocab[token] for token in tokenize(query) if token in files.vocab}
+        if not term_ids:
+            return []
+        spans = [(files.offsets[t], files.offsets[t + 1]) for t in term_ids]
+        docs = np.concatenate([files.docs[start:end] for start, end in spans])
+        weights = np.concatenate([files.weights[start:end] for start, end in spans])
+        scores = np.bincount(docs, weights=weights, minlength=files.num_chunks)
+        if sources is not None:
+            allowed = np.isin(files.source_rows, [files.source_index[source] for source in sources if source in files.source_index])
+            allowed[[files.row_of[chunk_id] for chunk_id in chunk_ids if chunk_id in files.row_of]] = True
+            scores[~allowed] = 0
+        k = min(k, np.count_nonzero(scores))
+        if not k:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(files.chunk_ids[row].decode("ascii"), float(scores[row])) for row in top]
+
+    def stats(self):
+        files = self._files
+        return {"chunks": files.num_chunks, "terms": len(files.vocab)}
+
+def rebuild_from_store(vectorDB, index_dir, batch_size=5000):
+    """Rebuild the index from every chunk currently in the Chroma store"""
+    def chunks():
+        offset = 0
+        while True:
+            page = vectorDB._collection.get(include=["documents", "metadatas"], limit=batch_size, offset=offset)
+            if not page["ids"]:
+                return
+            for chunk_id, text, metadata in zip(page["ids"], page["documents"], page["metadatas"]):
+                yield chunk_id, text, (metadata or {}).get("source", "")
+            offset += len(page["ids"])
+    return build_index(index_dir, chunks())
@@ -0,0 +1,184 @@
+"""
+Token-budgeted context builder for `generateResponse`.
+
+Ranked chunks from the same source and page that are adjacent (consecutive
+`chunk_ordinal`) are merged into one passage with the splitter's overlap stripped at
+the seam. Passages are added in rank order while they fit `budget` tokens, counting
+their "Document N:" labels; with budget left, passages grow by the chunk before and
+after them on the same page, fetched by their deterministic chunk IDs, nearest
+passages first.
+
+The overlap at a seam is taken from the chunks' `start_index` (recorded by the
+splitter since ingestion sets `add_start_index`). Chunks stored without it fall back to
+the longest repeat of at least `MIN_OVERLAP` characters that starts and ends at word
+boundaries, so a chance one-letter match ("may extend to" + "one year") is not a seam.
+"""
+
+from vector_store import make_chunk_id
+
+MIN_OVERLAP = 10 ## characters; the splitter cuts at separators, so real overlaps are whole words
+
+def _at_word_boundary(text, i):
+    return i == 0 or i == len(text) or not (text[i - 1].isalnum() and text[i].isalnum())
+
+def stitch(left, right, max_overlap, overlap=None):
+    """
+    Join two consecutive chunks, dropping the text `right` repeats from the end of `left`.
+    `overlap` is the exact length of that text when the chunks' start offsets are known.
+    """
+    if overlap is not None and 0 <= overlap <= min(len(left), len(right)) and left.endswith(right[:overlap]):
+        return left + right[overlap:] if overlap else f"{left}\n{right}"
+    for n in range(min(len(left), len(right), max_overlap), MIN_OVERLAP - 1, -1):
+        if left.endswith(right[:n]) and _at_word_boundary(left, len(left) - n) and _at_word_boundary(right, n):
+            return left + right[n:]
+    return f"{left}\n{right}"
+
+def _span(doc):
+    """`(start, end)` character offsets of a chunk in its page, or Nones if not recorded"""
+    start = doc.metadata.get("start_index")
+    return (start, start + len(doc.page_content)) if start is not None else (None, None)
+
+class Passage:
+    """Run of consecutive chunks from one source page"""
+
+    def __init__(self, doc):
+        self.source = doc.metadata.get("source")
+        self.page = doc.metadata.get("page")
+        self.first = self.last = doc.metadata.get("chunk_ordinal")
+        self.start, self.end = _span(doc)
+        self.text = doc.page_content
+        self.chunks = 1
+        self.done = self.first is None ## chunks stored before ordinals existed cannot grow
+
+    def key(self):
+        return self.source, self.page
+
+    def neighbor_ids(self):
+        ids = [make_chunk_id(self.source, self.page, self.last + 1)]
+        if self.first > 0:
+            ids.append(make_chunk_id(self.source, self.page, self.first - 1))
+        return ids
+
+    def joined(self, doc, prepend, max_overlap):
+        """The passage text with `doc`, the chunk before (`prepend`) or after it, stitched on"""
+        start, end = _span(doc)
+        if prepend:
+            overlap = end - self.start if end is not None and self.start is not None else None
+            return stitch(doc.page_content, self.text, max_overlap, overlap)
+        overlap = self.end - start if start is not None and self.end is not None else None
+        return stitch(self.text, doc.page_content, max_overlap, overlap)
+
+    def extend(self, doc, prepend, text):
+        """Take `doc` into the passage, with `text` from `joined`"""
+        start, end = _span(doc)
+        self.text = text
+        self.chunks += 1
+        if prepend:
+            self.first -= 1
+            self.start = start
+        else:
+            self.last += 1
+            self.end = end
+
+def label(i):
+    return f"Document {i+1}:\n"
+
+def format_passages(passages):
+    return "\n\n".join(f"{label(i)}{passage.text}" for i, passage in enumerate(passages))
+
+def _truncate(passage, max_tokens, count_tokens):
+    """Cut the end of `passage` until it is at most `max_tokens` tokens; it no longer grows"""
+    passage.done = True
+    tokens = count_tokens(passage.text)
+    while tokens > max_tokens and passage.text:
+        passage.text = passage.text[:len(passage.text) * max(max_tokens, 0) * 9 // (tokens * 10)]
+        tokens = count_tokens(passage.text)
+    return tokens
+
+def pack_context(documents, count_tokens, budget, fetch_by_ids=None, overlap=50, max_rounds=3):
+    """
+    Build the `{context}` text from ranked `documents` within `budget` tokens, labels
+    and separators included. Returns `(context, stats)`, where stats holds the tokens
+    used, the budget and the chunk counts.
+    """
+    ## merge adjacent chunks of the same page, keeping the rank of the best one
+    passages = []
+    for doc in documents:
+        ordinal = doc.metadata.get("chunk_ordinal")
+        for passage in passages:
+            if passage.done or ordinal is None or passage.key() != (doc.metadata.get("source"), doc.metadata.get("page")):
+                continue
+            if ordinal in (passage.last + 1, passage.first - 1):
+                prepend = ordinal == passage.first - 1
+                passage.extend(doc, prepend, passage.joined(doc, prepend, overlap))
+            elif passage.first <= ordinal <= passage.last:
+                passage.chunks += 1
+            else:
+                continue
+            break
+        else:
+            passages.append(Passage(doc))
+
+    ## passages in rank order while they fit, each with its label and separator
+    label_tokens = count_tokens(f"\n\n{label(len(passages))}")
+    packed = []
+    used = 0
+    for passage in passages:
+        tokens = count_tokens(passage.text) + label_tokens
+        if used + tokens > budget and packed:
+            continue
+        packed.append(passage)
+        used += tokens
+    ## a lone passage larger than the whole budget is cut down to it
+    if packed and used > budget:
+        used = _truncate(packed[0], budget - label_tokens, count_tokens) + label_tokens
+
+    ## grow passages with their page neighbors while budget remains, never taking a chunk twice
+    covered = {make_chunk_id(passage.source, passage.page, ordinal)
+               for passage in packed if passage.first is not None
+               for ordinal in range(passage.first, passage.last + 1)}
+    neighbors = 0
+    for _ in range(max_rounds if fetch_by_ids is not None else 0):
+        growable = [passage for passage in packed if not passage.done]
+        if not growable or used >= budget:
+            break
+        wanted = [i for passage in growable for i in passage.neighbor_ids() if i not in covered]
+        found = {doc.id: doc for doc in fetch_by_ids(wanted)} if wanted else {}
+        grown = False
+        for passage in growable:
+            before = found.get(make_chunk_id(passage.source, passage.page, passage.first - 1)) if passage.first > 0 else None
+            after = found.get(make_chunk_id(passage.source, passage.page, passage.last + 1))
+            for doc, prepend in ((after, False), (before, True)):
+                if doc is None or doc.id in covered:
+                    continue
+                text = passage.joined(doc, prepend, overlap)
+                tokens = count_tokens(text) - count_tokens(passage.text)
+                if used + tokens > budget:
+                    passage.done = True
+                    continue
+                passage.extend(doc, prepend, text)
+                covered.add(doc.id)
+                used += tokens
+                neighbors += 1
+                grown = True
+            if before is None and after is None:
+                passage.done = True
+        if not grown:
+            break
+
+    ## token counts of the pieces need not add up exactly, so the joined text is checked once more
+    context = format_passages(packed)
+    context_tokens = count_tokens(context) if packed else 0
+    while context_tokens > budget:
+        last = packed[-1]
+        if _truncate(last, count_tokens(last.text) - (context_tokens - budget), count_tokens) == 0:
+            packed.pop()
+        context = format_passages(packed)
+        context_tokens = count_tokens(context) if packed else 0
+    return context, {
+        "context_tokens": context_tokens,
+        "token_budget": budget,
+        "retrieved_chunks": len(documents),
+        "merged_passages": len(packed),
+        "neighbor_chunks": neighbors,
+    }
@@ -1,63 +1,223 @@
 import time
 import os
-import hashlib
+import argparse
+import queue
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from dotenv import load_dotenv
 from tqdm import tqdm
 load_dotenv()
 
 ## langchain dependencies
-from langchain_community.document_loaders.pdf import PyPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_chroma import Chroma
 
+from ingestion_manifest import IngestionManifest
+from embedding_cache import EmbeddingCache, CachedEmbeddings
+from embedding_engine import BucketedEmbeddings
+from dedup import NearDuplicateIndex, flush_duplicate_metadata
+import bm25_index
+import matrix_store
+import act_index
+import text_cache
+from pdf_backends import BACKENDS, DEFAULT_BACKEND, get_backend
+from vector_store import assign_chunk_ids, upsert_chunks, delete_stale_chunks, delete_source, bump_index_version
+
 ## setting up directories
 current_dir_path = os.path.dirname(os.path.abspath(__file__)) ## extract the directory name from the absolute path of this file
 data_path = os.path.join(current_dir_path, "data") ## create path for the `data` folder
 persistent_directory = os.path.join(current_dir_path, "data-ingestion-local") ## create a directory to save the vector store locally
-processed_files_log = os.path.join(current_dir_path, "processed_files.txt") ## track processed files
-
-def get_file_hash(filepath):
-    """Get MD5 hash of a file to detect changes"""
-    hash_md5 = hashlib.md5()
-    with open(filepath, "rb") as f:
-        for chunk in iter(lambda: f.read(4096), b""):
-            hash_md5.update(chunk)
-    return hash_md5.hexdigest()
-
-def load_processed_files():
-    """Load list of processed files and their hashes"""
-    if os.path.exists(processed_files_log):
-        processed = {}
-        with open(processed_files_log, 'r') as f:
-            for line in f:
-                if '|' in line:
-                    filename, filehash = line.strip().split('|', 1)
-                    processed[filename] = filehash
-        return processed
-    return {}
-
-def save_processed_files(processed_files):
-    """Save list of processed files and their hashes"""
-    with open(processed_files_log, 'w') as f:
-        for filename, filehash in processed_files.items():
-            f.write(f"{filename}|{filehash}\n")
-
-def get_new_or_modified_files(pdfs, processed_files):
-    """Get list of new or modified PDF files"""
-    new_files = []
-    for pdf in pdfs:
-        filepath = os.path.join(data_path, pdf)
-        current_hash = get_file_hash(filepath)
-        
-        if pdf not in processed_files or processed_files[pdf] != current_hash:
-            new_files.append((pdf, current_hash))
-    
-    return new_files
-
-## check if the directory already exists
-if not os.path.exists(persistent_directory):
-    print("[INFO] Initiating the build of Vector Database .. 📌📌", end="\n\n")
+manifest_path = os.path.join(persistent_directory, "ingestion-manifest.sqlite3") ## size, mtime, hash and chunk count per ingested file
+dedup_index_path = os.path.join(persistent_directory, "dedup-index.sqlite3") ## MinHash/LSH index of the chunks kept in the vector store
+bm25_index_directory = os.path.join(persistent_directory, "bm25-index") ## memory-mapped lexical index over the stored chunks
+matrix_store_directory = os.path.join(persistent_directory, "vector-matrix") ## memory-mapped copy of the vectors for exact search
+act_index_path = os.path.join(persistent_directory, "act-index.json") ## act titles and abbreviations -> sources, for targeted search
+processed_files_log = os.path.join(current_dir_path, "processed_files.txt") ## legacy log, imported into the manifest once
+cache_directory = os.path.join(current_dir_path, "data-ingestion-cache") ## caches that survive a rebuild of the vector database
+embedding_cache_path = os.path.join(cache_directory, "embeddings.sqlite3")
+text_cache_directory = os.path.join(cache_directory, "text") ## extracted page text per backend and file content hash
+embedding_model_name = "all-MiniLM-L6-v2"
+## loaders and embedding replicas run at the same time, so by default they split the cores between them
+cpu_count = os.cpu_count() or 1
+loader_cores = max(1, cpu_count // 2)
+
+def load_pdf(pdf, content_hash, backend=DEFAULT_BACKEND, use_text_cache=True):
+    """
+    Load a single PDF into page `Document` objects (runs inside a worker process).
+
+    Pages already extracted for this content hash by the same backend are read from the
+    text cache instead of parsing the PDF again. Returns `(docs, from_cache)`.
+    """
+    cache_dir = os.path.join(text_cache_directory, backend)
+    docsRaw = text_cache.load_pages(cache_dir, content_hash) if use_text_cache else None
+    from_cache = docsRaw is not None
+    if not from_cache:
+        docsRaw = get_backend(backend)(os.path.join(data_path, pdf)) ## list of `Document` objects. Each such object has - 1. Page Content // 2. Metadata
+    for doc in docsRaw:
+        # Keep the source relative to the project so it matches existing chunks in the vector store.
+        # Identical files share one cache entry, so cached pages are stamped with this file's name too.
+        doc.metadata['source'] = os.path.join("data", pdf)
+    if use_text_cache and not from_cache:
+        text_cache.save_pages(cache_dir, content_hash, docsRaw)
+    return docsRaw, from_cache
+
+def load_pdfs_parallel(files, workers, backend=DEFAULT_BACKEND, use_text_cache=True):
+    """
+    Load `(pdf, content_hash)` files in a process pool and yield `(pdf, docs, from_cache)` in the original order.
+
+    At most `workers * 2` files are in flight at once, so results are handed to the
+    caller as soon as the next file in order is ready instead of after the whole batch.
+    A PDF that fails to parse is logged and skipped.
+    """
+    ## this runs on a pipeline thread, and forking a process that has threads running is unsafe
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        pending = []
+        files = iter(files)
+        for pdf, content_hash in files:
+            pending.append((pdf, executor.submit(load_pdf, pdf, content_hash, backend, use_text_cache)))
+            if len(pending) >= workers * 2:
+                break
+
+        while pending:
+            pdf, future = pending.pop(0)
+            try:
+                docs, from_cache = future.result()
+            except Exception as e:
+                tqdm.write(f"   ⚠️  Skipping {pdf}: {e}")
+                docs = None
+
+            ## keep the pool busy with the next file before handing results back
+            next_file = next(files, None)
+            if next_file is not None:
+                pending.append((next_file[0], executor.submit(load_pdf, *next_file, backend, use_text_cache)))
+
+            if docs is not None:
+                yield pdf, docs, from_cache
+
+def threaded_stage(iterable, maxsize):
+    """
+    Run a generator stage in a background thread and yield its items through a bounded queue.
+
+    The producer blocks once `maxsize` items are waiting, so a slow downstream stage
+    applies back-pressure instead of letting results pile up in memory.
+    """
+    items = queue.Queue(maxsize=maxsize)
+    done = object()
+
+    def produce():
+        try:
+            for item in iterable:
+                items.put(item)
+        except BaseException as e:
+            items.put(e)
+        items.put(done)
+
+    threading.Thread(target=produce, daemon=True).start()
+    while True:
+        item = items.get()
+        if item is done:
+            return
+        if isinstance(item, BaseException):
+            raise item
+        yield item
+
+def dedup_chunks(pdf, chunks, dedup_index, stats):
+    """Drop chunks that nearly duplicate a chunk already kept from another act"""
+    source = os.path.join("data", pdf)
+    dedup_index.forget_source(source) ## the file's previous version no longer counts
+    kept = [chunk for chunk in chunks
+            if dedup_index.find_or_add(chunk.metadata["chunk_id"], source, chunk.page_content) is None]
+    dedup_index.commit()
+    stats["duplicates"] += len(chunks) - len(kept)
+    return kept
+
+def split_stage(loaded_files, splitter, stats, dedup_index=None):
+    """Split each loaded file into chunks with stable IDs, minus near-duplicates, as soon as it arrives"""
+    for pdf, docsRaw, from_cache in loaded_files:
+        chunks = splitter.split_documents(documents=docsRaw)
+        assign_chunk_ids(chunks)
+        if dedup_index is not None:
+            chunks = dedup_chunks(pdf, chunks, dedup_index, stats)
+        stats["files"] += 1
+        stats["text_cache_hits"] += from_cache
+        stats["documents"] += len(docsRaw)
+        stats["expected"][pdf] = len(chunks) ## lets the store stage tell when a file is complete
+        for chunk in chunks:
+            yield pdf, chunk
+
+def batch_stage(chunks, batch_size):
+    """Group chunks into lists of `batch_size` for embedding and storage"""
+    batch = []
+    for item in chunks:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def embed_stage(batches, embedF):
+    """Embed each batch of chunks, yielding the batch together with its vectors"""
+    for batch in batches:
+        texts = [chunk.page_content for _, chunk in batch]
+        yield batch, embedF.embed_documents(texts)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Build or update the local vector database from the PDFs in `data/`")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("INGEST_WORKERS", loader_cores)),
+                        help="number of processes used to load PDFs (default: INGEST_WORKERS or half the CPU count)")
+    parser.add_argument("--batch-size", type=int, default=500,
+                        help="chunks per embedding/ChromaDB batch (default: 500)")
+    parser.add_argument("--queue-size", type=int, default=4,
+                        help="items buffered between pipeline stages (default: 4)")
+    parser.add_argument("--pdf-backend", choices=list(BACKENDS), default=os.getenv("PDF_BACKEND", DEFAULT_BACKEND),
+                        help=f"text extractor used to parse PDFs (default: PDF_BACKEND or {DEFAULT_BACKEND}); "
+                             "compare them with `python benchmark_pdf_backends.py`")
+    parser.add_argument("--chunk-size", type=int, default=1000,
+                        help="characters per chunk for RecursiveCharacterTextSplitter (default: 1000)")
+    parser.add_argument("--chunk-overlap", type=int, default=50,
+                        help="characters shared by consecutive chunks (default: 50)")
+    parser.add_argument("--rechunk", action="store_true",
+                        help="split and embed every ingested file again, reading page text from the text cache")
+    parser.add_argument("--no-text-cache", action="store_true",
+                        help="always parse PDFs instead of reading or writing the extracted-text cache")
+    parser.add_argument("--dedup-threshold", type=float, default=float(os.getenv("DEDUP_THRESHOLD", 0.85)),
+                        help="estimated Jaccard similarity above which a chunk is a near-duplicate (default: DEDUP_THRESHOLD or 0.85)")
+    parser.add_argument("--no-dedup", action="store_true",
+                        help="store every chunk, even near-duplicates of chunks from other acts")
+    resume = parser.add_mutually_exclusive_group()
+    resume.add_argument("--resume", dest="restart", action="store_false",
+                        help="continue an interrupted run from the last committed file (default)")
+    resume.add_argument("--restart", dest="restart", action="store_true",
+                        help="discard the progress of an interrupted run and ingest its files again")
+    parser.set_defaults(restart=False)
+    parser.add_argument("--embed-replicas", type=int, default=int(os.getenv("EMBED_REPLICAS", max(1, (cpu_count - loader_cores) // 4))),
+                        help="embedding model replicas, each in its own process (default: EMBED_REPLICAS or one per 4 cores left by the loaders)")
+    parser.add_argument("--embed-token-budget", type=int, default=16384,
+                        help="maximum padded tokens per embedding batch (default: 16384)")
+    parser.add_argument("--embedding-cache-size", type=int, default=int(os.getenv("EMBEDDING_CACHE_SIZE", 500_000)),
+                        help="maximum vectors kept in the on-disk embedding cache (default: EMBEDDING_CACHE_SIZE or 500000)")
+    parser.add_argument("--no-embedding-cache", action="store_true",
+                        help="encode every chunk without consulting the embedding cache")
+    parser.add_argument("--no-bm25", action="store_true",
+                        help="skip rebuilding the BM25 lexical index")
+    parser.add_argument("--matrix-dtype", choices=["float32", "float16"], default=os.getenv("VECTOR_MATRIX_DTYPE", "float32"),
+                        help="dtype of the exported vector matrix (default: VECTOR_MATRIX_DTYPE or float32)")
+    parser.add_argument("--no-matrix", action="store_true",
+                        help="skip exporting the memory-mapped vector matrix used by RETRIEVER_BACKEND=numpy")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    ## check if the directory already exists
+    db_exists = os.path.exists(persistent_directory)
+    if not db_exists:
+        print("[INFO] Initiating the build of Vector Database .. 📌📌", end="\n\n")
+    else:
+        print("📂 Vector Database already exists!")
+        print("🔄 Checking for new or modified PDF files...")
 
     ## check if the folder that contains the required PDFs exists
     if not os.path.exists(data_path):
@@ -67,185 +227,274 @@ if not os.path.exists(persistent_directory):
 
     ## list of all the PDFs
     pdfs = [pdf for pdf in os.listdir(data_path) if pdf.endswith(".pdf")] ## list of all file names as str that ends with `.pdf`
-    
-    # Load existing processed files
-    processed_files = load_processed_files()
-    
-    # Get new or modified files
-    new_files = get_new_or_modified_files(pdfs, processed_files)
-    
+
+    ## compare the PDFs on disk against the manifest, only hashing files whose size or mtime changed
+    check_start = time.time()
+    manifest = IngestionManifest(manifest_path)
+    if db_exists:
+        imported = manifest.import_legacy_log(processed_files_log, data_path)
+        if imported:
+            print(f"📋 Imported {imported} entries from {processed_files_log} into the ingestion manifest")
+
+    ## a run that was killed or crashed leaves its row in `running` state
+    run_id = manifest.get_unfinished_run()
+    if run_id is not None:
+        committed = manifest.count_run_files(run_id)
+        if args.restart:
+            forgotten = manifest.abandon_run(run_id)
+            print(f"🔁 Restarting: discarded interrupted run #{run_id} ({forgotten} committed file(s) will be ingested again)")
+            run_id = None
+        else:
+            print(f"⏯️  Resuming interrupted run #{run_id} ({committed} file(s) already committed)")
+
+    new_files, removed_files = manifest.find_changes(data_path, pdfs)
+
+    ## a different extractor or chunking means every file has to be split again, which the text cache makes cheap
+    chunking = f"{args.chunk_size}/{args.chunk_overlap}"
+    previous_chunking = manifest.get_setting("chunking")
+    previous_backend = manifest.get_setting("pdf_backend", DEFAULT_BACKEND)
+    if args.rechunk or (previous_chunking is not None and previous_chunking != chunking) or previous_backend != args.pdf_backend:
+        print(f"✂️  Re-chunking all ingested files ({previous_backend}, {previous_chunking or 'unknown'} → {args.pdf_backend}, {chunking} chars size/overlap)")
+        ## files an interrupted re-chunk already committed are done
+        changed = {pdf for pdf, *_ in new_files} | (manifest.get_run_files(run_id) if run_id is not None else set())
+        new_files += [(pdf, size, mtime_ns, content_hash)
+                      for pdf, (size, mtime_ns, content_hash, _) in manifest.get_all().items()
+                      if pdf not in changed and pdf not in removed_files]
+    print(f"⏱️  Change check over {len(pdfs)} PDFs took {(time.time() - check_start)*1000:.1f} ms")
+
+    ## the store stage writes precomputed vectors, so Chroma does not need the embedding model itself
+    vectorDB = Chroma(persist_directory=persistent_directory)
+
+    dedup_index = None if args.no_dedup else NearDuplicateIndex(dedup_index_path, threshold=args.dedup_threshold)
+
+    if removed_files:
+        print(f"🗑️  Removing {len(removed_files)} file(s) that are no longer in {data_path}:")
+        for pdf in removed_files:
+            deleted = delete_source(vectorDB, os.path.join("data", pdf))
+            if dedup_index is not None:
+                dedup_index.forget_source(os.path.join("data", pdf))
+            manifest.remove_file(pdf)
+            print(f"   • {pdf} ({deleted} chunks)")
+
+    duplicates_flushed = 0
+    if dedup_index is not None:
+        ## acts whose boilerplate was collapsed into a chunk that has since been replaced or removed
+        queued = {pdf for pdf, *_ in new_files}
+        known = manifest.get_all()
+        present = set(pdfs)
+        pending = sorted(pdf for pdf in map(os.path.basename, dedup_index.pending_sources())
+                         if pdf in known and pdf not in queued and pdf in present)
+        ## files about to be ingested give up their representatives now, and every act that had chunks
+        ## collapsed into one is ingested again in this same run, before it can collapse into them again
+        released = list(queued) + pending
+        requeued_now = []
+        while released:
+            orphaned = set()
+            for pdf in released:
+                orphaned |= dedup_index.forget_source(os.path.join("data", pdf))
+            queued.update(released)
+            released = sorted(pdf for pdf in map(os.path.basename, orphaned)
+                              if pdf in known and pdf not in queued and pdf in present)
+            requeued_now += released
+        if pending or requeued_now:
+            print(f"♻️  Re-ingesting {len(pending) + len(requeued_now)} file(s) whose duplicate chunks lost their representative")
+            new_files += [(pdf, *known[pdf][:3]) for pdf in pending + requeued_now]
+        duplicates_flushed = flush_duplicate_metadata(vectorDB, dedup_index)
+
     if not new_files:
+        if dedup_index is not None:
+            dedup_index.close()
+        bm25_rebuilt = not args.no_bm25 and (removed_files or not bm25_index.index_exists(bm25_index_directory))
+        if bm25_rebuilt:
+            indexed = bm25_index.rebuild_from_store(vectorDB, bm25_index_directory)
+            print(f"🔤 BM25 index rebuilt over {indexed} chunks")
+        matrix_exported = not args.no_matrix and (removed_files or duplicates_flushed
+                                                 or matrix_store.store_dtype(matrix_store_directory) != args.matrix_dtype)
+        if matrix_exported:
+            exported = matrix_store.export_from_store(vectorDB, matrix_store_directory, dtype=args.matrix_dtype)
+            print(f"🧮 Vector matrix exported with {exported} rows ({args.matrix_dtype})")
+        act_index_rebuilt = removed_files or duplicates_flushed or not os.path.exists(act_index_path)
+        if act_index_rebuilt:
+            act_index.build_index(act_index_path, [os.path.join("data", pdf) for pdf in manifest.get_all()],
+                                  shared_chunks=act_index.shared_chunks_from_store(vectorDB))
+        if removed_files or bm25_rebuilt or matrix_exported or act_index_rebuilt or (dedup_index is not None and duplicates_flushed):
+            ## serving processes drop retrieval results cached against the old index
+            bump_index_version(persistent_directory)
+        if run_id is not None:
+            manifest.finish_run(run_id)
+        manifest.set_setting("chunking", chunking)
+        manifest.set_setting("pdf_backend", args.pdf_backend)
         print("✅ All PDFs are up to date! No new files to process.")
         print(f"📁 Vector database location: {persistent_directory}")
-        exit(0)
-    
+        if db_exists:
+            print(f"📊 Total files in database: {len(manifest)}")
+            print(f"📋 Ingestion manifest: {manifest_path}")
+        manifest.close()
+        return
+
     print(f"🆕 Found {len(new_files)} new or modified PDF files to process:")
-    for pdf, _ in new_files:
+    for pdf, *_ in new_files:
         print(f"   • {pdf}")
 
-    doc_container = [] ## list of chunked documents
-    
-    ## take each item from new_files and load it using PyPDFLoader
-    print(f"\n📚 Loading {len(new_files)} new/modified PDF files...")
-    for pdf, filehash in tqdm(new_files, desc="Loading PDFs", unit="file"):
-        loader = PyPDFLoader(file_path=os.path.join("data", pdf),
-                             extract_images=False)
-        docsRaw = loader.load() ## list of `Document` objects. Each such object has - 1. Page Content // 2. Metadata
-        for doc in docsRaw:
-            # Ensure source metadata is properly set
-            if 'source' not in doc.metadata:
-                doc.metadata['source'] = pdf
-            doc_container.append(doc) ## append each `Document` object to the previously declared container
-        
-        # Update processed files list
-        processed_files[pdf] = filehash
-
-    ## split the documents into chunks
-    print(f"\n✂️  Splitting {len(doc_container)} documents into chunks...")
-    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=50)
-    docs_split = splitter.split_documents(documents=doc_container)
-
-    ## display information document splitted
-    print(f"\n📊 Document Chunks Information:")
-    print(f"   • Total documents: {len(doc_container)}")
-    print(f"   • Total chunks: {len(docs_split)}")
-    print(f"   • Average chunks per document: {len(docs_split)/len(doc_container):.1f}")
-    print()
-
     ## embedding and vector store
-    print("🔍 Initializing embedding model...")
-    embedF = HuggingFaceEmbeddings(model_name = "all-MiniLM-L6-v2", encode_kwargs = {'normalize_embeddings': False})
-    
-    print(f"\n🚀 Starting embedding process for {len(docs_split)} chunks...")
-    start = time.time()
-
-    ## create embeddings for the documents and then store to a vector database
-    print("   ⏳ Creating embeddings and storing in vector database...")
-    
-    # Check if vector database already exists
-    if os.path.exists(persistent_directory):
-        print("   📂 Loading existing vector database...")
-        vectorDB = Chroma(embedding_function=embedF, persist_directory=persistent_directory)
-        print("   ➕ Adding new documents to existing database...")
-        
-        # Process documents in batches to avoid ChromaDB batch size limit
-        batch_size = 500  # Conservative batch size for ChromaDB
-        total_batches = (len(docs_split) + batch_size - 1) // batch_size
-        
-        for i in range(0, len(docs_split), batch_size):
-            batch = docs_split[i:i + batch_size]
-            batch_num = (i // batch_size) + 1
-            print(f"      📦 Processing batch {batch_num}/{total_batches} ({len(batch)} documents)...")
-            vectorDB.add_documents(batch)
-            
-    else:
-        print("   🆕 Creating new vector database...")
-        vectorDB = Chroma.from_documents(documents=docs_split,
-                                         embedding=embedF,
-                                         persist_directory=persistent_directory)
-    
-    end = time.time()
-    elapsed_time = end - start
-    
-    # Save updated processed files list
-    save_processed_files(processed_files)
-    
-    print(f"\n✅ Embedding completed successfully!")
-    print(f"   • Total time: {elapsed_time:.2f} seconds")
-    print(f"   • Average time per chunk: {elapsed_time/len(docs_split):.3f} seconds")
-    print(f"   • New chunks processed: {len(docs_split)}")
-    print(f"   • Total files processed: {len(processed_files)}")
-    print(f"   • Vector database saved to: {persistent_directory}")
-    print(f"   • Processed files log: {processed_files_log}")
-
-else:
-    print("📂 Vector Database already exists!")
-    print("🔄 Checking for new or modified PDF files...")
-    
-    # Load existing processed files
-    processed_files = load_processed_files()
-    
-    # Get all PDFs
-    pdfs = [pdf for pdf in os.listdir(data_path) if pdf.endswith(".pdf")]
-    
-    # Get new or modified files
-    new_files = get_new_or_modified_files(pdfs, processed_files)
-    
-    if not new_files:
-        print("✅ All PDFs are up to date! No new files to process.")
-        print(f"📁 Vector database location: {persistent_directory}")
-        print(f"📊 Total files in database: {len(processed_files)}")
-        print(f"\n📁 Current vector database location: {persistent_directory}")
-        print(f"📋 Processed files log: {processed_files_log}")
-    else:
-        print(f"🆕 Found {len(new_files)} new or modified PDF files to process:")
-        for pdf, _ in new_files:
-            print(f"   • {pdf}")
-
-        doc_container = [] ## list of chunked documents
-        
-        ## take each item from new_files and load it using PyPDFLoader
-        print(f"\n📚 Loading {len(new_files)} new/modified PDF files...")
-        for pdf, filehash in tqdm(new_files, desc="Loading PDFs", unit="file"):
-            loader = PyPDFLoader(file_path=os.path.join("data", pdf),
-                                 extract_images=False)
-            docsRaw = loader.load() ## list of `Document` objects. Each such object has - 1. Page Content // 2. Metadata
-            for doc in docsRaw:
-                # Ensure source metadata is properly set
-                if 'source' not in doc.metadata:
-                    doc.metadata['source'] = pdf
-                doc_container.append(doc) ## append each `Document` object to the previously declared container
-            
-            # Update processed files list
-            processed_files[pdf] = filehash
-
-        ## split the documents into chunks
-        print(f"\n✂️  Splitting {len(doc_container)} documents into chunks...")
-        splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=50)
-        docs_split = splitter.split_documents(documents=doc_container)
-
-        ## display information document splitted
-        print(f"\n📊 Document Chunks Information:")
-        print(f"   • Total documents: {len(doc_container)}")
-        print(f"   • Total chunks: {len(docs_split)}")
-        print(f"   • Average chunks per document: {len(docs_split)/len(doc_container):.1f}")
-        print()
-
-        ## embedding and vector store
-        print("🔍 Initializing embedding model...")
-        embedF = HuggingFaceEmbeddings(model_name = "all-MiniLM-L6-v2", encode_kwargs = {'normalize_embeddings': False})
-        
-        print(f"\n🚀 Starting embedding process for {len(docs_split)} chunks...")
+    print("\n🔍 Initializing embedding model...")
+    ## chunks are bucketed by token length and spread over model replicas, vectors come back in order
+    ## the replicas share the cores the loader workers leave free
+    loader_workers = max(1, min(args.workers, len(new_files)))
+    embedding_engine = BucketedEmbeddings(embedding_model_name, replicas=args.embed_replicas,
+                                          threads=max(1, cpu_count - loader_workers),
+                                          token_budget=args.embed_token_budget, normalize_embeddings=False)
+    embedF = embedding_engine
+    print(f"   🧠 {embedding_engine.replicas} embedding replica(s) × {embedding_engine.threads_per_replica} thread(s), {args.embed_token_budget} padded tokens per batch")
+    embedding_cache = None
+    if not args.no_embedding_cache:
+        ## unchanged chunk text is served from disk instead of being encoded again
+        embedding_cache = EmbeddingCache(embedding_cache_path, max_entries=args.embedding_cache_size)
+        embedF = CachedEmbeddings(embedF, embedding_cache, embedding_model_name)
+        print(f"   💾 Embedding cache: {len(embedding_cache)} vectors in {embedding_cache_path}")
+
+    ## the embedding cache is closed however the run ends, so vectors written so far are kept
+    try:
+        if db_exists:
+            print("   📂 Updating existing vector database...")
+        else:
+            print("   🆕 Creating new vector database...")
+
+        if run_id is None:
+            run_id = manifest.begin_run()
+        file_info = {pdf: (size, mtime_ns, content_hash) for pdf, size, mtime_ns, content_hash in new_files}
+
+        ## parse -> split -> embed -> upsert, each stage overlapping with the next through bounded queues
+        workers = loader_workers
+        print(f"\n🚀 Streaming {len(new_files)} new/modified PDF files through load → split → embed → store ({workers} {args.pdf_backend} loader worker(s), batches of {args.batch_size})...")
         start = time.time()
 
-        ## create embeddings for the documents and then store to a vector database
-        print("   ⏳ Creating embeddings and storing in vector database...")
-        
-        # Load existing vector database and add new documents
-        print("   📂 Loading existing vector database...")
-        vectorDB = Chroma(embedding_function=embedF, persist_directory=persistent_directory)
-        print("   ➕ Adding new documents to existing database...")
-        
-        # Process documents in batches to avoid ChromaDB batch size limit
-        batch_size = 500  # Conservative batch size for ChromaDB
-        total_batches = (len(docs_split) + batch_size - 1) // batch_size
-        
-        for i in range(0, len(docs_split), batch_size):
-            batch = docs_split[i:i + batch_size]
-            batch_num = (i // batch_size) + 1
-            print(f"      📦 Processing batch {batch_num}/{total_batches} ({len(batch)} documents)...")
-            vectorDB.add_documents(batch)
-            
+        ## `start_index` lets the context packer strip the exact overlap when it merges neighbouring chunks
+        splitter = RecursiveCharacterTextSplitter(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap,
+                                                  add_start_index=True)
+        stats = {"files": 0, "documents": 0, "chunks": 0, "stale": 0, "text_cache_hits": 0, "duplicates": 0, "expected": {}}
+        written_ids = {} ## chunk IDs written so far for files that are still in flight
+        committed_files = 0 ## files whose chunks are all stored and recorded in the manifest
+        loaded = threaded_stage(load_pdfs_parallel([(pdf, content_hash) for pdf, _, _, content_hash in new_files],
+                                                   workers, backend=args.pdf_backend,
+                                                   use_text_cache=not args.no_text_cache), args.queue_size)
+        batches = threaded_stage(batch_stage(split_stage(loaded, splitter, stats, dedup_index), args.batch_size), args.queue_size)
+        embedded = threaded_stage(embed_stage(batches, embedF), args.queue_size)
+
+        def commit_file(pdf, chunk_count):
+            """Checkpoint a fully stored file so an interrupted run can resume after it"""
+            nonlocal committed_files
+            manifest.record_file(pdf, *file_info[pdf], chunk_count, run_id=run_id)
+            committed_files += 1
+
+        try:
+            progress = tqdm(total=len(new_files), desc="Ingesting PDFs", unit="file")
+            for batch, embeddings in embedded:
+                upsert_chunks(vectorDB, [chunk for _, chunk in batch], embeddings)
+                stats["chunks"] += len(batch)
+                for pdf, chunk in batch:
+                    written_ids.setdefault(pdf, []).append(chunk.metadata["chunk_id"])
+
+                ## once every chunk of a file is in, drop whatever its previous version left behind and checkpoint it
+                for pdf in {pdf for pdf, _ in batch}:
+                    if len(written_ids[pdf]) == stats["expected"][pdf]:
+                        ids = written_ids.pop(pdf)
+                        stats["stale"] += delete_stale_chunks(vectorDB, os.path.join("data", pdf), ids)
+                        commit_file(pdf, len(ids))
+                progress.n = stats["files"]
+                progress.refresh()
+            progress.close()
+
+            ## files that produced no chunks at all still need their old chunks cleared
+            for pdf, expected in stats["expected"].items():
+                if expected == 0:
+                    stats["stale"] += delete_source(vectorDB, os.path.join("data", pdf))
+                    commit_file(pdf, 0)
+        except (KeyboardInterrupt, Exception):
+            ## chunk IDs are stable, so a partly stored file is simply overwritten when the run resumes
+            print(f"\n⛔ Ingestion interrupted after {committed_files} committed file(s).")
+            print("   Run `python data-ingestion.py --resume` to continue or `--restart` to start this run over.")
+            manifest.close()
+            embedding_engine.close()
+            raise
+
         end = time.time()
         elapsed_time = end - start
-        
-        # Save updated processed files list
-        save_processed_files(processed_files)
-        
+        embedding_engine.close()
+        manifest.finish_run(run_id)
+
+        ## record on each kept chunk which other acts it now stands for
+        duplicate_updates = 0
+        requeued = 0
+        if dedup_index is not None:
+            duplicate_updates = flush_duplicate_metadata(vectorDB, dedup_index)
+            requeued = len(dedup_index.pending_sources())
+            representatives, members = dedup_index.counts()
+            dedup_index.close()
+        manifest.set_setting("chunking", chunking)
+        manifest.set_setting("pdf_backend", args.pdf_backend)
+        bm25_seconds = None
+        if not args.no_bm25:
+            bm25_start = time.time()
+            bm25_index.rebuild_from_store(vectorDB, bm25_index_directory)
+            bm25_seconds = time.time() - bm25_start
+        matrix_seconds = None
+        if not args.no_matrix:
+            matrix_start = time.time()
+            matrix_store.export_from_store(vectorDB, matrix_store_directory, dtype=args.matrix_dtype)
+            matrix_seconds = time.time() - matrix_start
+        act_patterns = act_index.build_index(act_index_path, [os.path.join("data", pdf) for pdf in manifest.get_all()],
+                                             shared_chunks=act_index.shared_chunks_from_store(vectorDB))
+        ## serving processes drop retrieval results cached against the old index and reload the on-disk indexes
+        bump_index_version(persistent_directory)
+
+        ## extracted text of older versions of a file is no longer needed
+        pruned = 0
+        if not args.no_text_cache:
+            pruned = text_cache.prune(os.path.join(text_cache_directory, args.pdf_backend), {entry[2] for entry in manifest.get_all().values()})
+
+        skipped = len(new_files) - stats["files"]
+        if skipped:
+            print(f"⚠️  {skipped} PDF file(s) could not be loaded and were skipped")
+        if not stats["files"]:
+            print("❌ No documents could be loaded. Nothing was embedded.")
+            manifest.close()
+            return
+
+        print(f"\n📊 Document Chunks Information:")
+        print(f"   • Total documents: {stats['documents']}")
+        print(f"   • Total chunks: {stats['chunks']}")
+        print(f"   • Average chunks per document: {stats['chunks']/max(stats['documents'], 1):.1f}")
+
         print(f"\n✅ Embedding completed successfully!")
         print(f"   • Total time: {elapsed_time:.2f} seconds")
-        print(f"   • Average time per chunk: {elapsed_time/len(docs_split):.3f} seconds")
-        print(f"   • New chunks processed: {len(docs_split)}")
-        print(f"   • Total files processed: {len(processed_files)}")
+        print(f"   • Average time per chunk: {elapsed_time/max(stats['chunks'], 1):.3f} seconds")
+        print(f"   • New chunks processed: {stats['chunks']} ({stats['chunks']/max(elapsed_time, 1e-9):.1f} chunks/sec end to end)")
+        print(f"   • Encoder throughput: {embedding_engine.encoded} chunks encoded at {embedding_engine.chunks_per_second():.1f} chunks/sec")
+        print(f"   • Stale chunks removed: {stats['stale']}")
+        if dedup_index is not None:
+            print(f"   • Near-duplicates dropped: {stats['duplicates']} this run "
+                  f"({members} collapsed into {representatives} kept chunks overall, {duplicate_updates} duplicate lists updated)")
+            if requeued:
+                print(f"   • {requeued} file(s) still wait to be re-ingested for lost duplicate chunks; run again to re-ingest them")
+        if not args.no_text_cache:
+            print(f"   • Text cache: {stats['text_cache_hits']}/{stats['files']} files read without parsing ({pruned} stale entries pruned)")
+        if embedding_cache is not None:
+            print(f"   • Embedding cache: {embedding_cache.hits} hits / {embedding_cache.misses} misses "
+                  f"({embedding_cache.hit_ratio()*100:.1f}% hit ratio, {embedding_cache.evictions} evicted, {len(embedding_cache)} stored)")
+        if bm25_seconds is not None:
+            print(f"   • BM25 index rebuilt in {bm25_seconds:.2f} seconds ({bm25_index_directory})")
+        if matrix_seconds is not None:
+            print(f"   • Vector matrix exported in {matrix_seconds:.2f} seconds ({matrix_store_directory}, {args.matrix_dtype})")
+        print(f"   • Act pre-filter index: {act_patterns} title/abbreviation patterns ({act_index_path})")
+        print(f"   • Total chunks in database: {vectorDB._collection.count()}")
+        print(f"   • Total files processed: {len(manifest)}")
         print(f"   • Vector database saved to: {persistent_directory}")
-        print(f"   • Processed files log: {processed_files_log}")
\ No newline at end of file
+        print(f"   • Ingestion manifest: {manifest_path}")
+        manifest.close()
+    finally:
+        if embedding_cache is not None:
+            embedding_cache.close()
+
+if __name__ == "__main__":
+    main()
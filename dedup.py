@@ -0,0 +1,250 @@
+"""
+MinHash/LSH near-duplicate detection for ingested chunks.
+
+Many Central Acts share boilerplate (arrangement-of-sections pages, standard definitions,
+repeal and savings clauses). Before a chunk is embedded it is compared against the chunks
+already kept from *other* acts; if one is a near-duplicate, the new chunk is dropped and
+recorded as a member of that representative, whose metadata lists every act it stands for.
+
+The index lives in SQLite next to the vector store so incremental runs dedup against
+chunks stored by earlier runs.
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+
+import numpy as np
+
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+SHINGLE_SIZE = 3 ## words per shingle
+
+_word_re = re.compile(r"\w+", re.UNICODE)
+
+def shingles(text):
+    """32-bit hashes of the overlapping word 3-grams of `text`"""
+    words = _word_re.findall(text.lower())
+    if len(words) < SHINGLE_SIZE:
+        grams = [" ".join(words)] if words else []
+    else:
+        grams = [" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)]
+    return np.array(
+        sorted({int.from_bytes(hashlib.blake2b(gram.encode("utf-8"), digest_size=4).digest(), "little") for gram in grams}),
+        dtype=np.uint64,
+    )
+
+class MinHasher:
+    def __init__(self, num_perm=128, seed=1):
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.a = rng.randint(1, MAX_HASH, size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, MAX_HASH, size=num_perm, dtype=np.uint64)
+
+    def signature(self, text):
+        hashes = shingles(text)
+        if not len(hashes):
+            return np.full(self.num_perm, MAX_HASH, dtype=np.uint32)
+        permuted = (np.outer(hashes, self.a) + self.b) % MERSENNE_PRIME & MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+def estimate_similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of the shingle sets behind two signatures"""
+    return float(np.count_nonzero(sig_a == sig_b)) / len(sig_a)
+
+class NearDuplicateIndex:
+    """
+    Persistent LSH index of representative chunks.
+
+    `bands * rows` must equal the signature length; with 16 bands of 8 rows, pairs above
+    roughly 0.7 similarity become candidates, and candidates are then checked against
+    `threshold` using the full signatures.
+    """
+
+    def __init__(self, db_path, threshold=0.85, num_perm=128, bands=16):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.hasher = MinHasher(num_perm)
+        self._lock = threading.Lock()
+        ## the dedup stage runs in a pipeline thread while the store stage flushes metadata
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS representatives (
+                chunk_id  TEXT PRIMARY KEY,
+                source    TEXT NOT NULL,
+                signature BLOB NOT NULL,
+                dirty     INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS representatives_source ON representatives (source);
+            CREATE INDEX IF NOT EXISTS representatives_dirty ON representatives (dirty);
+            CREATE TABLE IF NOT EXISTS buckets (
+                band     INTEGER NOT NULL,
+                bucket   INTEGER NOT NULL,
+                chunk_id TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS buckets_lookup ON buckets (band, bucket);
+            CREATE INDEX IF NOT EXISTS buckets_chunk ON buckets (chunk_id);
+            CREATE TABLE IF NOT EXISTS members (
+                chunk_id          TEXT PRIMARY KEY,
+                source            TEXT NOT NULL,
+                representative_id TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS members_source ON members (source);
+            CREATE INDEX IF NOT EXISTS members_representative ON members (representative_id);
+            CREATE TABLE IF NOT EXISTS pending_sources (
+                source TEXT PRIMARY KEY
+            );
+            """
+        )
+        self.conn.commit()
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    def _band_keys(self, signature):
+        keys = []
+        for band in range(self.bands):
+            digest = hashlib.blake2b(signature[band * self.rows:(band + 1) * self.rows].tobytes(), digest_size=8).digest()
+            keys.append((band, int.from_bytes(digest, "little", signed=True)))
+        return keys
+
+    def find_or_add(self, chunk_id, source, text):
+        """
+        Return the ID of a representative from another source that `text` nearly
+        duplicates, recording `chunk_id` as its member; otherwise register the chunk as a
+        new representative and return None.
+        """
+        signature = self.hasher.signature(text)
+        band_keys = self._band_keys(signature)
+        with self._lock:
+            placeholders = ",".join("(?, ?)" for _ in band_keys)
+            params = [value for key in band_keys for value in key]
+            candidates = self.conn.execute(
+                f"""
+                SELECT DISTINCT r.chunk_id, r.signature FROM buckets b
+                JOIN representatives r ON r.chunk_id = b.chunk_id
+                WHERE (b.band, b.bucket) IN (VALUES {placeholders}) AND r.source != ?
+                """,
+                (*params, source),
+            ).fetchall()
+
+            best_id, best_similarity = None, self.threshold
+            for candidate_id, blob in candidates:
+                similarity = estimate_similarity(signature, np.frombuffer(blob, dtype=np.uint32))
+                if similarity >= best_similarity:
+                    best_id, best_similarity = candidate_id, similarity
+
+            if best_id is not None:
+                self.conn.execute("INSERT OR REPLACE INTO members (chunk_id, source, representative_id) VALUES (?, ?, ?)",
+                                  (chunk_id, source, best_id))
+                self.conn.execute("UPDATE representatives SET dirty = 1 WHERE chunk_id = ?", (best_id,))
+            else:
+                self.conn.execute("INSERT OR REPLACE INTO representatives (chunk_id, source, signature) VALUES (?, ?, ?)",
+                                  (chunk_id, source, signature.tobytes()))
+                self.conn.executemany("INSERT INTO buckets (band, bucket, chunk_id) VALUES (?, ?, ?)",
+                                      [(band, bucket, chunk_id) for band, bucket in band_keys])
+        return best_id
+
+    def commit(self):
+        """Persist the chunks recorded by `find_or_add` (called once per file)"""
+        with self._lock:
+            self.conn.commit()
+
+    def forget_source(self, source):
+        """
+        Drop everything recorded for `source` before it is ingested again or removed.
+
+        Other sources that had chunks collapsed into this source's representatives lose
+        those chunks, so they are queued in `pending_sources` to be ingested again; the
+        set of newly queued sources is returned.
+        """
+        with self._lock:
+            orphaned = {row[0] for row in self.conn.execute(
+                """
+                SELECT DISTINCT m.source FROM members m
+                JOIN representatives r ON r.chunk_id = m.representative_id
+                WHERE r.source = ? AND m.source != ?
+                """,
+                (source, source),
+            )}
+            ## representatives that lose a member need their duplicate list rewritten
+            self.conn.execute(
+                """
+                UPDATE representatives SET dirty = 1
+                WHERE chunk_id IN (SELECT representative_id FROM members WHERE source = ?)
+                """,
+                (source,),
+            )
+            self.conn.execute(
+                "DELETE FROM members WHERE representative_id IN (SELECT chunk_id FROM representatives WHERE source = ?)",
+                (source,),
+            )
+            self.conn.execute("DELETE FROM members WHERE source = ?", (source,))
+            self.conn.execute(
+                "DELETE FROM buckets WHERE chunk_id IN (SELECT chunk_id FROM representatives WHERE source = ?)",
+                (source,),
+            )
+            self.conn.execute("DELETE FROM representatives WHERE source = ?", (source,))
+            self.conn.execute("DELETE FROM pending_sources WHERE source = ?", (source,))
+            self.conn.executemany("INSERT OR IGNORE INTO pending_sources (source) VALUES (?)", [(s,) for s in orphaned])
+            self.conn.commit()
+        return orphaned
+
+    def pending_sources(self):
+        """Sources that lost chunks to a re-ingested or removed representative and must be ingested again"""
+        with self._lock:
+            return {row[0] for row in self.conn.execute("SELECT source FROM pending_sources")}
+
+    def dirty_representatives(self):
+        """`{chunk_id: [member sources]}` for representatives whose member list changed"""
+        with self._lock:
+            dirty = {row[0]: [] for row in self.conn.execute("SELECT chunk_id FROM representatives WHERE dirty = 1")}
+            for chunk_id, source in self.conn.execute(
+                "SELECT m.representative_id, m.source FROM members m JOIN representatives r ON r.chunk_id = m.representative_id WHERE r.dirty = 1"
+            ):
+                dirty[chunk_id].append(source)
+        return dirty
+
+    def mark_clean(self, chunk_ids):
+        with self._lock:
+            self.conn.executemany("UPDATE representatives SET dirty = 0 WHERE chunk_id = ?", [(i,) for i in chunk_ids])
+            self.conn.commit()
+
+    def counts(self):
+        with self._lock:
+            representatives = self.conn.execute("SELECT COUNT(*) FROM representatives").fetchone()[0]
+            members = self.conn.execute("SELECT COUNT(*) FROM members").fetchone()[0]
+        return representatives, members
+
+def flush_duplicate_metadata(vectorDB, index, batch_size=500):
+    """
+    Write `duplicate_sources` / `duplicate_count` into the stored metadata of every
+    representative whose members changed. Representatives not stored yet stay dirty and
+    are picked up by a later flush. Returns the number of chunks updated.
+    """
+    dirty = index.dirty_representatives()
+    ids = list(dirty)
+    updated = []
+    for i in range(0, len(ids), batch_size):
+        stored = vectorDB._collection.get(ids=ids[i:i + batch_size], include=["metadatas"])
+        if not stored["ids"]:
+            continue
+        metadatas = []
+        for chunk_id, metadata in zip(stored["ids"], stored["metadatas"]):
+            members = sorted(set(dirty[chunk_id]) - {metadata.get("source")})
+            metadata["duplicate_sources"] = "; ".join([metadata.get("source", "")] + members)
+            metadata["duplicate_count"] = len(dirty[chunk_id])
+            metadatas.append(metadata)
+        vectorDB._collection.update(ids=stored["ids"], metadatas=metadatas)
+        updated.extend(stored["ids"])
+    index.mark_clean(updated)
+    return len(updated)
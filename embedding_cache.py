@@ -0,0 +1,124 @@
+"""
+Content-addressed, on-disk cache of chunk embeddings.
+
+Vectors are keyed by a hash of the model name and the chunk text, so re-ingesting an
+amended act or re-running with a different chunking only encodes text that is new.
+The cache is bounded by entry count and evicts the least recently used vectors first.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+
+from langchain_core.embeddings import Embeddings
+
+## SQLite caps the number of bound parameters per statement
+LOOKUP_BATCH_SIZE = 900
+
+def text_key(model_name, text):
+    return hashlib.blake2b(f"{model_name}\0{text}".encode("utf-8"), digest_size=16).digest()
+
+class EmbeddingCache:
+    def __init__(self, db_path, max_entries=500_000):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        ## ingestion embeds from a pipeline thread, so the connection is shared behind a lock
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key       BLOB PRIMARY KEY,
+                vector    BLOB NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self.conn.commit()
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    def get_many(self, keys):
+        """Return `{key: vector}` for the keys that are cached and mark them as recently used"""
+        found = {}
+        now = time.time()
+        with self._lock:
+            for i in range(0, len(keys), LOOKUP_BATCH_SIZE):
+                part = keys[i:i + LOOKUP_BATCH_SIZE]
+                placeholders = ",".join("?" * len(part))
+                rows = self.conn.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", part)
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+                if found:
+                    self.conn.execute(f"UPDATE embeddings SET last_used = ? WHERE key IN ({placeholders})", (now, *part))
+            self.conn.commit()
+        return found
+
+    def put_many(self, items):
+        """Store `(key, vector)` pairs, evicting the least recently used entries above `max_entries`"""
+        now = time.time()
+        with self._lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [(key, array("f", vector).tobytes(), now) for key, vector in items],
+            )
+            overflow = self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                self.conn.execute(
+                    "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (overflow,),
+                )
+                self.evictions += overflow
+            self.conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def hit_ratio(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+class CachedEmbeddings(Embeddings):
+    """
+    `Embeddings` wrapper that serves document vectors from an `EmbeddingCache` and only
+    sends cache misses to the wrapped model. Query embeddings are not cached.
+    """
+
+    def __init__(self, embeddings, cache, model_name):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model_name = model_name
+
+    def embed_documents(self, texts):
+        keys = [text_key(self.model_name, text) for text in texts]
+        found = self.cache.get_many(list(set(keys)))
+
+        ## encode each distinct missing text once, even if it repeats within the batch
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        self.cache.hits += len(texts) - sum(1 for key in keys if key in missing)
+        self.cache.misses += sum(1 for key in keys if key in missing)
+
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            new_items = list(zip(missing.keys(), vectors))
+            self.cache.put_many(new_items)
+            found.update(new_items)
+        return [found[key] for key in keys]
+
+    def embed_query(self, text):
+        return self.embeddings.embed_query(text)
@@ -0,0 +1,128 @@
+"""
+Length-bucketed, multi-process sentence-transformers encoder for ingestion.
+
+Texts are sorted by token length and grouped into batches whose padded size stays under
+a token budget, so short chunks are not padded up to the length of near-1000-char ones.
+Batches are spread over a pool of model replicas, one per worker process with its share
+of the CPU threads, and the vectors are returned in the caller's original order.
+"""
+
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from langchain_core.embeddings import Embeddings
+
+## per-process model replica, set up by `_init_replica`
+_replica = None
+
+def _init_replica(model_name, threads):
+    global _replica
+    import torch
+    from sentence_transformers import SentenceTransformer
+    torch.set_num_threads(threads)
+    _replica = SentenceTransformer(model_name, device="cpu")
+
+def _encode_batch(texts, normalize):
+    return _replica.encode(texts, batch_size=len(texts), normalize_embeddings=normalize,
+                           convert_to_numpy=True, show_progress_bar=False)
+
+def make_batches(lengths, token_budget, max_batch_size):
+    """
+    Group text indices into batches of similar token length.
+
+    Indices are sorted by length and a batch is closed once adding the next text would
+    push `batch_size * longest_length` (the padded tensor size) over `token_budget`.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    batches = []
+    batch = []
+    longest = 0
+    for i in order:
+        length = max(lengths[i], 1)
+        if batch and ((len(batch) + 1) * max(longest, length) > token_budget or len(batch) >= max_batch_size):
+            batches.append(batch)
+            batch = []
+            longest = 0
+        batch.append(i)
+        longest = max(longest, length)
+    if batch:
+        batches.append(batch)
+    return batches
+
+class BucketedEmbeddings(Embeddings):
+    def __init__(self, model_name, replicas=1, threads=None, token_budget=16384, max_batch_size=256, normalize_embeddings=False):
+        """`threads` is the total CPU threads shared by the replicas (default: the CPU count)"""
+        from transformers import AutoTokenizer
+        from sentence_transformers import SentenceTransformer
+
+        self.model_name = model_name
+        self.replicas = max(1, replicas)
+        self.token_budget = token_budget
+        self.max_batch_size = max_batch_size
+        self.normalize_embeddings = normalize_embeddings
+        self.encoded = 0
+        self.encode_seconds = 0.0
+        self.threads_per_replica = max(1, (threads or os.cpu_count() or 1) // self.replicas)
+
+        if self.replicas == 1:
+            import torch
+            torch.set_num_threads(self.threads_per_replica)
+            self._model = SentenceTransformer(model_name, device="cpu")
+            self.tokenizer = self._model.tokenizer
+            self.max_seq_length = self._model.max_seq_length
+            self._pool = None
+        else:
+            ## the parent only needs the tokenizer to measure lengths, the replicas hold the model
+            self._model = None
+            self.tokenizer = AutoTokenizer.from_pretrained(f"sentence-transformers/{model_name}"
+                                                           if "/" not in model_name else model_name)
+            self.max_seq_length = min(self.tokenizer.model_max_length, 256)
+            ## replicas start on the first submit, from a pipeline thread, so they are spawned rather than forked
+            self._pool = ProcessPoolExecutor(max_workers=self.replicas, mp_context=multiprocessing.get_context("spawn"),
+                                             initializer=_init_replica, initargs=(model_name, self.threads_per_replica))
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def token_lengths(self, texts):
+        encoded = self.tokenizer(texts, add_special_tokens=True, truncation=True, max_length=self.max_seq_length)
+        return [len(ids) for ids in encoded["input_ids"]]
+
+    def _encode(self, texts):
+        if self._pool is None:
+            return self._model.encode(texts, batch_size=len(texts), normalize_embeddings=self.normalize_embeddings,
+                                      convert_to_numpy=True, show_progress_bar=False)
+        return self._pool.submit(_encode_batch, texts, self.normalize_embeddings).result()
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        start = time.perf_counter()
+        batches = make_batches(self.token_lengths(texts), self.token_budget, self.max_batch_size)
+
+        vectors = [None] * len(texts)
+        if self._pool is None:
+            for batch in batches:
+                for i, vector in zip(batch, self._encode([texts[i] for i in batch])):
+                    vectors[i] = vector.tolist()
+        else:
+            ## every replica works on its own batch, results are put back in the original order
+            futures = [(batch, self._pool.submit(_encode_batch, [texts[i] for i in batch], self.normalize_embeddings))
+                       for batch in batches]
+            for batch, future in futures:
+                for i, vector in zip(batch, future.result()):
+                    vectors[i] = vector.tolist()
+
+        self.encoded += len(texts)
+        self.encode_seconds += time.perf_counter() - start
+        return vectors
+
+    def embed_query(self, text):
+        return self._encode([text])[0].tolist()
+
+    def chunks_per_second(self):
+        return self.encoded / self.encode_seconds if self.encode_seconds else 0.0
@@ -0,0 +1,102 @@
+"""
+Persistent cache of parsed MultiQuery results.
+
+The expander's answer (`documentRetrievalRequired` plus `generatedQueries`) depends only
+on the user query, the last few history messages and the prompt, so it is keyed by the
+normalized query and a hash of the other two. Entries expire after `ttl` seconds and
+the least recently used are evicted beyond `max_entries`.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from answer_cache import history_key
+from retrieval import normalize_query
+
+def expansion_key(query, history, history_turns, prompt_version=""):
+    key = f"{prompt_version}\0{history_key(history, history_turns)}\0{normalize_query(query)}"
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+
+class ExpansionCache:
+    def __init__(self, db_path, max_entries=20000, ttl=7 * 24 * 3600, history_turns=4):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.history_turns = history_turns
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS expansions (
+                key        BLOB PRIMARY KEY,
+                result     TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used  REAL NOT NULL
+            )
+            """
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS expansions_last_used ON expansions (last_used)")
+        self.conn.commit()
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    def __len__(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM expansions").fetchone()[0]
+
+    def get(self, query, history, prompt_version=""):
+        """The cached MultiQuery result for `query` in this history window, or None"""
+        key = expansion_key(query, history, self.history_turns, prompt_version)
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute("SELECT result, created_at FROM expansions WHERE key = ?", (key,)).fetchone()
+            if row is None or row[1] < now - self.ttl:
+                self.misses += 1
+                return None
+            self.conn.execute("UPDATE expansions SET last_used = ? WHERE key = ?", (now, key))
+            self.conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, query, history, result, prompt_version=""):
+        key = expansion_key(query, history, self.history_turns, prompt_version)
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO expansions (key, result, created_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(result, ensure_ascii=False), now, now),
+            )
+            evicted = self.conn.execute("DELETE FROM expansions WHERE created_at < ?", (now - self.ttl,)).rowcount
+            overflow = self.conn.execute("SELECT COUNT(*) FROM expansions").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                evicted += self.conn.execute(
+                    "DELETE FROM expansions WHERE key IN (SELECT key FROM expansions ORDER BY last_used LIMIT ?)",
+                    (overflow,),
+                ).rowcount
+            self.evictions += evicted
+            self.conn.commit()
+
+    def hit_ratio(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        return {
+            "size": len(self),
+            "maxsize": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hit_ratio(), 4),
+        }
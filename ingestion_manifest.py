@@ -0,0 +1,196 @@
+"""
+SQLite manifest of ingested PDFs.
+
+Each row records the size, mtime, content hash and chunk count of one file in `data/`.
+Change detection is stat-first: a file is only hashed when its size or mtime differ
+from the manifest, so a no-op check over the whole corpus is a handful of `stat` calls.
+
+Files are recorded as soon as all of their chunks are in the vector store, and every
+ingestion run is tracked in a `runs` table, so an interrupted run can be resumed from
+the last committed file or restarted from scratch.
+"""
+
+import hashlib
+import os
+import sqlite3
+import time
+
+HASH_ALGORITHM = "blake2b"
+
+def get_content_hash(filepath):
+    """Hash a file with BLAKE2b using large buffered reads"""
+    with open(filepath, "rb") as f:
+        return hashlib.file_digest(f, HASH_ALGORITHM).hexdigest()
+
+def get_legacy_hash(filepath):
+    """MD5 of a file, as written to the old `processed_files.txt` log"""
+    with open(filepath, "rb") as f:
+        return hashlib.file_digest(f, "md5").hexdigest()
+
+class IngestionManifest:
+    def __init__(self, db_path):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS files (
+                filename     TEXT PRIMARY KEY,
+                size         INTEGER,
+                mtime_ns     INTEGER,
+                content_hash TEXT,
+                chunk_count  INTEGER NOT NULL DEFAULT 0,
+                updated_at   REAL,
+                run_id       INTEGER
+            )
+            """
+        )
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id      INTEGER PRIMARY KEY AUTOINCREMENT,
+                started_at  REAL NOT NULL,
+                finished_at REAL,
+                status      TEXT NOT NULL DEFAULT 'running'
+            )
+            """
+        )
+        self.conn.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)")
+        ## manifests written before runs were tracked have no `run_id` column
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(files)")]
+        if "run_id" not in columns:
+            self.conn.execute("ALTER TABLE files ADD COLUMN run_id INTEGER")
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def get_all(self):
+        """Return `{filename: (size, mtime_ns, content_hash, chunk_count)}` for every recorded file"""
+        rows = self.conn.execute("SELECT filename, size, mtime_ns, content_hash, chunk_count FROM files")
+        return {row[0]: row[1:] for row in rows}
+
+    def import_legacy_log(self, log_path, data_path):
+        """
+        One-off migration from the pipe-delimited `processed_files.txt`.
+
+        Legacy entries only carry an MD5, so each file is hashed once here: if it still
+        matches, the row is stored with its current stat and BLAKE2b hash; otherwise it
+        is left out so the next run picks the file up as modified.
+        """
+        if len(self) or not os.path.exists(log_path):
+            return 0
+        imported = 0
+        with open(log_path, "r") as f:
+            for line in f:
+                if "|" not in line:
+                    continue
+                filename, legacy_hash = line.rstrip("\n").rsplit("|", 1)
+                filepath = os.path.join(data_path, filename)
+                if not os.path.exists(filepath) or get_legacy_hash(filepath) != legacy_hash:
+                    continue
+                st = os.stat(filepath)
+                self.record_file(filename, st.st_size, st.st_mtime_ns, get_content_hash(filepath), 0, commit=False)
+                imported += 1
+        self.conn.commit()
+        return imported
+
+    def find_changes(self, data_path, pdfs):
+        """
+        Compare the PDFs on disk with the manifest.
+
+        Returns `(changed, removed)` where `changed` is a list of
+        `(filename, size, mtime_ns, content_hash)` for new or modified files and
+        `removed` lists files that are in the manifest but no longer on disk.
+        Files whose stat changed but whose content did not only get their stat refreshed.
+        """
+        known = self.get_all()
+        changed = []
+        for pdf in pdfs:
+            st = os.stat(os.path.join(data_path, pdf))
+            entry = known.get(pdf)
+            if entry is not None and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+                continue ## stat unchanged, skip hashing entirely
+
+            content_hash = get_content_hash(os.path.join(data_path, pdf))
+            if entry is not None and entry[2] == content_hash:
+                self.conn.execute("UPDATE files SET size = ?, mtime_ns = ? WHERE filename = ?",
+                                  (st.st_size, st.st_mtime_ns, pdf))
+                continue
+            changed.append((pdf, st.st_size, st.st_mtime_ns, content_hash))
+        self.conn.commit()
+
+        on_disk = set(pdfs)
+        removed = [filename for filename in known if filename not in on_disk]
+        return changed, removed
+
+    def record_file(self, filename, size, mtime_ns, content_hash, chunk_count, run_id=None, commit=True):
+        self.conn.execute(
+            """
+            INSERT INTO files (filename, size, mtime_ns, content_hash, chunk_count, updated_at, run_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(filename) DO UPDATE SET
+                size = excluded.size,
+                mtime_ns = excluded.mtime_ns,
+                content_hash = excluded.content_hash,
+                chunk_count = excluded.chunk_count,
+                updated_at = excluded.updated_at,
+                run_id = excluded.run_id
+            """,
+            (filename, size, mtime_ns, content_hash, chunk_count, time.time(), run_id),
+        )
+        if commit:
+            self.conn.commit()
+
+    def remove_file(self, filename, commit=True):
+        self.conn.execute("DELETE FROM files WHERE filename = ?", (filename,))
+        if commit:
+            self.conn.commit()
+
+    def get_setting(self, key, default=None):
+        row = self.conn.execute("SELECT value FROM settings WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_setting(self, key, value):
+        self.conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, value))
+        self.conn.commit()
+
+    def total_chunks(self):
+        return self.conn.execute("SELECT COALESCE(SUM(chunk_count), 0) FROM files").fetchone()[0]
+
+    def get_unfinished_run(self):
+        """ID of the most recent run that never finished, or None"""
+        row = self.conn.execute(
+            "SELECT run_id FROM runs WHERE status = 'running' ORDER BY run_id DESC LIMIT 1"
+        ).fetchone()
+        return row[0] if row else None
+
+    def begin_run(self):
+        cursor = self.conn.execute("INSERT INTO runs (started_at) VALUES (?)", (time.time(),))
+        self.conn.commit()
+        return cursor.lastrowid
+
+    def finish_run(self, run_id, status="finished"):
+        self.conn.execute("UPDATE runs SET finished_at = ?, status = ? WHERE run_id = ?",
+                          (time.time(), status, run_id))
+        self.conn.commit()
+
+    def count_run_files(self, run_id):
+        return self.conn.execute("SELECT COUNT(*) FROM files WHERE run_id = ?", (run_id,)).fetchone()[0]
+
+    def get_run_files(self, run_id):
+        return {row[0] for row in self.conn.execute("SELECT filename FROM files WHERE run_id = ?", (run_id,))}
+
+    def abandon_run(self, run_id):
+        """
+        Forget the files an interrupted run committed so the next run ingests them again,
+        and mark the run as abandoned. Returns the number of files forgotten.
+        """
+        forgotten = self.conn.execute("DELETE FROM files WHERE run_id = ?", (run_id,)).rowcount
+        self.conn.execute("UPDATE runs SET finished_at = ?, status = 'abandoned' WHERE run_id = ?",
+                          (time.time(), run_id))
+        self.conn.commit()
+        return forgotten
@@ -0,0 +1,219 @@
+"""
+Memory-mapped exact-search copy of the vector store.
+
+For a corpus of this size a brute-force dot product over one contiguous matrix is faster
+than a Chroma round trip and opens almost instantly. `data-ingestion.py` exports the
+stored chunks after every run that changes them:
+
+    meta.json        row count, dimension, dtype
+    vectors.npy      (rows, dim) float32 or float16, L2-normalized
+    chunk_ids.npy    chunk ID of each row
+    sources.json     distinct `source` values
+    source_rows.npy  int32 index into sources.json of each row
+    offsets.npy      int64, the record of row i is documents.bin[offsets[i]:offsets[i + 1]]
+    documents.bin    UTF-8 JSON `{"page_content", "metadata"}` records
+
+Scores are cosine similarities; all-MiniLM-L6-v2 vectors are unit length, so the ranking
+matches Chroma's L2 ranking. Select it with `RETRIEVER_BACKEND=numpy`.
+"""
+
+import json
+import mmap
+import os
+import shutil
+import threading
+from typing import List
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+
+## rows scored per block when the matrix is float16, numpy has no fast half-precision matmul
+FLOAT16_BLOCK_ROWS = 16384
+
+def store_exists(store_dir):
+    return os.path.exists(os.path.join(store_dir, "meta.json"))
+
+def store_dtype(store_dir):
+    """dtype of the exported matrix, or None if nothing has been exported yet"""
+    if not store_exists(store_dir):
+        return None
+    with open(os.path.join(store_dir, "meta.json")) as f:
+        return json.load(f)["dtype"]
+
+def export_from_store(vectorDB, store_dir, dtype="float32", batch_size=5000):
+    """Export every chunk in the Chroma store into `store_dir`, returning the row count"""
+    tmp_dir = f"{store_dir}.tmp"
+    old_dir = f"{store_dir}.old"
+    for path in (tmp_dir, old_dir):
+        shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    vectors, chunk_ids, source_rows, offsets = [], [], [], [0]
+    sources = {}
+    with open(os.path.join(tmp_dir, "documents.bin"), "wb") as f:
+        offset = 0
+        while True:
+            page = vectorDB._collection.get(include=["embeddings", "documents", "metadatas"], limit=batch_size, offset=offset)
+            if not len(page["ids"]):
+                break
+            vectors.append(np.asarray(page["embeddings"], dtype=np.float32))
+            for chunk_id, text, metadata in zip(page["ids"], page["documents"], page["metadatas"]):
+                metadata = metadata or {}
+                record = json.dumps({"page_content": text, "metadata": metadata}, ensure_ascii=False).encode("utf-8")
+                f.write(record)
+                offsets.append(offsets[-1] + len(record))
+                chunk_ids.append(chunk_id)
+                source_rows.append(sources.setdefault(metadata.get("source", ""), len(sources)))
+            offset += len(page["ids"])
+
+    matrix = np.concatenate(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix = (matrix / np.where(norms == 0, 1, norms)).astype(dtype)
+
+    np.save(os.path.join(tmp_dir, "vectors.npy"), matrix)
+    np.save(os.path.join(tmp_dir, "chunk_ids.npy"), np.array(chunk_ids, dtype="S") if chunk_ids else np.zeros(0, dtype="S32"))
+    np.save(os.path.join(tmp_dir, "source_rows.npy"), np.array(source_rows, dtype=np.int32))
+    np.save(os.path.join(tmp_dir, "offsets.npy"), np.array(offsets, dtype=np.int64))
+    with open(os.path.join(tmp_dir, "sources.json"), "w", encoding="utf-8") as f:
+        json.dump(list(sources), f, ensure_ascii=False)
+    with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+        json.dump({"rows": len(chunk_ids), "dim": int(matrix.shape[1]), "dtype": dtype}, f)
+
+    ## swap directories, open memory maps keep reading the old files
+    if os.path.exists(store_dir):
+        os.replace(store_dir, old_dir)
+    os.replace(tmp_dir, store_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return len(chunk_ids)
+
+class _MatrixFiles:
+    """One opened version of the export; a reload builds a new one instead of changing this one"""
+
+    def __init__(self, store_dir=None):
+        self.rows = 0
+        self.row_of = {}
+        self.documents = None
+        if store_dir is None:
+            return
+        path = lambda name: os.path.join(store_dir, name)
+        with open(path("meta.json")) as f:
+            meta = json.load(f)
+        with open(path("sources.json"), encoding="utf-8") as f:
+            self.sources = json.load(f)
+        self.source_index = {source: i for i, source in enumerate(self.sources)}
+        self.vectors = np.load(path("vectors.npy"), mmap_mode="r")
+        self.chunk_ids = np.load(path("chunk_ids.npy"), mmap_mode="r")
+        self.source_rows = np.load(path("source_rows.npy"), mmap_mode="r")
+        self.offsets = np.load(path("offsets.npy"), mmap_mode="r")
+        self.rows = meta["rows"]
+        if self.rows:
+            with open(path("documents.bin"), "rb") as f:
+                self.documents = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.row_of = {chunk_id.decode("ascii"): row for row, chunk_id in enumerate(self.chunk_ids)}
+
+    def document(self, row):
+        record = json.loads(self.documents[self.offsets[row]:self.offsets[row + 1]].decode("utf-8"))
+        return Document(id=self.chunk_ids[row].decode("ascii"), page_content=record["page_content"], metadata=record["metadata"])
+
+    def filter_mask(self, where):
+        if set(where) == {"$or"}:
+            return np.logical_or.reduce([self.filter_mask(clause) for clause in where["$or"]])
+        if len(where) != 1 or set(where) - {"source", "chunk_id"}:
+            raise ValueError(f"MatrixStore only filters on `source` and `chunk_id`, got {where}")
+        (key, condition), = where.items()
+        values = condition["$in"] if isinstance(condition, dict) else [condition]
+        if key == "source":
+            return np.isin(self.source_rows, [self.source_index[value] for value in values if value in self.source_index])
+        mask = np.zeros(self.rows, dtype=bool)
+        mask[[self.row_of[value] for value in values if value in self.row_of]] = True
+        return mask
+
+class MatrixStore:
+    """
+    Read side of the export, with the same `search_by_vectors` / `get_by_ids` interface
+    as `BatchRetriever` so it can stand in for Chroma there. `where` filters support
+    `{"source": value}`, `{"source": {"$in": [values]}}`, the same on `chunk_id`, and an
+    `$or` of those.
+
+    Searches run on executor threads while `load` may swap in a new export, so every
+    call reads one `_MatrixFiles` snapshot throughout. The previous snapshot's memory
+    maps are not closed; they are released once the last search using them returns.
+    """
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """(Re)open the exported files, e.g. after ingestion exported a new version"""
+        with self._lock:
+            self._files = _MatrixFiles(self.store_dir if store_exists(self.store_dir) else None)
+
+    @property
+    def vectors(self):
+        return self._files.vectors
+
+    @property
+    def chunk_ids(self):
+        return self._files.chunk_ids
+
+    def __len__(self):
+        return self._files.rows
+
+    def document(self, row):
+        return self._files.document(row)
+
+    def get_by_ids(self, ids) -> List[Document]:
+        files = self._files
+        return [files.document(files.row_of[chunk_id]) for chunk_id in ids if chunk_id in files.row_of]
+
+    def _filter_rows(self, files, where):
+        """Row indices allowed by `where`, or None for every row"""
+        if not where:
+            return None
+        return np.flatnonzero(files.filter_mask(where))
+
+    def _scores(self, vectors, queries):
+        if vectors.dtype == np.float32:
+            return vectors @ queries.T
+        scores = np.empty((len(vectors), len(queries)), dtype=np.float32)
+        for start in range(0, len(vectors), FLOAT16_BLOCK_ROWS):
+            block = np.asarray(vectors[start:start + FLOAT16_BLOCK_ROWS], dtype=np.float32)
+            scores[start:start + len(block)] = block @ queries.T
+        return scores
+
+    def search_by_vectors(self, query_embeddings, k=5, where=None) -> List[List[Document]]:
+        """Exact top `k` rows by cosine similarity for every query vector"""
+        files = self._files
+        if not len(query_embeddings) or not files.rows:
+            return [[] for _ in query_embeddings]
+        queries = np.array(query_embeddings, dtype=np.float32)
+        queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+
+        rows = self._filter_rows(files, where)
+        vectors = files.vectors if rows is None else files.vectors[rows]
+        if not len(vectors):
+            return [[] for _ in query_embeddings]
+        scores = self._scores(vectors, queries)
+
+        k = min(k, len(vectors))
+        ranked = []
+        for column in scores.T:
+            top = np.argpartition(-column, k - 1)[:k]
+            top = top[np.argsort(-column[top])]
+            ranked.append([files.document(row if rows is None else rows[row]) for row in top])
+        return ranked
+
+class MatrixRetriever(BaseRetriever):
+    """Drop-in replacement for `vectorDB.as_retriever(search_kwargs={"k": k})` backed by a `MatrixStore`"""
+
+    store: MatrixStore
+    embeddings: Embeddings
+    k: int = 5
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return self.store.search_by_vectors([self.embeddings.embed_query(query)], k=self.k)[0]
@@ -0,0 +1,77 @@
+"""
+PDF text-extraction backends for ingestion.
+
+Every backend takes the path of a PDF and returns one `Document` per page with the
+`source`, `page` (0-based) and `total_pages` metadata the rest of the pipeline expects.
+Only `pypdf` is a hard dependency; the others are imported when selected.
+"""
+
+from langchain_core.documents import Document
+
+DEFAULT_BACKEND = "pypdf"
+
+def _pages_to_documents(path, texts):
+    total_pages = len(texts)
+    return [
+        Document(page_content=text, metadata={"source": path, "page": page, "total_pages": total_pages})
+        for page, text in enumerate(texts)
+    ]
+
+def load_with_pypdf(path):
+    """LangChain's PyPDFLoader, the original extractor"""
+    from langchain_community.document_loaders.pdf import PyPDFLoader
+    return PyPDFLoader(file_path=path, extract_images=False).load()
+
+def load_with_pymupdf(path):
+    """PyMuPDF (`pip install pymupdf`), a C extractor that is usually several times faster than pypdf"""
+    try:
+        import pymupdf
+    except ImportError:
+        raise ImportError("The `pymupdf` backend needs PyMuPDF: pip install pymupdf")
+    with pymupdf.open(path) as pdf:
+        texts = [page.get_text() for page in pdf]
+    return _pages_to_documents(path, texts)
+
+def load_with_pypdfium2(path):
+    """pypdfium2 (`pip install pypdfium2`), bindings to Chrome's PDFium"""
+    try:
+        import pypdfium2
+    except ImportError:
+        raise ImportError("The `pypdfium2` backend needs pypdfium2: pip install pypdfium2")
+    pdf = pypdfium2.PdfDocument(path)
+    try:
+        texts = []
+        for page in pdf:
+            textpage = page.get_textpage()
+            texts.append(textpage.get_text_range())
+            textpage.close()
+            page.close()
+    finally:
+        pdf.close()
+    return _pages_to_documents(path, texts)
+
+def load_with_pdfminer(path):
+    """pdfminer.six (`pip install pdfminer.six`), slow but layout-aware"""
+    try:
+        from pdfminer.high_level import extract_pages
+        from pdfminer.layout import LTTextContainer
+    except ImportError:
+        raise ImportError("The `pdfminer` backend needs pdfminer.six: pip install pdfminer.six")
+    texts = []
+    for layout in extract_pages(path):
+        texts.append("".join(element.get_text() for element in layout if isinstance(element, LTTextContainer)))
+    return _pages_to_documents(path, texts)
+
+BACKENDS = {
+    "pypdf": load_with_pypdf,
+    "pymupdf": load_with_pymupdf,
+    "pypdfium2": load_with_pypdfium2,
+    "pdfminer": load_with_pdfminer,
+}
+
+def get_backend(name):
+    """Look up an extraction backend by name"""
+    try:
+        return BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown PDF backend `{name}`. Available backends: {', '.join(BACKENDS)}")
@@ -0,0 +1,91 @@
+"""
+Prompt files compiled once and recompiled only when they change on disk.
+
+Each registered prompt has a build function that turns the file text into whatever
+the request path needs: a `Template` split at its placeholders, a set of them, or a
+whole langchain chain. `PromptRegistry.get` costs one `os.stat`; the file is read
+and rebuilt only when its mtime changes, so prompts stay editable while the server
+runs. A file that disappears or fails to build keeps serving its last good version.
+"""
+
+import hashlib
+import os
+import re
+import threading
+
+class Template:
+    """Prompt text split once at its `{name}` placeholders and filled in a single pass"""
+
+    def __init__(self, text, variables):
+        self.text = text
+        self.variables = tuple(variables)
+        pattern = re.compile("|".join(r"\{%s\}" % re.escape(name) for name in self.variables))
+        ## even positions hold literal text, odd positions variable names
+        self.parts = []
+        last = 0
+        for match in pattern.finditer(text):
+            self.parts.append(text[last:match.start()])
+            self.parts.append(match.group()[1:-1])
+            last = match.end()
+        self.parts.append(text[last:])
+
+    def format(self, **values):
+        """The text with every placeholder replaced; inserted values are never rescanned"""
+        parts = self.parts[:]
+        for i in range(1, len(parts), 2):
+            parts[i] = values[parts[i]]
+        return "".join(parts)
+
+class PromptRegistry:
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.reloads = 0
+
+    def register(self, name, path, build):
+        """Load `path` and keep `build(text)` under `name`"""
+        self._entries[name] = {"path": path, "build": build, "mtime": None, "value": None, "version": None}
+        self._reload(name)
+
+    def _reload(self, name):
+        entry = self._entries[name]
+        try:
+            mtime = os.stat(entry["path"]).st_mtime_ns
+        except OSError as e:
+            if entry["value"] is None:
+                raise
+            print(f"⚠️ Prompt {name} unavailable, keeping the loaded version: {e}")
+            return
+        with self._lock:
+            if mtime == entry["mtime"]:
+                return
+            try:
+                with open(entry["path"], "r", encoding="utf-8") as f:
+                    text = f.read()
+                value = entry["build"](text)
+            except Exception as e:
+                if entry["value"] is None:
+                    raise
+                print(f"⚠️ Failed to reload prompt {name}, keeping the loaded version: {e}")
+                entry["mtime"] = mtime
+                return
+            entry["value"] = value
+            entry["version"] = hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+            entry["mtime"] = mtime
+            self.reloads += 1
+
+    def get(self, name):
+        """The compiled prompt, rebuilt first if its file changed since the last call"""
+        self._reload(name)
+        return self._entries[name]["value"]
+
+    def version(self, name):
+        """Digest of the text the current compiled prompt was built from"""
+        self._reload(name)
+        return self._entries[name]["version"]
+
+    def stats(self):
+        return {
+            "prompts": {name: entry["version"] for name, entry in self._entries.items()},
+            "reloads": self.reloads,
+        }
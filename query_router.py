@@ -0,0 +1,157 @@
+"""
+Local fast path in front of the MultiQuery LLM call.
+
+`createMultiQueryChain` asks gpt-3.5-turbo whether a message needs retrieval and for
+rephrasings of it, even for "hi", "thanks" or a plain one-line statute question.
+`QueryRouter` answers those cases on the CPU:
+
+1. greetings, thanks and confirmations that open a conversation need no retrieval;
+2. mid-conversation, only short questions that name an act and do not refer back
+   ("explain it further") are decided locally, the LLM resolves the rest, including a
+   "yes" or "ok" that may accept the assistant's offer to explain more;
+3. short questions at the start of a conversation that name an act or use legal terms
+   are retrieved as they are;
+4. anything else is scored against labelled example messages with the MiniLM query
+   embeddings, and only a clear margin decides locally.
+
+Everything else, including long or multi-part questions that benefit from rephrasing,
+escalates to the LLM. `route` returns the same dict as the chain, or None to escalate.
+"""
+
+import threading
+
+import numpy as np
+
+from bm25_index import words
+
+CHITCHAT_WORDS = frozenset([
+    "hi", "hello", "hey", "hii", "namaste", "namaskar", "good", "morning", "afternoon", "evening", "night",
+    "thanks", "thank", "you", "thankyou", "thx", "ok", "okay", "k", "yes", "no", "yeah", "yep", "nope",
+    "sure", "great", "cool", "nice", "bye", "goodbye", "see", "ya", "there", "so", "much", "shukriya",
+    "dhanyavad", "alright", "fine", "got", "it", "understood", "welcome", "a", "lot", "very",
+    "नमस्ते", "नमस्कार", "धन्यवाद", "शुक्रिया", "हाँ", "हां", "नहीं", "ठीक", "है", "अलविदा", "बहुत",
+])
+
+LEGAL_TERMS = frozenset([
+    "act", "acts", "section", "sections", "article", "articles", "law", "laws", "legal", "code", "ipc", "crpc",
+    "bail", "fir", "court", "punishment", "penalty", "offence", "offense", "rights", "contract",
+    "property", "divorce", "marriage", "inheritance", "lease", "tenant", "landlord", "appeal",
+    "petition", "constitution", "rules", "regulation", "statute", "clause", "provision", "provisions",
+    "arrest", "warrant", "sentence", "crime", "criminal", "civil", "tribunal", "advocate", "lawyer", "writ",
+    "धारा", "अधिनियम", "कानून", "कानूनी", "संविधान", "अनुच्छेद", "अदालत", "न्यायालय", "जमानत", "सजा", "अधिकार",
+])
+
+## words that only make sense with the earlier conversation
+FOLLOW_UP_WORDS = frozenset([
+    "it", "this", "that", "these", "those", "he", "she", "they", "him", "her", "them", "its", "their",
+    "above", "previous", "same", "further", "more", "elaborate", "also", "again", "earlier",
+    "यह", "वह", "इसे", "उसे", "इसके", "उसके", "ये", "वे",
+])
+
+LEGAL_EXAMPLES = [
+    "Explain property laws", "What is the Indian Penal Code?", "Tell me about fundamental rights",
+    "How does contract law work?", "What are the penalties for theft?", "Explain inheritance laws",
+    "How do I file a case?", "What are my legal rights?", "What does the law say about dowry?",
+    "What is the punishment for cheating?", "How can I get bail?", "Can my landlord evict me without notice?",
+    "What is the procedure for divorce?", "How to register a will?", "What is section 420?",
+    "Rights of an arrested person", "Process to file an FIR", "What is anticipatory bail?",
+    "संपत्ति कानून क्या है?", "चोरी की सजा क्या है?", "तलाक की प्रक्रिया क्या है?",
+]
+
+CHITCHAT_EXAMPLES = [
+    "Hello", "Hi", "Good morning", "How are you?", "Thank you", "Thanks a lot", "Okay", "Yes", "No",
+    "What's the weather today?", "Tell me a joke", "Who won the cricket match?", "What should I cook for dinner?",
+    "Bye", "See you later", "Nice talking to you", "What is your name?", "नमस्ते", "धन्यवाद", "आप कैसे हैं?",
+]
+
+def _has_user_turn(history):
+    for msg in history or []:
+        role = msg.get("role") if isinstance(msg, dict) else getattr(msg, "type", None)
+        if role in ("user", "human"):
+            return True
+    return False
+
+class QueryRouter:
+    def __init__(self, embed, embed_many, act_index=None, max_words=20, min_similarity=0.45, margin=0.15):
+        self.embed = embed
+        self.embed_many = embed_many
+        self.act_index = act_index
+        self.max_words = max_words
+        self.min_similarity = min_similarity
+        self.margin = margin
+        self.requests = 0
+        self.skipped = 0
+        self.decisions = {}
+        self._examples = None
+        self._lock = threading.Lock()
+
+    def _example_embeddings(self):
+        """Unit embeddings of the labelled examples, encoded on first use"""
+        with self._lock:
+            if self._examples is None:
+                self._examples = {}
+                for label, examples in (("legal", LEGAL_EXAMPLES), ("chitchat", CHITCHAT_EXAMPLES)):
+                    vectors = np.asarray(self.embed_many(examples), dtype=np.float32)
+                    self._examples[label] = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+            return self._examples
+
+    def classify(self, message):
+        """`(label, legal_similarity, chitchat_similarity)` by nearest labelled example"""
+        embedding = np.asarray(self.embed(message), dtype=np.float32)
+        embedding /= max(float(np.linalg.norm(embedding)), 1e-12)
+        scores = {label: float((vectors @ embedding).max()) for label, vectors in self._example_embeddings().items()}
+        best = max(scores, key=scores.get)
+        other = min(scores, key=scores.get)
+        if scores[best] >= self.min_similarity and scores[best] - scores[other] >= self.margin:
+            return best, scores["legal"], scores["chitchat"]
+        return None, scores["legal"], scores["chitchat"]
+
+    def _decide(self, message, history):
+        tokens = words(message)
+        if not tokens:
+            return "empty", {"documentRetrievalRequired": False, "generatedQueries": []}
+        mid_conversation = _has_user_turn(history)
+        ## after a follow-up question from the assistant, "yes" or "ok" asks for more retrieval
+        if not mid_conversation and len(tokens) <= 6 and all(token in CHITCHAT_WORDS for token in tokens):
+            return "chitchat", {"documentRetrievalRequired": False, "generatedQueries": []}
+        ## long or multi-part questions benefit from the LLM's rephrasings
+        if len(tokens) > self.max_words or message.count("?") > 1:
+            return None, None
+        retrieve = {"documentRetrievalRequired": True, "generatedQueries": [message]}
+        names_act = self.act_index is not None and bool(self.act_index.match_sources([message]))
+        if mid_conversation:
+            ## mid-conversation only a question that names its act stands on its own
+            if names_act and not any(token in FOLLOW_UP_WORDS for token in tokens):
+                return "names_act", retrieve
+            return None, None
+        if names_act:
+            return "names_act", retrieve
+        if any(token in LEGAL_TERMS for token in tokens):
+            return "legal_terms", retrieve
+        label, _, _ = self.classify(message)
+        if label == "legal":
+            return "classifier_legal", retrieve
+        if label == "chitchat":
+            return "classifier_chitchat", {"documentRetrievalRequired": False, "generatedQueries": []}
+        return None, None
+
+    def route(self, message, history):
+        """The MultiQuery result for `message` if it can be decided locally, otherwise None"""
+        decision, result = self._decide(message.strip(), history)
+        with self._lock:
+            self.requests += 1
+            if decision is not None:
+                self.skipped += 1
+            self.decisions[decision or "escalated"] = self.decisions.get(decision or "escalated", 0) + 1
+        return result
+
+    def skip_ratio(self):
+        return self.skipped / self.requests if self.requests else 0.0
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "skipped_llm": self.skipped,
+            "skip_ratio": round(self.skip_ratio(), 4),
+            "decisions": dict(self.decisions),
+        }
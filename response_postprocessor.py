@@ -0,0 +1,179 @@
+"""
+Single-pass post-processing of chat answers, on a whole text or on a token stream.
+
+English headers and disclaimer phrases in Hindi answers are translated by one
+compiled alternation in a single pass, instead of a chain of `in` checks and
+`str.replace` calls. Answers that do not start with a markdown header get the
+introduction header and legal disclaimer around them, and an answer containing a
+refusal phrase (in any case) is replaced by a generic one.
+
+`ResponsePostProcessor.feed` takes streamed chunks and returns the text that is safe
+to show. Only a trailing piece of input that is still the beginning of a fragment is
+held back until the next chunk completes or breaks it, and refusal phrases are looked
+for in the new text plus the few characters before it, so nothing is rescanned.
+"""
+
+import re
+
+## English fragments of Hindi answers and their translations
+HINDI_REPLACEMENTS = {
+    "Introduction:": "**परिचय:**",
+    "Key Provisions:": "**मुख्य प्रावधान:**",
+    "Scope and Application:": "**कार्यक्षेत्र और अनुप्रयोग:**",
+    "Procedures and Requirements:": "**प्रक्रियाएं और आवश्यकताएं:**",
+    "Important Considerations:": "**महत्वपूर्ण विचार:**",
+    "Conclusion:": "**निष्कर्ष:**",
+    "Legal Disclaimer:": "**कानूनी अस्वीकरण:**",
+    "This information is provided for educational purposes only": "यह जानकारी केवल शैक्षिक उद्देश्यों के लिए प्रदान की गई है",
+    "should not be construed as legal advice": "और इसे कानूनी सलाह नहीं माना जाना चाहिए",
+    "For specific legal matters": "विशिष्ट कानूनी मामलों के लिए",
+    "please consult with a qualified legal professional": "कृपया एक योग्य कानूनी पेशेवर से परामर्श करें",
+    "Sources:": "स्रोत:",
+    "Follow-up questions:": "अगले प्रश्न:",
+}
+
+REFUSAL_PHRASES = [
+    "i can only help with legal research questions",
+    "i can only help with legal research",
+    "please ask me about legal topics",
+    "i cannot help with this",
+    "i don't have information about this",
+]
+
+## (prefix, suffix) added around answers without a header
+STRUCTURE = {
+    "hindi": ("**परिचय:**\n",
+              "\n\n**कानूनी अस्वीकरण:**\n*यह जानकारी केवल शैक्षिक उद्देश्यों के लिए प्रदान की गई है और इसे कानूनी सलाह नहीं माना जाना चाहिए। विशिष्ट कानूनी मामलों के लिए, कृपया एक योग्य कानूनी पेशेवर से परामर्श करें।*"),
+    "english": ("**Introduction:**\n",
+                "\n\n**Legal Disclaimer:**\n*This information is provided for educational purposes only and should not be construed as legal advice. For specific legal matters, please consult with a qualified legal professional.*"),
+}
+
+## answers that replace a refusal
+REFUSAL_RESPONSES = {
+    "hindi": "**परिचय:**\nमैं आपके कानूनी प्रश्न का उत्तर देने में आपकी सहायता कर सकता हूं। यह एक सामान्य कानूनी विषय है जिसके बारे में मैं आपको जानकारी प्रदान कर सकता हूं।\n\n**मुख्य जानकारी:**\n{user_query} के बारे में सामान्य कानूनी जानकारी यहां उपलब्ध है। कृपया ध्यान दें कि यह सामान्य जानकारी है और विशिष्ट विवरण भिन्न हो सकते हैं।\n\n**कानूनी अस्वीकरण:**\n*यह जानकारी केवल शैक्षिक उद्देश्यों के लिए प्रदान की गई है और इसे कानूनी सलाह नहीं माना जाना चाहिए। विशिष्ट कानूनी मामलों के लिए, कृपया एक योग्य कानूनी पेशेवर से परामर्श करें।*",
+    "english": "**Introduction:**\nI can help you with your legal question. This is a general legal topic about which I can provide you with information.\n\n**Key Information:**\nGeneral legal information about {user_query} is available here. Please note that this is general information and specific details may vary.\n\n**Legal Disclaimer:**\n*This information is provided for educational purposes only and should not be construed as legal advice. For specific legal matters, please consult with a qualified legal professional.*",
+}
+
+def _prefix_pattern(fragments):
+    """Regex source matching any non-empty prefix of one of `fragments`, as a trie"""
+    branches = {}
+    for fragment in fragments:
+        if fragment:
+            branches.setdefault(fragment[0], []).append(fragment[1:])
+    alternatives = []
+    for char, rests in branches.items():
+        rest = _prefix_pattern(rests)
+        alternatives.append(re.escape(char) + (f"(?:{rest})?" if rest else ""))
+    return "|".join(alternatives)
+
+def _compile(replacements):
+    """`(pattern, partial, hold)` for a replacement table, or Nones when it is empty"""
+    if not replacements:
+        return None, None, 0
+    fragments = sorted(replacements, key=len, reverse=True)
+    pattern = re.compile("|".join(re.escape(fragment) for fragment in fragments))
+    ## the start of a fragment that the end of the input has not completed yet
+    partial = re.compile(f"(?:{_prefix_pattern(fragments)})\\Z")
+    return pattern, partial, len(fragments[0]) - 1
+
+_matchers = {
+    "hindi": (HINDI_REPLACEMENTS,) + _compile(HINDI_REPLACEMENTS),
+    "english": ({},) + _compile({}),
+}
+_refusal_window = max(map(len, REFUSAL_PHRASES)) - 1
+
+class ResponsePostProcessor:
+    """Post-processes one answer chunk by chunk; `response` holds the final text after `finish`"""
+
+    def __init__(self, user_query, language="english"):
+        self.user_query = user_query
+        self.language = "hindi" if language == "hindi" else "english"
+        self._replacements, self._pattern, self._partial, self._hold = _matchers[self.language]
+        self._pending = "" ## input that may start a fragment the next chunk completes
+        self._recent = "" ## lowercased end of the input, for refusals split across chunks
+        self._started = False
+        self._trailing = "" ## whitespace held back, dropped if the answer ends with it
+        self._head = "" ## output before the header check has two characters, None once decided
+        self._output = []
+        self.wrapped = False
+        self.refused = False
+        self.response = None
+
+    def _detect_refusal(self, chunk):
+        if self.refused:
+            return
+        window = self._recent + chunk.lower()
+        self.refused = any(phrase in window for phrase in REFUSAL_PHRASES)
+        self._recent = window[-_refusal_window:]
+
+    def _scan(self, final):
+        text = self._pending
+        if self._pattern is None:
+            self._pending = ""
+            return text
+        safe = len(text)
+        if not final:
+            partial = self._partial.search(text, max(0, len(text) - self._hold))
+            if partial is not None:
+                safe = partial.start()
+        pieces = []
+        pos = 0
+        ## a fragment starting before `safe` is already complete in `text`
+        for match in self._pattern.finditer(text):
+            if match.start() >= safe:
+                break
+            pieces.append(text[pos:match.start()])
+            pieces.append(self._replacements[match.group()])
+            pos = match.end()
+        if pos < safe:
+            pieces.append(text[pos:safe])
+            pos = safe
+        self._pending = text[pos:]
+        return "".join(pieces)
+
+    def _emit(self, text, final):
+        ## the answer is stripped like `str.strip`: leading whitespace dropped, trailing held back
+        text = self._trailing + text
+        if not self._started:
+            text = text.lstrip()
+            self._started = bool(text)
+        body = text.rstrip()
+        self._trailing = "" if final else text[len(body):]
+        text = body
+
+        if self._head is not None:
+            self._head += text
+            if len(self._head) < 2 and not final:
+                return ""
+            text, self._head = self._head, None
+            if not text.startswith("**") and not text.startswith("#"):
+                self.wrapped = True
+                text = STRUCTURE[self.language][0] + text
+        if final and self.wrapped:
+            text += STRUCTURE[self.language][1]
+        if text:
+            self._output.append(text)
+        return text
+
+    def feed(self, chunk):
+        """Text of the processed answer that can be shown after `chunk`, possibly empty"""
+        self._detect_refusal(chunk)
+        self._pending += chunk
+        return self._emit(self._scan(final=False), final=False)
+
+    def finish(self):
+        """The rest of the processed answer. If the answer was a refusal, `response` is the
+        replacement answer instead of the streamed text"""
+        tail = self._emit(self._scan(final=True), final=True)
+        if self.refused:
+            self.response = REFUSAL_RESPONSES[self.language].format(user_query=self.user_query)
+        else:
+            self.response = "".join(self._output)
+        return tail
+
+def post_process(text, user_query, language="english"):
+    """Post-process a complete answer"""
+    processor = ResponsePostProcessor(user_query, language)
+    processor.feed(text)
+    processor.finish()
+    return processor.response
@@ -0,0 +1,259 @@
+"""
+Batched retrieval for the multi-query RAG pipeline.
+
+`kb_retriever.invoke(query)` encodes and searches one query at a time. `BatchRetriever`
+encodes every generated query in a single model call, drops rephrasings whose embeddings
+are nearly identical, and runs one multi-vector Chroma search for the rest, returning
+one ranked list per kept query for `reciprocal_rank_fusion` (`generateRRF` in app.py) to
+fuse.
+
+Repeated queries are served from two in-process caches: normalized query text to its
+embedding, and normalized query text to the ranked chunk IDs it retrieved. Both are
+cleared whenever ingestion publishes a new index version.
+
+With a `lexical_index` (`bm25_index.BM25Index`), every kept query also gets a ranked
+list of BM25 hits, so exact tokens like section numbers reach `generateRRF` even when
+the dense search misses them. With an `act_index` (`act_index.ActIndex`), queries that
+name an act only search the chunks of that act, in both the vector and the BM25 lists,
+including the boilerplate chunks ingestion collapsed into another act's copy.
+"""
+
+import heapq
+import re
+import threading
+import time
+from typing import List
+
+from langchain_core.documents import Document
+
+from vector_store import get_chunk_id
+
+def cosine_similarity(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = (sum(x * x for x in a) * sum(y * y for y in b)) ** 0.5
+    return dot / norm if norm else 0.0
+
+_whitespace_re = re.compile(r"\s+")
+
+def source_filter(sources, chunk_ids=()):
+    """`where` clause for the chunks of `sources` plus the chunks in `chunk_ids`, or None"""
+    if not sources:
+        return None
+    where = {"source": {"$in": list(sources)}}
+    if chunk_ids:
+        where = {"$or": [where, {"chunk_id": {"$in": list(chunk_ids)}}]}
+    return where
+
+def normalize_query(query):
+    """Cache key for a query: case-folded, whitespace collapsed, trailing punctuation dropped"""
+    return _whitespace_re.sub(" ", query).strip().rstrip("?.!।").strip().casefold()
+
+def drop_similar_queries(queries, embeddings, threshold):
+    """
+    Keep the first of every group of queries whose embeddings have cosine similarity of
+    at least `threshold`. Returns the kept `(queries, embeddings)`.
+    """
+    kept_queries, kept_embeddings = [], []
+    for query, embedding in zip(queries, embeddings):
+        if any(cosine_similarity(embedding, other) >= threshold for other in kept_embeddings):
+            continue
+        kept_queries.append(query)
+        kept_embeddings.append(embedding)
+    return kept_queries, kept_embeddings
+
+def reciprocal_rank_fusion(all_docs: List[List[Document]], k: int = 60, top_n: int = 3) -> List[Document]:
+    """
+    Fuse ranked document lists with Reciprocal Rank Fusion.
+
+    Documents are matched by chunk ID (falling back to source, page and content for chunks
+    stored before IDs were stable), so no serialization is needed. Returns the original
+    `Document` objects of the `top_n` best fused scores, each with its score in
+    `metadata["rrf_score"]`.
+    """
+    rrf_scores = dict()
+    best_docs = dict() ## first `Document` object seen for each key
+    for docs in all_docs:
+        for rank, doc in enumerate(docs, start=1):
+            key = get_chunk_id(doc) or (doc.metadata.get("source"), doc.metadata.get("page"), doc.page_content)
+            rrf_scores[key] = rrf_scores.get(key, 0) + 1/(k+rank)
+            best_docs.setdefault(key, doc)
+    top_keys = heapq.nlargest(top_n, rrf_scores, key=rrf_scores.get)
+    for key in top_keys:
+        best_docs[key].metadata["rrf_score"] = rrf_scores[key]
+    return [best_docs[key] for key in top_keys]
+
+class BatchRetriever:
+    """
+    `embedding_cache` and `result_cache` are optional `TTLCache`s; `index_version` is a
+    callable returning the current index version, checked on every `retrieve` call.
+    `lexical_index` is reloaded whenever that version changes, and so is `vector_store`, an
+    optional `matrix_store.MatrixStore` that replaces the Chroma round trips, and
+    `act_index`, whose matches restrict the vector search to the acts a query names.
+    """
+
+    def __init__(self, vectorDB, embeddings, k=5, duplicate_threshold=0.95,
+                 embedding_cache=None, result_cache=None, index_version=None, lexical_index=None,
+                 vector_store=None, act_index=None):
+        self.vectorDB = vectorDB
+        self.vector_store = vector_store
+        self.act_index = act_index
+        self.requests = 0
+        self.filtered_requests = 0
+        self.embeddings = embeddings
+        self.k = k
+        self.duplicate_threshold = duplicate_threshold
+        self.embedding_cache = embedding_cache
+        self.result_cache = result_cache
+        self.index_version = index_version
+        self._cached_version = index_version() if index_version else None
+        self._reload_lock = threading.Lock()
+        self.lexical_index = lexical_index
+        self.lexical_queries = 0
+        self.lexical_seconds = 0.0
+
+    def search_by_vectors(self, query_embeddings, k=None, where=None) -> List[List[Document]]:
+        """One vector search for all vectors, returning a ranked list of `Document`s per vector"""
+        if not query_embeddings:
+            return []
+        if self.vector_store is not None:
+            return self.vector_store.search_by_vectors(query_embeddings, k=k or self.k, where=where)
+        results = self.vectorDB._collection.query(
+            query_embeddings=query_embeddings,
+            n_results=k or self.k,
+            where=where,
+            include=["documents", "metadatas", "distances"],
+        )
+        ranked = []
+        for ids, texts, metadatas in zip(results["ids"], results["documents"], results["metadatas"]):
+            ranked.append([
+                Document(id=chunk_id, page_content=text, metadata=metadata or {})
+                for chunk_id, text, metadata in zip(ids, texts, metadatas)
+            ])
+        return ranked
+
+    def get_by_ids(self, ids) -> List[Document]:
+        """Stored chunks for `ids`, in the given order, skipping IDs no longer in the store"""
+        if not ids:
+            return []
+        if self.vector_store is not None:
+            return self.vector_store.get_by_ids(ids)
+        stored = self.vectorDB._collection.get(ids=list(ids), include=["documents", "metadatas"])
+        docs = {chunk_id: Document(id=chunk_id, page_content=text, metadata=metadata or {})
+                for chunk_id, text, metadata in zip(stored["ids"], stored["documents"], stored["metadatas"])}
+        return [docs[chunk_id] for chunk_id in ids if chunk_id in docs]
+
+    def check_index_version(self):
+        """
+        Reload the on-disk indexes and clear both caches if ingestion has published a new
+        index version. Returns the version the indexes now serve.
+
+        Requests on other threads keep searching while this runs: each index swaps in its
+        new files as one reference, and only one thread reloads per version.
+        """
+        if self.index_version is None:
+            return self._cached_version
+        version = self.index_version()
+        if version == self._cached_version:
+            return version
+        with self._reload_lock:
+            if version != self._cached_version:
+                for index in (self.lexical_index, self.vector_store, self.act_index):
+                    if index is not None:
+                        index.load()
+                for cache in (self.embedding_cache, self.result_cache):
+                    if cache is not None:
+                        cache.clear()
+                self._cached_version = version
+        return version
+
+    def embed_queries(self, queries):
+        """Embeddings for `queries`, encoding only those missing from the embedding cache in one call"""
+        if self.embedding_cache is None:
+            return self.embeddings.embed_documents(queries)
+        query_embeddings = [self.embedding_cache.get(normalize_query(q)) for q in queries]
+        missing = [i for i, embedding in enumerate(query_embeddings) if embedding is None]
+        if missing:
+            for i, embedding in zip(missing, self.embeddings.embed_documents([queries[i] for i in missing])):
+                query_embeddings[i] = embedding
+                self.embedding_cache.put(normalize_query(queries[i]), embedding)
+        return query_embeddings
+
+    def retrieve(self, queries: List[str], k=None) -> List[List[Document]]:
+        """
+        Retrieve the top `k` chunks for each distinct query with one encode and one search,
+        followed by the top `k` BM25 hits of each query when a lexical index is set
+        """
+        k = k or self.k
+        version = self.check_index_version()
+        distinct = {}
+        for q in queries:
+            if q and q.strip():
+                distinct.setdefault(normalize_query(q), q.strip())
+        queries = list(distinct.values())
+        if not queries:
+            return []
+
+        ## a question that names an act is only searched within that act's chunks
+        self.requests += 1
+        sources = sorted(self.act_index.match_sources(queries)) if self.act_index is not None else []
+        shared = sorted(self.act_index.shared_chunk_ids(sources)) if sources else []
+        where = source_filter(sources, shared)
+        if where is not None:
+            self.filtered_requests += 1
+
+        ## queries seen recently skip both the encoder and the vector search
+        cached_ids = {}
+        if self.result_cache is not None:
+            for q in queries:
+                ids = self.result_cache.get((version, normalize_query(q), k, tuple(sources)))
+                if ids is not None:
+                    cached_ids[q] = ids
+
+        to_search = [q for q in queries if q not in cached_ids]
+        ranked = {}
+        if to_search:
+            query_embeddings = self.embed_queries(to_search)
+            to_search, query_embeddings = drop_similar_queries(to_search, query_embeddings, self.duplicate_threshold)
+            for q, docs in zip(to_search, self.search_by_vectors(query_embeddings, k=k, where=where)):
+                ranked[q] = docs
+                if self.result_cache is not None:
+                    ## keyed by version, so a search that straddles a reload cannot serve old chunks later
+                    self.result_cache.put((version, normalize_query(q), k, tuple(sources)), [get_chunk_id(doc) for doc in docs])
+
+        kept = [q for q in queries if q in ranked or q in cached_ids]
+        lexical_ids = {}
+        if self.lexical_index is not None and len(self.lexical_index):
+            start = time.perf_counter()
+            for q in kept:
+                hits = self.lexical_index.search(q, k, sources=sources or None, chunk_ids=shared)
+                lexical_ids[q] = [chunk_id for chunk_id, _ in hits]
+            self.lexical_seconds += time.perf_counter() - start
+            self.lexical_queries += len(kept)
+
+        ## one lookup by ID for every cache hit and lexical hit
+        all_ids = list(dict.fromkeys(chunk_id for ids in (*cached_ids.values(), *lexical_ids.values()) for chunk_id in ids))
+        docs = {get_chunk_id(doc): doc for doc in self.get_by_ids(all_ids)}
+        for q, ids in cached_ids.items():
+            ranked[q] = [docs[chunk_id] for chunk_id in ids if chunk_id in docs]
+
+        ## lexical lists follow the vector lists, `generateRRF` fuses them all alike
+        results = [ranked[q] for q in kept]
+        results += [[docs[chunk_id] for chunk_id in lexical_ids[q] if chunk_id in docs] for q in kept if lexical_ids.get(q)]
+        return results
+
+    def cache_stats(self):
+        return {
+            "query_embeddings": self.embedding_cache.stats() if self.embedding_cache is not None else None,
+            "query_results": self.result_cache.stats() if self.result_cache is not None else None,
+            "index_version": self._cached_version,
+            "lexical": {
+                **self.lexical_index.stats(),
+                "queries": self.lexical_queries,
+                "avg_ms": round(self.lexical_seconds / self.lexical_queries * 1000, 3) if self.lexical_queries else 0.0,
+            } if self.lexical_index is not None else None,
+            "act_filter": {
+                "patterns": len(self.act_index),
+                "requests": self.requests,
+                "filtered_requests": self.filtered_requests,
+            } if self.act_index is not None else None,
+        }
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Tests for the act-name pre-filter: pattern building, aliases and mention matching.
+"""
+
+import sys
+import os
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from act_index import ActIndex, build_index, shared_chunks_from_store
+
+SOURCES = [os.path.join("data", pdf) for pdf in [
+    "THE INFORMATION TECHNOLOGY ACT, 2000.pdf",
+    "THE INDIAN TELEGRAPH ACT, 1885.pdf",
+    "THE INDIAN TOLLS ACT, 1851.pdf",
+    "THE INDIAN TRAMWAYS ACT, 1886.pdf",
+    "Right to Information Act, 2005.pdf",
+    "THE ADVOCATES ACT, 1961.pdf",
+    "THE ADVOCATES WELFARE FUND ACT, 2001.pdf",
+    "THE INDIAN PENAL CODE.pdf",
+    "THE CODE OF CRIMINAL PROCEDURE, 1973.pdf",
+]]
+
+def source(pdf):
+    return os.path.join("data", pdf)
+
+@pytest.fixture
+def index(tmp_path):
+    path = str(tmp_path / "act-index.json")
+    build_index(path, SOURCES, shared_chunks={source("THE INDIAN PENAL CODE.pdf"): ["bns-boilerplate"]})
+    return ActIndex(path)
+
+def test_alias_replaces_ambiguous_initials(index):
+    ## "IT Act" is also the initials of the Indian Telegraph, Tolls and Tramways Acts
+    assert index.match_sources(["What does the IT Act say about hacking?"]) == {source("THE INFORMATION TECHNOLOGY ACT, 2000.pdf")}
+
+def test_title_with_year_prefers_the_longest_mention(index):
+    assert index.match_sources(["Advocates Act, 1961 section 24"]) == {source("THE ADVOCATES ACT, 1961.pdf")}
+
+def test_bare_abbreviation_needs_capitals(index):
+    assert index.match_sources(["How do I file an RTI application?"]) == {source("Right to Information Act, 2005.pdf")}
+    assert index.match_sources(["the rti was filed"]) == set()
+
+def test_aliases_match_common_abbreviations(index):
+    assert index.match_sources(["section 302 IPC"]) == {source("THE INDIAN PENAL CODE.pdf")}
+    assert index.match_sources(["bail under CrPC"]) == {source("THE CODE OF CRIMINAL PROCEDURE, 1973.pdf")}
+
+def test_no_mention(index):
+    assert index.match_sources(["What are my rights as a tenant?"]) == set()
+    assert index.match_sources(["किरायेदार के अधिकार क्या हैं?"]) == set()
+
+def test_shared_chunks(index):
+    assert index.shared_chunk_ids([source("THE INDIAN PENAL CODE.pdf")]) == {"bns-boilerplate"}
+    assert index.shared_chunk_ids([source("THE ADVOCATES ACT, 1961.pdf")]) == set()
+
+def test_missing_index_matches_nothing(tmp_path):
+    index = ActIndex(str(tmp_path / "missing.json"))
+    assert len(index) == 0
+    assert index.match_sources(["IT Act"]) == set()
+
+class FakeCollection:
+    def __init__(self, stored):
+        self.stored = stored
+
+    def get(self, where, include):
+        assert where == {"duplicate_count": {"$gt": 0}}
+        return {"ids": list(self.stored), "metadatas": list(self.stored.values())}
+
+class FakeStore:
+    def __init__(self, stored):
+        self._collection = FakeCollection(stored)
+
+def test_shared_chunks_from_store():
+    store = FakeStore({
+        "a-1": {"source": "data/a.pdf", "duplicate_sources": "data/a.pdf; data/b.pdf; data/c.pdf", "duplicate_count": 2},
+        "b-7": {"source": "data/b.pdf", "duplicate_sources": "data/b.pdf; data/c.pdf", "duplicate_count": 1},
+    })
+    assert shared_chunks_from_store(store) == {"data/b.pdf": ["a-1"], "data/c.pdf": ["a-1", "b-7"]}
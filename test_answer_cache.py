@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Tests for the semantic answer cache: partitioning by history, numbers and act names.
+"""
+
+import sys
+import os
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from act_index import ActIndex, build_index
+from answer_cache import SemanticAnswerCache, query_anchors
+
+def embed(text):
+    """The same vector for every question, so only the partition decides a hit"""
+    return [1.0, 0.0, 0.0]
+
+@pytest.fixture
+def act_index(tmp_path):
+    path = str(tmp_path / "act-index.json")
+    build_index(path, ["data/THE INDIAN PENAL CODE.pdf", "data/THE ADVOCATES ACT, 1961.pdf"])
+    return ActIndex(path)
+
+@pytest.fixture
+def cache(tmp_path, act_index):
+    cache = SemanticAnswerCache(str(tmp_path / "answers.sqlite3"), embed=embed, act_index=act_index)
+    yield cache
+    cache.close()
+
+def test_query_anchors(act_index):
+    assert query_anchors("Punishment under section 302 IPC", act_index) == (["302"], ["data/THE INDIAN PENAL CODE.pdf"])
+    assert query_anchors("Section 498A and 304b", None) == (["304b", "498a"], [])
+    assert query_anchors("धारा ३०२ क्या है?", None) == (["302"], [])
+
+def test_different_section_numbers_do_not_share_answers(cache):
+    cache.put(cache.make_key("Punishment under section 302", [], "english"), "answer 302", ["IPC"])
+    assert cache.get(cache.make_key("Punishment under section 302?", [], "english")) == ("answer 302", ["IPC"])
+    assert cache.get(cache.make_key("Punishment under section 304", [], "english")) is None
+
+def test_different_acts_do_not_share_answers(cache):
+    cache.put(cache.make_key("Who can practise under the Advocates Act?", [], "english"), "advocates", [])
+    assert cache.get(cache.make_key("Who can practise under the IPC?", [], "english")) is None
+
+def test_devanagari_digits_match_ascii_digits(cache):
+    cache.put(cache.make_key("धारा 302 क्या है?", [], "hindi"), "उत्तर", [])
+    assert cache.get(cache.make_key("धारा ३०२ क्या है?", [], "hindi")) == ("उत्तर", [])
+
+def test_language_and_history_partition(cache):
+    history = [{"role": "user", "content": f"question {i}"} for i in range(6)]
+    cache.put(cache.make_key("What is bail?", history, "english"), "bail", [])
+    assert cache.get(cache.make_key("What is bail?", history, "hindi")) is None
+    ## only the last 5 messages, the ones the answer prompt sees, are part of the key
+    assert cache.get(cache.make_key("What is bail?", [{"role": "user", "content": "older"}] + history[1:], "english")) == ("bail", [])
+    assert cache.get(cache.make_key("What is bail?", history[:-1], "english")) is None
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Tests for the persisted BM25 lexical index: build, memory-mapped load and query.
+"""
+
+import sys
+import os
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+import bm25_index
+from bm25_index import BM25Index, build_index, words
+
+CHUNKS = [
+    ("ipc-1", "Section 302. Punishment for murder. Whoever commits murder shall be punished with death.", "data/ipc.pdf"),
+    ("ipc-2", "Section 304. Punishment for culpable homicide not amounting to murder.", "data/ipc.pdf"),
+    ("crpc-1", "Section 438. Direction for grant of bail to person apprehending arrest.", "data/crpc.pdf"),
+    ("rti-1", "The Right to Information Act provides for setting out the practical regime of right to information.", "data/rti.pdf"),
+]
+
+def test_devanagari_words_are_not_split():
+    assert words("नमस्ते! क़ानून की धारा ३०२ क्या है।") == ["नमस्ते", "क़ानून", "की", "धारा", "३०२", "क्या", "है"]
+
+def test_build_then_load_memory_maps_the_postings(tmp_path):
+    index_dir = str(tmp_path / "bm25")
+    assert build_index(index_dir, CHUNKS) == len(CHUNKS)
+    index = BM25Index(index_dir)
+    assert len(index) == len(CHUNKS)
+    assert isinstance(index._files.docs, np.memmap) and isinstance(index._files.weights, np.memmap)
+
+def test_search_ranks_exact_tokens(tmp_path):
+    index_dir = str(tmp_path / "bm25")
+    build_index(index_dir, CHUNKS)
+    index = BM25Index(index_dir)
+    hits = index.search("anticipatory bail section 438", k=2)
+    assert hits[0][0] == "crpc-1"
+    assert [chunk_id for chunk_id, _ in index.search("punishment for murder", k=5)][:2] == ["ipc-1", "ipc-2"]
+    assert [score for _, score in hits] == sorted((score for _, score in hits), reverse=True)
+
+def test_search_without_matching_terms(tmp_path):
+    index_dir = str(tmp_path / "bm25")
+    build_index(index_dir, CHUNKS)
+    index = BM25Index(index_dir)
+    assert index.search("the of and") == []
+    assert index.search("xyzzy") == []
+
+def test_missing_index_returns_no_hits(tmp_path):
+    index = BM25Index(str(tmp_path / "missing"))
+    assert len(index) == 0
+    assert index.search("section 302") == []
+
+def test_rebuild_is_picked_up_by_load(tmp_path):
+    index_dir = str(tmp_path / "bm25")
+    build_index(index_dir, CHUNKS[:2])
+    index = BM25Index(index_dir)
+    assert index.search("bail") == []
+    build_index(index_dir, CHUNKS)
+    assert index.search("bail") == [] ## the open index keeps reading the old files
+    index.load()
+    assert index.search("bail")[0][0] == "crpc-1"
+    assert bm25_index.index_exists(index_dir)
+
+def test_search_restricted_to_sources(tmp_path):
+    index_dir = str(tmp_path / "bm25")
+    build_index(index_dir, CHUNKS)
+    index = BM25Index(index_dir)
+    assert sorted(chunk_id for chunk_id, _ in index.search("section", k=5, sources=["data/ipc.pdf"])) == ["ipc-1", "ipc-2"]
+    assert index.search("bail", sources=["data/ipc.pdf"]) == []
+    ## a chunk stored under another act that stands for the filtered one still counts
+    assert [chunk_id for chunk_id, _ in index.search("bail", sources=["data/ipc.pdf"], chunk_ids=["crpc-1"])] == ["crpc-1"]
+    assert index.search("bail", sources=["data/unknown.pdf"]) == []
+
+def test_hindi_words_are_indexed_whole(tmp_path):
+    index_dir = str(tmp_path / "bm25")
+    build_index(index_dir, CHUNKS + [("hi-1", "धारा 438 के अंतर्गत अग्रिम जमानत मांगी जा सकती है।", "data/crpc-hindi.pdf")])
+    index = BM25Index(index_dir)
+    assert "जमानत" in index._files.vocab
+    assert index.search("अग्रिम जमानत")[0][0] == "hi-1"
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Tests for the token-budgeted context packer: seams between chunks, budgets and neighbours.
+"""
+
+import sys
+import os
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from langchain_core.documents import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from context_packer import pack_context, stitch
+from vector_store import assign_chunk_ids
+
+def count_tokens(text):
+    """Roughly one token per four characters, like English text in the chat model's tokenizer"""
+    return (len(text) + 3) // 4
+
+PAGE = " ".join(
+    f"Section {n}. Whoever commits the offence described in this section shall be punished with imprisonment "
+    f"of either description for a term which may extend to one year, or with fine, or with both."
+    for n in range(300, 320)
+)
+
+def split_page(add_start_index=True):
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=50, add_start_index=add_start_index)
+    chunks = splitter.split_documents([Document(page_content=PAGE, metadata={"source": "data/ipc.pdf", "page": 3})])
+    assign_chunk_ids(chunks)
+    return chunks
+
+def test_stitch_ignores_a_one_letter_coincidence():
+    assert stitch("imprisonment which may extend to", "one year, or with fine", 50) == \
+        "imprisonment which may extend to\none year, or with fine"
+
+def test_stitch_drops_a_real_overlap():
+    assert stitch("punished with imprisonment of either description", "of either description for a term", 50) == \
+        "punished with imprisonment of either description for a term"
+
+def test_stitch_uses_the_exact_overlap_when_known():
+    assert stitch("may extend to", "to one year", 50, overlap=2) == "may extend to one year"
+    assert stitch("may extend to", "one year", 50, overlap=0) == "may extend to\none year"
+
+def test_adjacent_chunks_merge_back_into_the_page():
+    for add_start_index in (True, False):
+        chunks = split_page(add_start_index)
+        assert len(chunks) > 2
+        context, stats = pack_context(chunks, count_tokens, budget=10_000)
+        assert stats["merged_passages"] == 1
+        text = context.split("\n", 1)[1]
+        assert " ".join(text.split()) == " ".join(PAGE.split())
+
+def test_budget_counts_the_labels():
+    docs = [Document(id=f"id-{i}", page_content="x" * 396, metadata={"source": f"data/{i}.pdf", "page": 0})
+            for i in range(5)]
+    context, stats = pack_context(docs, count_tokens, budget=300)
+    assert stats["context_tokens"] == count_tokens(context) <= 300
+    ## three passages of 99 tokens would fit on their own, but not with their labels
+    assert stats["merged_passages"] == 2
+
+def test_lone_oversize_passage_is_truncated():
+    doc = Document(id="big", page_content="word " * 2000, metadata={"source": "data/a.pdf", "page": 0})
+    context, stats = pack_context([doc], count_tokens, budget=200)
+    assert 0 < stats["context_tokens"] <= 200
+    assert context.startswith("Document 1:\nword")
+
+def test_neighbours_fill_the_remaining_budget():
+    chunks = split_page()
+    store = {chunk.id: chunk for chunk in chunks}
+    fetch = lambda ids: [store[i] for i in ids if i in store]
+    context, stats = pack_context([chunks[1]], count_tokens, budget=1000, fetch_by_ids=fetch)
+    assert stats["neighbor_chunks"] >= 1
+    assert stats["context_tokens"] <= 1000
+    assert chunks[0].page_content[:100] in context and chunks[2].page_content[:100] in context
+    assert "extend tone" not in context
+
+def test_no_documents():
+    assert pack_context([], count_tokens, budget=800) == ("", {
+        "context_tokens": 0, "token_budget": 800, "retrieved_chunks": 0, "merged_passages": 0, "neighbor_chunks": 0,
+    })
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Tests for page loading during ingestion: identical files share one text cache entry
+but keep their own source.
+"""
+
+import sys
+import os
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import importlib.util
+import shutil
+
+import pytest
+from langchain_core.documents import Document
+
+from ingestion_manifest import get_content_hash
+
+@pytest.fixture
+def ingestion(tmp_path, monkeypatch):
+    """`data-ingestion.py` with its data and cache directories under `tmp_path`"""
+    spec = importlib.util.spec_from_file_location("data_ingestion", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data-ingestion.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    data_path = tmp_path / "data"
+    data_path.mkdir()
+    monkeypatch.setattr(module, "data_path", str(data_path))
+    monkeypatch.setattr(module, "text_cache_directory", str(tmp_path / "text"))
+    parsed = []
+
+    def backend(path):
+        parsed.append(path)
+        with open(path, encoding="utf-8") as f:
+            return [Document(page_content=f.read(), metadata={"source": path, "page": 0, "total_pages": 1})]
+
+    monkeypatch.setattr(module, "get_backend", lambda name: backend)
+    return module, data_path, parsed
+
+def test_identical_files_keep_their_own_source(ingestion):
+    module, data_path, parsed = ingestion
+    (data_path / "ipc.pdf").write_text("Section 302. Punishment for murder.", encoding="utf-8")
+    shutil.copy(data_path / "ipc.pdf", data_path / "ipc-copy.pdf")
+    content_hash = get_content_hash(str(data_path / "ipc.pdf"))
+    assert get_content_hash(str(data_path / "ipc-copy.pdf")) == content_hash
+
+    docs, from_cache = module.load_pdf("ipc.pdf", content_hash)
+    assert not from_cache
+    assert docs[0].metadata["source"] == os.path.join("data", "ipc.pdf")
+    docs, from_cache = module.load_pdf("ipc-copy.pdf", content_hash)
+    assert from_cache and len(parsed) == 1
+    assert docs[0].metadata["source"] == os.path.join("data", "ipc-copy.pdf")
+    docs, from_cache = module.load_pdf("ipc.pdf", content_hash)
+    assert from_cache and docs[0].metadata["source"] == os.path.join("data", "ipc.pdf")
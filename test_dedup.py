@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Tests for the MinHash/LSH near-duplicate index used at ingestion time.
+"""
+
+import sys
+import os
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from dedup import NearDuplicateIndex, flush_duplicate_metadata
+
+BOILERPLATE = (
+    "Repeal and savings. (1) The enactments specified in the Schedule are hereby repealed. "
+    "(2) Notwithstanding such repeal, anything done or any action taken under the said enactments "
+    "shall be deemed to have been done or taken under the corresponding provisions of this Act, "
+    "and any notification, rule, order or appointment made thereunder shall continue in force "
+    "until it is superseded by anything done or any action taken under this Act."
+)
+OTHER = (
+    "Every person who ordinarily resides in India and who has attained the age of eighteen years "
+    "may apply to the Registrar in the prescribed form for a certificate of registration."
+)
+
+class FakeCollection:
+    """The parts of a Chroma collection `flush_duplicate_metadata` uses"""
+
+    def __init__(self, metadatas):
+        self.metadatas = metadatas
+
+    def get(self, ids, include):
+        found = [i for i in ids if i in self.metadatas]
+        return {"ids": found, "metadatas": [dict(self.metadatas[i]) for i in found]}
+
+    def update(self, ids, metadatas):
+        for chunk_id, metadata in zip(ids, metadatas):
+            self.metadatas[chunk_id] = metadata
+
+class FakeStore:
+    def __init__(self, metadatas):
+        self._collection = FakeCollection(metadatas)
+
+@pytest.fixture
+def index(tmp_path):
+    index = NearDuplicateIndex(str(tmp_path / "dedup.sqlite3"))
+    yield index
+    index.close()
+
+def test_near_duplicate_collapses_into_representative(index):
+    assert index.find_or_add("a-1", "data/a.pdf", BOILERPLATE) is None
+    assert index.find_or_add("b-1", "data/b.pdf", BOILERPLATE.replace("hereby repealed", "repealed")) == "a-1"
+    assert index.find_or_add("c-1", "data/c.pdf", OTHER) is None
+    index.commit()
+    assert index.counts() == (2, 1)
+
+def test_same_source_is_never_collapsed(index):
+    assert index.find_or_add("a-1", "data/a.pdf", BOILERPLATE) is None
+    assert index.find_or_add("a-2", "data/a.pdf", BOILERPLATE) is None
+    assert index.counts() == (2, 0)
+
+def test_flush_writes_duplicate_sources(index):
+    index.find_or_add("a-1", "data/a.pdf", BOILERPLATE)
+    index.find_or_add("b-1", "data/b.pdf", BOILERPLATE)
+    index.find_or_add("c-1", "data/c.pdf", BOILERPLATE)
+    index.commit()
+    store = FakeStore({"a-1": {"source": "data/a.pdf"}})
+    assert flush_duplicate_metadata(store, index) == 1
+    metadata = store._collection.metadatas["a-1"]
+    assert metadata["duplicate_sources"] == "data/a.pdf; data/b.pdf; data/c.pdf"
+    assert metadata["duplicate_count"] == 2
+    assert index.dirty_representatives() == {}
+
+def test_flush_keeps_unstored_representatives_dirty(index):
+    index.find_or_add("a-1", "data/a.pdf", BOILERPLATE)
+    index.find_or_add("b-1", "data/b.pdf", BOILERPLATE)
+    assert flush_duplicate_metadata(FakeStore({}), index) == 0
+    assert index.dirty_representatives() == {"a-1": ["data/b.pdf"]}
+
+def test_forgetting_a_member_rewrites_the_duplicate_list(index):
+    index.find_or_add("a-1", "data/a.pdf", BOILERPLATE)
+    index.find_or_add("b-1", "data/b.pdf", BOILERPLATE)
+    index.find_or_add("c-1", "data/c.pdf", BOILERPLATE)
+    index.mark_clean(["a-1"])
+    assert index.forget_source("data/b.pdf") == set()
+    assert index.dirty_representatives() == {"a-1": ["data/c.pdf"]}
+    assert index.pending_sources() == set()
+
+def test_forgetting_a_representative_queues_its_members(index):
+    index.find_or_add("a-1", "data/a.pdf", BOILERPLATE)
+    index.find_or_add("b-1", "data/b.pdf", BOILERPLATE)
+    index.find_or_add("c-1", "data/c.pdf", OTHER)
+    assert index.forget_source("data/a.pdf") == {"data/b.pdf"}
+    assert index.pending_sources() == {"data/b.pdf"}
+    assert index.counts() == (1, 0)
+
+    ## ingesting the member again takes it off the queue and makes it a representative
+    assert index.forget_source("data/b.pdf") == set()
+    assert index.find_or_add("b-1", "data/b.pdf", BOILERPLATE) is None
+    assert index.pending_sources() == set()
+    assert index.find_or_add("a-1", "data/a.pdf", BOILERPLATE) == "b-1"
+
+def test_pending_queue_survives_reopening(tmp_path):
+    path = str(tmp_path / "dedup.sqlite3")
+    index = NearDuplicateIndex(path)
+    index.find_or_add("a-1", "data/a.pdf", BOILERPLATE)
+    index.find_or_add("b-1", "data/b.pdf", BOILERPLATE)
+    index.commit()
+    index.forget_source("data/a.pdf")
+    index.close()
+    index = NearDuplicateIndex(path)
+    assert index.pending_sources() == {"data/b.pdf"}
+    index.close()
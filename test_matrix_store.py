@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Tests for the memory-mapped vector matrix: export, filtered exact search and reloads.
+"""
+
+import sys
+import os
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import threading
+
+from matrix_store import MatrixStore, export_from_store
+
+class FakeCollection:
+    """The parts of a Chroma collection `export_from_store` uses"""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def get(self, include, limit, offset):
+        page = self.rows[offset:offset + limit]
+        return {
+            "ids": [row[0] for row in page],
+            "embeddings": [row[1] for row in page],
+            "documents": [row[2] for row in page],
+            "metadatas": [{"source": row[3]} for row in page],
+        }
+
+class FakeStore:
+    def __init__(self, rows):
+        self._collection = FakeCollection(rows)
+
+ROWS = [
+    ("a", [1.0, 0.0], "section 302", "data/ipc.pdf"),
+    ("b", [0.0, 1.0], "section 438", "data/crpc.pdf"),
+    ("c", [1.0, 1.0], "repeal and savings", "data/rti.pdf"),
+]
+
+def test_search_and_filters(tmp_path):
+    store_dir = str(tmp_path / "matrix")
+    assert export_from_store(FakeStore(ROWS), store_dir) == 3
+    store = MatrixStore(store_dir)
+    assert [doc.id for doc in store.search_by_vectors([[0.0, 1.0]], k=3)[0]] == ["b", "c", "a"]
+    assert [doc.id for doc in store.search_by_vectors([[0.0, 1.0]], k=3, where={"source": {"$in": ["data/ipc.pdf"]}})[0]] == ["a"]
+    where = {"$or": [{"source": {"$in": ["data/ipc.pdf"]}}, {"chunk_id": {"$in": ["c", "missing"]}}]}
+    assert [doc.id for doc in store.search_by_vectors([[0.0, 1.0]], k=3, where=where)[0]] == ["c", "a"]
+    assert [doc.page_content for doc in store.get_by_ids(["c", "missing", "a"])] == ["repeal and savings", "section 302"]
+
+def test_missing_export_returns_nothing(tmp_path):
+    store = MatrixStore(str(tmp_path / "missing"))
+    assert len(store) == 0
+    assert store.search_by_vectors([[1.0, 0.0]]) == [[]]
+    assert store.get_by_ids(["a"]) == []
+
+def test_reload_keeps_running_searches_valid(tmp_path):
+    store_dir = str(tmp_path / "matrix")
+    export_from_store(FakeStore(ROWS), store_dir)
+    store = MatrixStore(store_dir)
+    old = store._files
+    export_from_store(FakeStore(ROWS[:1]), store_dir)
+    store.load()
+    ## a search that started before the reload still reads its own snapshot
+    assert old.document(2).page_content == "repeal and savings"
+    assert len(store) == 1
+    assert [doc.id for doc in store.search_by_vectors([[0.0, 1.0]], k=3)[0]] == ["a"]
+
+def test_concurrent_reloads_and_searches(tmp_path):
+    store_dir = str(tmp_path / "matrix")
+    export_from_store(FakeStore(ROWS), store_dir)
+    store = MatrixStore(store_dir)
+    errors = []
+
+    def search():
+        try:
+            for _ in range(200):
+                docs = store.search_by_vectors([[1.0, 0.0]], k=3)[0]
+                assert [doc.id for doc in docs] == ["a", "c", "b"]
+        except Exception as e:
+            errors.append(e)
+
+    def reload():
+        try:
+            for _ in range(50):
+                store.load()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=search) for _ in range(4)] + [threading.Thread(target=reload) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
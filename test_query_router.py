@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Tests for the local query router in front of the MultiQuery LLM call, in English and Hindi.
+"""
+
+import sys
+import os
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from act_index import ActIndex, build_index
+from query_router import QueryRouter
+
+def no_embedding(*args):
+    raise AssertionError("the classifier should not be needed")
+
+@pytest.fixture
+def router(tmp_path):
+    path = str(tmp_path / "act-index.json")
+    build_index(path, ["data/THE INDIAN PENAL CODE.pdf", "data/Right to Information Act, 2005.pdf"])
+    return QueryRouter(embed=no_embedding, embed_many=no_embedding, act_index=ActIndex(path))
+
+USER_TURN = [{"role": "user", "content": "What is bail?"}, {"role": "assistant", "content": "Bail is ..."}]
+
+@pytest.mark.parametrize("message", ["नमस्ते", "नमस्कार!", "धन्यवाद", "बहुत शुक्रिया", "हाँ ठीक है", "Hello there", "Thanks a lot"])
+def test_greetings_skip_retrieval(router, message):
+    assert router.route(message, []) == {"documentRetrievalRequired": False, "generatedQueries": []}
+    assert router.decisions == {"chitchat": 1}
+
+@pytest.mark.parametrize("message", ["धारा 302 क्या है?", "जमानत कैसे मिलती है?", "मेरे कानूनी अधिकार क्या हैं?",
+                                     "संविधान का अनुच्छेद 21", "What is anticipatory bail?"])
+def test_legal_questions_are_retrieved_as_they_are(router, message):
+    assert router.route(message, []) == {"documentRetrievalRequired": True, "generatedQueries": [message]}
+    assert router.decisions == {"legal_terms": 1}
+
+def test_question_naming_an_act_mid_conversation(router):
+    assert router.route("RTI कैसे दाखिल करें?", USER_TURN) == {"documentRetrievalRequired": True,
+                                                             "generatedQueries": ["RTI कैसे दाखिल करें?"]}
+    assert router.decisions == {"names_act": 1}
+
+OFFERED_MORE = [
+    {"role": "user", "content": "What is Section 438 CrPC?"},
+    {"role": "assistant", "content": "Section 438 provides for anticipatory bail. Would you like to know the conditions "
+                                     "the court can impose?"},
+]
+
+@pytest.mark.parametrize("message", ["yes", "Ok", "no", "thanks", "हाँ"])
+def test_confirmations_mid_conversation_escalate(router, message):
+    ## "yes" may accept the offer to explain more, which only the LLM can resolve with the history
+    assert router.route(message, OFFERED_MORE) is None
+    assert router.decisions == {"escalated": 1}
+
+def test_hindi_follow_up_escalates(router):
+    ## "यह" refers back to the conversation, so the LLM has to rephrase it
+    assert router.route("IPC में यह अपराध क्या है?", USER_TURN) is None
+    assert router.route("इसके बारे में और बताइए", USER_TURN) is None
+    assert router.decisions == {"escalated": 2}
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Tests for the single-pass response post-processor: streamed output must equal the
+one-shot output, and both must equal the chain of replacements it superseded.
+"""
+
+import sys
+import os
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import random
+
+import pytest
+
+from benchmark_postprocessing import legacy_post_process, make_response
+from response_postprocessor import REFUSAL_PHRASES, ResponsePostProcessor, post_process
+
+def random_split(text, rng, max_size):
+    """`text` cut at random points into pieces of 1 to `max_size` characters"""
+    pieces = []
+    pos = 0
+    while pos < len(text):
+        step = rng.randint(1, max_size)
+        pieces.append(text[pos:pos + step])
+        pos += step
+    return pieces
+
+def stream(pieces, user_query, language):
+    processor = ResponsePostProcessor(user_query, language)
+    shown = [processor.feed(piece) for piece in pieces]
+    shown.append(processor.finish())
+    return processor, "".join(shown)
+
+EDGE_CASES = [
+    "",
+    "   ",
+    "Plain answer without a header.",
+    "**Introduction:**\nAlready structured.\n\nLegal Disclaimer: keep it",
+    "# Heading\nSources: IPC",
+    "  \n*\n",
+    "Introduction: the Key Provisions: and Conclusion: headers, then Sources: and Follow-up questions:",
+    "This information is provided for educational purposes only and should not be construed as legal advice.",
+    "Intro Introduction Introduction: Legal Legal Disclaimer:",
+    "I CAN ONLY HELP WITH LEGAL RESEARCH questions, sorry.",
+    "Answer ending in a partial fragment: Legal Discl",
+    "Answer with trailing whitespace \n\n  ",
+]
+
+@pytest.mark.parametrize("language", ["english", "hindi"])
+@pytest.mark.parametrize("text", EDGE_CASES)
+def test_edge_cases_match_the_previous_implementation(text, language):
+    expected = legacy_post_process(text, "q", language)
+    assert post_process(text, "q", language) == expected
+    rng = random.Random(text)
+    for max_size in (1, 2, 3, 7, 50):
+        processor, shown = stream(random_split(text, rng, max_size), "q", language)
+        assert processor.response == expected
+        if not processor.refused:
+            assert shown == expected
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_token_splits_stream_the_one_shot_output(seed):
+    rng = random.Random(seed)
+    for i in range(25):
+        language = rng.choice(["english", "hindi"])
+        text = make_response(rng, language)
+        if i % 5 == 0:
+            text = text.replace("Important Considerations:", rng.choice(REFUSAL_PHRASES).title() + ". Important Considerations:")
+        one_shot = post_process(text, f"question {i}", language)
+        assert one_shot == legacy_post_process(text, f"question {i}", language)
+        processor, shown = stream(random_split(text, rng, rng.choice([1, 2, 4, 8, 32])), f"question {i}", language)
+        assert processor.response == one_shot
+        if processor.refused:
+            assert one_shot.startswith("**") and f"question {i}" in one_shot
+        else:
+            assert shown == one_shot
+
+def test_refusal_split_across_chunks_is_detected():
+    phrase = "I cannot help with this"
+    pieces = ["**Answer:** Sorry, I can", "not he", "lp with", " this request."]
+    processor, _ = stream(pieces, "what is bail", "english")
+    assert processor.refused
+    assert processor.response == post_process("".join(pieces), "what is bail", "english")
+    assert phrase.lower() not in processor.response.lower()
+
+def test_hindi_fragment_split_across_chunks_is_translated():
+    processor, shown = stream(["**परिचय:**\nKey Prov", "isions:", " धारा 438"], "q", "hindi")
+    assert shown == "**परिचय:**\n**मुख्य प्रावधान:** धारा 438"
+    assert processor.response == shown
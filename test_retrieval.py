@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Tests for batched multi-query retrieval: one encode and one search per request,
+near-duplicate rephrasings dropped, the embedding and result caches, and the
+reciprocal rank fusion of the ranked lists.
+"""
+
+import sys
+import os
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from langchain_core.documents import Document
+
+from retrieval import BatchRetriever, reciprocal_rank_fusion
+from ttl_cache import TTLCache
+
+## every query the tests send, with a fixed embedding
+VECTORS = {
+    "what is anticipatory bail": [1.0, 0.0, 0.0],
+    "what does anticipatory bail mean": [0.99, 0.05, 0.0],
+    "punishment for murder": [0.0, 1.0, 0.0],
+    "right to information": [0.0, 0.0, 1.0],
+}
+
+CHUNKS = {
+    "crpc-438": ([1.0, 0.0, 0.0], "Section 438. Direction for grant of bail to person apprehending arrest."),
+    "ipc-302": ([0.0, 1.0, 0.0], "Section 302. Punishment for murder."),
+    "rti-3": ([0.0, 0.0, 1.0], "All citizens shall have the right to information."),
+}
+
+class FakeEmbeddings:
+    """Looks embeddings up in `VECTORS`, counting model calls and texts encoded"""
+
+    def __init__(self):
+        self.calls = 0
+        self.texts = []
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        self.texts.extend(texts)
+        return [VECTORS[text.lower().rstrip("?")] for text in texts]
+
+class FakeStore:
+    """The parts of `matrix_store.MatrixStore` `BatchRetriever` uses, counting searches"""
+
+    def __init__(self):
+        self.searches = 0
+        self.searched_vectors = 0
+        self.loads = 0
+
+    def search_by_vectors(self, query_embeddings, k=5, where=None):
+        self.searches += 1
+        self.searched_vectors += len(query_embeddings)
+        ranked = []
+        for query in query_embeddings:
+            scores = sorted(CHUNKS, key=lambda chunk_id: -sum(x * y for x, y in zip(query, CHUNKS[chunk_id][0])))
+            ranked.append([self.document(chunk_id) for chunk_id in scores[:k]])
+        return ranked
+
+    def get_by_ids(self, ids):
+        return [self.document(chunk_id) for chunk_id in ids if chunk_id in CHUNKS]
+
+    def document(self, chunk_id):
+        return Document(id=chunk_id, page_content=CHUNKS[chunk_id][1], metadata={"chunk_id": chunk_id})
+
+    def load(self):
+        self.loads += 1
+
+def make_retriever(**kwargs):
+    embeddings, store = FakeEmbeddings(), FakeStore()
+    return BatchRetriever(None, embeddings, k=2, vector_store=store, **kwargs), embeddings, store
+
+def ids(ranked):
+    return [[doc.id for doc in docs] for docs in ranked]
+
+def test_all_queries_share_one_encode_and_one_search():
+    retriever, embeddings, store = make_retriever()
+    ranked = retriever.retrieve(["What is anticipatory bail?", "Punishment for murder", "Right to information"])
+    assert ids(ranked) == [["crpc-438", "ipc-302"], ["ipc-302", "crpc-438"], ["rti-3", "crpc-438"]]
+    assert (embeddings.calls, store.searches, store.searched_vectors) == (1, 1, 3)
+
+def test_near_duplicate_queries_are_dropped():
+    retriever, embeddings, store = make_retriever()
+    ranked = retriever.retrieve(["What is anticipatory bail", "What does anticipatory bail mean", "Punishment for murder"])
+    assert len(embeddings.texts) == 3
+    assert store.searched_vectors == 2 ## the rephrasing is encoded but not searched
+    assert ids(ranked) == [["crpc-438", "ipc-302"], ["ipc-302", "crpc-438"]]
+
+def test_threshold_keeps_distinct_enough_queries():
+    retriever, _, store = make_retriever(duplicate_threshold=0.999)
+    retriever.retrieve(["What is anticipatory bail", "What does anticipatory bail mean"])
+    assert store.searched_vectors == 2
+
+def test_repeated_text_is_searched_once():
+    retriever, embeddings, store = make_retriever()
+    ranked = retriever.retrieve(["What is anticipatory bail?", "what is  anticipatory bail", "", "  "])
+    assert embeddings.texts == ["What is anticipatory bail?"]
+    assert (store.searches, len(ranked)) == (1, 1)
+
+def test_no_queries_skip_the_model_and_the_store():
+    retriever, embeddings, store = make_retriever()
+    assert retriever.retrieve(["", " "]) == []
+    assert (embeddings.calls, store.searches) == (0, 0)
+
+def make_cached_retriever():
+    version = {"value": 1}
+    retriever, embeddings, store = make_retriever(
+        embedding_cache=TTLCache(), result_cache=TTLCache(), index_version=lambda: version["value"])
+    return retriever, embeddings, store, version
+
+def test_result_cache_hits_skip_the_model_and_the_search():
+    retriever, embeddings, store, _ = make_cached_retriever()
+    first = retriever.retrieve(["What is anticipatory bail?", "Punishment for murder"])
+    assert retriever.result_cache.stats()["misses"] == 2
+    again = retriever.retrieve(["what is anticipatory bail", "Punishment for murder?"])
+    assert ids(again) == ids(first)
+    assert (embeddings.calls, store.searches) == (1, 1)
+    assert retriever.result_cache.stats()["hits"] == 2
+
+def test_only_result_cache_misses_are_encoded_and_searched():
+    retriever, embeddings, store, _ = make_cached_retriever()
+    retriever.retrieve(["What is anticipatory bail?"])
+    ranked = retriever.retrieve(["What is anticipatory bail?", "Right to information"])
+    assert ids(ranked) == [["crpc-438", "ipc-302"], ["rti-3", "crpc-438"]]
+    assert embeddings.texts == ["What is anticipatory bail?", "Right to information"]
+    assert (store.searches, store.searched_vectors) == (2, 2)
+
+def test_results_are_cached_per_k():
+    retriever, _, store, _ = make_cached_retriever()
+    retriever.retrieve(["Punishment for murder"], k=1)
+    assert ids(retriever.retrieve(["Punishment for murder"], k=2)) == [["ipc-302", "crpc-438"]]
+    assert store.searches == 2
+
+def test_embedding_cache_serves_queries_after_results_expire():
+    retriever, embeddings, store, _ = make_cached_retriever()
+    retriever.retrieve(["Punishment for murder"])
+    retriever.result_cache.clear()
+    retriever.retrieve(["Punishment for murder"])
+    assert (embeddings.calls, store.searches) == (1, 2)
+
+def test_index_version_change_clears_the_caches():
+    retriever, embeddings, store, version = make_cached_retriever()
+    retriever.retrieve(["What is anticipatory bail?"])
+    version["value"] = 2
+    ranked = retriever.retrieve(["What is anticipatory bail?"])
+    assert ids(ranked) == [["crpc-438", "ipc-302"]]
+    assert (embeddings.calls, store.searches, store.loads) == (2, 2, 1)
+    assert retriever.cache_stats()["index_version"] == 2
+    ## the new version's results are cached again
+    retriever.retrieve(["What is anticipatory bail?"])
+    assert (embeddings.calls, store.searches, store.loads) == (2, 2, 1)
+
+def chunk(chunk_id, source="data/ipc.pdf", page=0):
+    return Document(id=chunk_id, page_content=f"text of {chunk_id}", metadata={"source": source, "page": page})
+
+def test_rrf_fuses_ranks_across_lists():
+    a, b, c, d = chunk("a"), chunk("b"), chunk("c"), chunk("d")
+    ## vector lists for two queries, then a lexical list, each with fresh `Document` copies
+    fused = reciprocal_rank_fusion([[a, b, c], [chunk("b"), d], [chunk("c"), chunk("b")]])
+    assert [doc.id for doc in fused] == ["b", "c", "a"]
+    assert fused[0] is b and fused[1] is c and fused[2] is a ## the first object seen is returned
+    assert [doc.metadata["rrf_score"] for doc in fused] == [
+        pytest.approx(1/62 + 1/61 + 1/62), pytest.approx(1/63 + 1/61), pytest.approx(1/61)]
+    assert "rrf_score" not in d.metadata
+
+def test_rrf_top_n_and_k():
+    lists = [[chunk("a"), chunk("b")], [chunk("b"), chunk("a")], [chunk("c")]]
+    fused = reciprocal_rank_fusion(lists, k=0, top_n=10)
+    ## a and b tie on 1 + 1/2 and keep the order they were first seen in
+    assert [doc.id for doc in fused] == ["a", "b", "c"]
+    assert [doc.metadata["rrf_score"] for doc in fused] == [1.5, 1.5, 1.0]
+    assert [doc.id for doc in reciprocal_rank_fusion(lists, top_n=1)] == ["a"]
+    assert reciprocal_rank_fusion([]) == [] and reciprocal_rank_fusion([[], []]) == []
+
+def test_rrf_matches_chunks_without_ids_by_source_page_and_text():
+    old = [Document(page_content="Section 302.", metadata={"source": "data/ipc.pdf", "page": 4})]
+    same = [Document(page_content="Section 302.", metadata={"source": "data/ipc.pdf", "page": 4})]
+    other_page = [Document(page_content="Section 302.", metadata={"source": "data/ipc.pdf", "page": 5})]
+    fused = reciprocal_rank_fusion([old, same, other_page])
+    assert len(fused) == 2
+    assert fused[0] is old[0] and fused[0].metadata["rrf_score"] == pytest.approx(2/61)
+    assert fused[1].metadata["page"] == 5
@@ -0,0 +1,47 @@
+"""
+Cache of extracted PDF page text, keyed by the file's content hash.
+
+Each file is stored as one gzip-compressed JSON document holding the text and metadata
+of its pages, so the split and embed stages can be re-run without parsing the PDF again.
+"""
+
+import gzip
+import json
+import os
+
+from langchain_core.documents import Document
+
+def get_cache_path(cache_dir, content_hash):
+    ## fan out over sub-directories so no single directory holds thousands of files
+    return os.path.join(cache_dir, content_hash[:2], f"{content_hash}.json.gz")
+
+def load_pages(cache_dir, content_hash):
+    """Return the cached page `Document`s for a file, or None if it has not been extracted yet"""
+    path = get_cache_path(cache_dir, content_hash)
+    if not os.path.exists(path):
+        return None
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        pages = json.load(f)
+    return [Document(page_content=page["text"], metadata=page["metadata"]) for page in pages]
+
+def save_pages(cache_dir, content_hash, docs):
+    """Write the page `Document`s of a file, replacing the cache entry atomically"""
+    path = get_cache_path(cache_dir, content_hash)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pages = [{"text": doc.page_content, "metadata": doc.metadata} for doc in docs]
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=6) as f:
+        json.dump(pages, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+def prune(cache_dir, keep_hashes):
+    """Delete cache entries whose content hash is not in `keep_hashes`, returning how many were removed"""
+    if not os.path.isdir(cache_dir):
+        return 0
+    removed = 0
+    for root, _, filenames in os.walk(cache_dir):
+        for filename in filenames:
+            if filename.endswith(".json.gz") and filename[:-len(".json.gz")] not in keep_hashes:
+                os.remove(os.path.join(root, filename))
+                removed += 1
+    return removed
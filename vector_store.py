@@ -0,0 +1,94 @@
+"""
+Chunk identity and write helpers for the Chroma store in `data-ingestion-local`.
+
+Every chunk gets an ID derived from its source file, page and ordinal on that page, so
+re-ingesting a file overwrites its chunks in place instead of appending duplicates.
+"""
+
+import hashlib
+import os
+import time
+
+## ChromaDB rejects very large single requests, keep deletes well under its batch limit
+DELETE_BATCH_SIZE = 5000
+
+def make_chunk_id(source, page, ordinal):
+    """Stable ID for the `ordinal`-th chunk of `page` in `source`"""
+    key = f"{source}|{page}|{ordinal}".encode("utf-8")
+    return hashlib.blake2b(key, digest_size=16).hexdigest()
+
+def assign_chunk_ids(chunks):
+    """
+    Stamp `chunk_id`, `chunk_ordinal` (position on its page) and `chunk_index`
+    (position in its file) into the metadata of the chunks of one file.
+    Returns the list of IDs in order.
+    """
+    ids = []
+    page_ordinals = {}
+    for index, chunk in enumerate(chunks):
+        source = chunk.metadata.get("source", "")
+        page = chunk.metadata.get("page", 0)
+        ordinal = page_ordinals.get(page, 0)
+        page_ordinals[page] = ordinal + 1
+
+        chunk_id = make_chunk_id(source, page, ordinal)
+        chunk.id = chunk_id
+        chunk.metadata["chunk_id"] = chunk_id
+        chunk.metadata["chunk_ordinal"] = ordinal
+        chunk.metadata["chunk_index"] = index
+        ids.append(chunk_id)
+    return ids
+
+def get_chunk_id(doc):
+    """ID of a retrieved `Document`, falling back to its metadata for older langchain versions"""
+    return getattr(doc, "id", None) or doc.metadata.get("chunk_id")
+
+def upsert_chunks(vectorDB, chunks, embeddings):
+    """Insert or overwrite chunks with precomputed embeddings, keyed by their chunk IDs"""
+    vectorDB._collection.upsert(
+        ids=[chunk.metadata["chunk_id"] for chunk in chunks],
+        embeddings=embeddings,
+        documents=[chunk.page_content for chunk in chunks],
+        metadatas=[chunk.metadata for chunk in chunks],
+    )
+
+def get_source_ids(vectorDB, source):
+    """IDs of every stored chunk that came from `source`"""
+    return vectorDB._collection.get(where={"source": source}, include=[])["ids"]
+
+def delete_ids(vectorDB, ids):
+    ids = list(ids)
+    for i in range(0, len(ids), DELETE_BATCH_SIZE):
+        vectorDB._collection.delete(ids=ids[i:i + DELETE_BATCH_SIZE])
+    return len(ids)
+
+def delete_stale_chunks(vectorDB, source, keep_ids):
+    """
+    Remove chunks of `source` that are not in `keep_ids`, i.e. those left over from an
+    older version of the file or written with random IDs before chunk IDs were stable.
+    Returns the number of chunks deleted.
+    """
+    keep_ids = set(keep_ids)
+    return delete_ids(vectorDB, [i for i in get_source_ids(vectorDB, source) if i not in keep_ids])
+
+def delete_source(vectorDB, source):
+    """Remove every chunk of `source`, returning how many were deleted"""
+    return delete_ids(vectorDB, get_source_ids(vectorDB, source))
+
+INDEX_VERSION_FILE = "index-version"
+
+def bump_index_version(persist_directory):
+    """Publish a new index version so serving processes drop results cached against the old one"""
+    path = os.path.join(persist_directory, INDEX_VERSION_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(str(time.time_ns()))
+    os.replace(tmp_path, path)
+
+def read_index_version(persist_directory):
+    """Current index version, or None if ingestion has never published one"""
+    try:
+        with open(os.path.join(persist_directory, INDEX_VERSION_FILE)) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None